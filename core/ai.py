@@ -1,11 +1,54 @@
 """OpenAI integration for sentiment and emotion analysis."""
-import os
+import asyncio
 import json
+import logging
 import re
-from typing import Dict, List, Optional
-from pathlib import Path
-from openai import OpenAI
-from core.config import OPENAI_API_KEY, OPENAI_MODEL, PROMPTS_DIR, EMOTIONS
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import httpx
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AuthenticationError,
+    RateLimitError,
+)
+from core.config import (
+    OPENAI_MODEL,
+    OPENAI_STRONG_MODEL,
+    ROUTER_SHORT_MAX_CHARS,
+    ROUTER_FLAT_EMOTION_MAX,
+    ROUTER_NEUTRAL_SENTIMENT,
+    ROUTER_STRONG_WORDING,
+    OPENAI_BASE_URL,
+    OPENAI_TIMEOUT_SECONDS,
+    OPENAI_CONNECT_TIMEOUT_SECONDS,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_MAX_RETRIES,
+    OPENAI_MAX_WAIT_SECONDS,
+    AI_BACKGROUND_RATE_HEADROOM,
+    ANALYSIS_PACK_SIZE,
+    ANALYSIS_INPUT_TOKEN_BUDGET,
+    ANALYSIS_SENTENCE_MEMO,
+    ANALYSIS_SUMMARY_ENABLED,
+    ANALYSIS_PROVIDER,
+    PROMPTS_DIR,
+    EMOTIONS,
+)
+from core import analysis_cache, distill, lexicon, rate_limit, token_budget
+from core.scheduler import scheduler, current_priority, use_priority
+from core.db import record_ai_request
+from core.token_usage import calculate_request_cost
 
 # Load system prompt
 SYSTEM_PROMPT_PATH = PROMPTS_DIR / "system.txt"
@@ -20,9 +63,35 @@ else:
         "Avoid therapy; focus on day-to-day study actions and self-care."
     )
 
+# Bump when the user prompt template or result normalization changes (invalidates cached results)
+PROMPT_VERSION = "1"
 
-def get_client() -> Optional[OpenAI]:
-    """Get OpenAI client if API key is available. Checks Streamlit secrets first, then env vars."""
+# Completion cap for a single-entry analysis
+MAX_COMPLETION_TOKENS = 500
+
+# Completion tokens per scored sentence (id, sentiment and eight emotions)
+SENTENCE_COMPLETION_TOKENS = 60
+
+# Completion cap for the separate summary/suggestions request
+SUMMARY_COMPLETION_TOKENS = 200
+
+SENTENCE_SYSTEM_PROMPT = (
+    "You score the emotional tone of single sentences from a student's mood journal. "
+    "Judge each sentence on its own. You return JSON only."
+)
+
+# model_used of an entry saved before its analysis ran (the background worker fills it in)
+PENDING_MODEL = "pending"
+
+# model_used values for placeholder results that must never be cached
+UNANALYZED_MODELS = ("none", "error", PENDING_MODEL)
+
+# Providers selectable via ANALYSIS_PROVIDER
+PROVIDERS = ("openai", "lexicon")
+
+
+def _resolve_api_key() -> Optional[str]:
+    """Resolve the OpenAI API key. Checks Streamlit secrets first, then env vars."""
     api_key = None
     
     # Try multiple methods to get the API key from Streamlit secrets
@@ -81,39 +150,204 @@ def get_client() -> Optional[OpenAI]:
         
         # Validate it's not empty and looks like an API key
         if api_key and api_key != "" and api_key.lower() != "none" and len(api_key) > 10:
+            return api_key
+    
+    return None
+
+
+# Process-wide client registry: one OpenAI client (and HTTP pool) per resolved key
+_client_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_client_key: Optional[str] = None
+
+
+def _build_client(api_key: str) -> OpenAI:
+    """Create an OpenAI client with a bounded keep-alive connection pool."""
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+    )
+    return OpenAI(
+        api_key=api_key,
+        base_url=OPENAI_BASE_URL or None,
+        http_client=http_client,
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+        # Retries go through _create_completion so they respect the shared limiter
+        max_retries=0,
+    )
+
+
+def get_client() -> Optional[OpenAI]:
+    """
+    Get the shared OpenAI client if an API key is available.
+    
+    The client (and its connection pool) is reused across calls and sessions,
+    and only rebuilt when the resolved API key changes.
+    """
+    global _client, _client_key
+    
+    api_key = _resolve_api_key()
+    if not api_key:
+        return None
+    
+    with _client_lock:
+        if _client is None or _client_key != api_key:
             try:
-                return OpenAI(api_key=api_key)
-            except Exception as e:
+                _client = _build_client(api_key)
+                _client_key = api_key
+            except Exception:
                 # If there's an error creating the client, return None
                 return None
+        return _client
+
+
+def _cache_key(text: str, tags: Optional[List[str]]) -> str:
+    """Analysis cache key for a request under the current model and prompt."""
+    models = f"{OPENAI_MODEL}>{OPENAI_STRONG_MODEL}" if OPENAI_STRONG_MODEL else OPENAI_MODEL
+    # The input budget changes what is sent for long entries
+    prompt = f"{PROMPT_VERSION}/{ANALYSIS_INPUT_TOKEN_BUDGET}{SYSTEM_PROMPT}"
+    return analysis_cache.cache_key(text, tags, models, prompt)
+
+
+def _cache_get(key: str) -> Optional[Dict]:
+    """Look up a cached result; cache errors count as a miss."""
+    try:
+        return analysis_cache.get(key)
+    except Exception as e:
+        # The cache is an optimization - never let it block an analysis
+        logging.warning(f"Analysis cache lookup failed: {e}")
+        return None
+
+
+def _cache_put(key: str, result: Dict):
+    """Store a real (non-placeholder) result in the cache."""
+    if result["model_used"] in UNANALYZED_MODELS:
+        return
+    try:
+        analysis_cache.put(key, result)
+    except Exception as e:
+        logging.warning(f"Analysis cache store failed: {e}")
+
+
+def _use_lexicon() -> bool:
+    """Whether the local lexicon is the configured analysis provider."""
+    return ANALYSIS_PROVIDER == "lexicon"
+
+
+def _distilled_result(text: str) -> Optional[Dict]:
+    """The distilled local model's result if it is confident; it must never block an analysis."""
+    try:
+        return distill.predict_confident(text)
+    except Exception as e:
+        logging.warning(f"Distilled model prediction failed: {e}")
+        return None
+
+
+def analyze_text_provisional(text: str) -> Dict:
+    """Instant local estimate to show while the real analysis is pending or unavailable."""
+    return lexicon.score_text(text)
+
+
+def analysis_available() -> bool:
+    """Whether analyze_text can produce a real analysis now (the lexicon provider or an API key)."""
+    return _use_lexicon() or get_client() is not None
+
+
+def analyze_locally(text: str) -> Optional[Dict]:
+    """
+    Final analysis that needs no API call, or None if the text must go to the API.
     
-    return None
+    That is the lexicon score when ANALYSIS_PROVIDER=lexicon, otherwise the
+    distilled model's result when it is confident.
+    """
+    if _use_lexicon():
+        return lexicon.score_text(text)
+    return _distilled_result(text)
+
+
+def estimate_analysis_cost(text: str, tags: Optional[List[str]] = None) -> Dict:
+    """
+    Predict an analysis request's size and cost locally, before sending it.
+    
+    Estimates are memoized on (text, tags): pages call this on every rerun.
+    
+    Returns:
+        dict with keys: model, input_tokens (entry text), sent_tokens (after the
+        input budget), prompt_tokens, max_completion_tokens, cost (USD, with the
+        completion at its cap, so an upper bound)
+    """
+    return dict(_estimate_analysis_cost(text, tuple(tags or ())))
+
+
+@lru_cache(maxsize=32)
+def _estimate_analysis_cost(text: str, tags: Tuple[str, ...]) -> Dict:
+    """Uncached estimate_analysis_cost."""
+    if _use_lexicon():
+        return {"model": "lexicon", "input_tokens": 0, "sent_tokens": 0, "prompt_tokens": 0, "max_completion_tokens": 0, "cost": 0.0}
+    
+    model, _ = _route_model(text)
+    sent = token_budget.condense_text(text, ANALYSIS_INPUT_TOKEN_BUDGET, model)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _build_user_prompt(sent, list(tags))},
+    ]
+    prompt_tokens = token_budget.count_message_tokens(messages, model)
+    return {
+        "model": model,
+        "input_tokens": token_budget.count_tokens(text, model),
+        "sent_tokens": token_budget.count_tokens(sent, model),
+        "prompt_tokens": prompt_tokens,
+        "max_completion_tokens": MAX_COMPLETION_TOKENS,
+        "cost": calculate_request_cost(model, prompt_tokens, MAX_COMPLETION_TOKENS),
+    }
 
 
 def analyze_text(text: str, tags: Optional[List[str]] = None) -> Dict:
     """
     Analyze text and return sentiment, emotions, summary, and suggestions.
     
+    Identical requests (same normalized text, tags, model and prompt) are served
+    from the analysis cache without an API call; those results carry cached=True
+    and tokens=0. Identical requests already in flight are coalesced: callers
+    wait for the running request and get its result with coalesced=True and
+    tokens=0. When the distilled local model (core.distill) is confident, its
+    result is returned without an API call. With ANALYSIS_SENTENCE_MEMO (off by
+    default) only sentences without a memoized score are sent, followed by a
+    summary request (see _analyze_by_sentence).
+    With ANALYSIS_PROVIDER=lexicon the text is scored locally instead.
+    
     Returns:
         dict with keys: sentiment, mood_score, emotions, summary, suggestions, model_used, tokens
     """
-    client = get_client()
+    if _use_lexicon():
+        return lexicon.score_text(text)
     
-    # If no API key, return default values
-    if not client:
-        return {
-            "sentiment": 0.0,
-            "mood_score": 50,
-            "emotions": {emotion: 0.125 for emotion in EMOTIONS},  # Equal distribution
-            "summary": "AI analysis unavailable. Your entry has been saved.",
-            "suggestions": ["Take a moment to reflect on your day", "Consider talking to someone you trust"],
-            "model_used": "none",
-            "tokens": 0,
-        }
-    
-    # Build user prompt
+    key = _cache_key(text, tags)
+    cached = _cache_get(key)
+    if cached:
+        return cached
+    
+    distilled = _distilled_result(text)
+    if distilled:
+        return distilled
+    
+    def compute() -> Dict:
+        with _collect_request_ids() as request_ids:
+            result = _analyze_text_uncached(text, tags)
+        _cache_put(key, result)
+        # request_ids lets the caller link the telemetry rows to the saved entry
+        return {**result, "request_ids": request_ids}
+    
+    return analysis_cache.single_flight(key, compute)
+
+
+def _build_user_prompt(text: str, tags: Optional[List[str]]) -> str:
+    """User prompt for a single analysis request."""
     tags_str = ", ".join(tags) if tags else "none"
-    user_prompt = f'''Text: """{text}"""
+    return f'''Text: """{text}"""
 
 Tags: {tags_str}
 
@@ -124,152 +358,1181 @@ Return JSON with keys:
 - suggestions (array of exactly 2 short strings)
 
 Return only valid JSON, no other text.'''
+
+
+def _completion_kwargs(sent: str, tags: Optional[List[str]], model: str = OPENAI_MODEL) -> Dict:
+    """chat.completions.create arguments for the normal analysis request (sent: the already budgeted text)."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _build_user_prompt(sent, tags)},
+        ],
+        "temperature": 0.2,
+        "max_tokens": MAX_COMPLETION_TOKENS,
+    }
+
+
+def _retry_completion_kwargs(sent: str, model: str = OPENAI_MODEL) -> Dict:
+    """chat.completions.create arguments for the stricter retry after a JSON decode failure."""
+    retry_prompt = f'''Text: """{sent}"""
+
+Return JSON only with keys: sentiment (float -1 to 1), emotions (object with keys: joy, sad, anger, fear, anticipation, trust, surprise, disgust; values sum to 1), summary (string), suggestions (array of 2 strings).
+
+JSON:'''
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "Return only valid JSON. No other text."},
+            {"role": "user", "content": retry_prompt},
+        ],
+        "temperature": 0.1,
+        "max_tokens": MAX_COMPLETION_TOKENS,
+    }
+
+
+def _extract_json(content: str):
+    """Extract and decode the JSON payload from a model response."""
+    json_str = (content or "").strip()
+    match = None
+    if "```json" in json_str:
+        match = re.search(r"```json\s*(.*?)\s*```", json_str, re.DOTALL)
+    elif "```" in json_str:
+        match = re.search(r"```\s*(.*?)\s*```", json_str, re.DOTALL)
+    elif "[" in json_str and ("{" not in json_str or json_str.index("[") < json_str.index("{")):
+        # Packed responses are a top-level array
+        match = re.search(r"\[.*\]", json_str, re.DOTALL)
+    elif "{" in json_str:
+        match = re.search(r"\{.*\}", json_str, re.DOTALL)
+    if match:
+        json_str = match.group(match.lastindex or 0)
+    return json.loads(json_str)
+
+
+def _normalize_result(data: Dict, model_used: str, tokens: int) -> Dict:
+    """Sanitize and normalize a decoded analysis payload into the result dict."""
+    # Sanitize and normalize
+    sentiment = max(-1.0, min(1.0, float(data.get("sentiment", 0.0))))
+    mood_score = int((sentiment + 1) * 50)
+    
+    # Normalize emotions
+    emotions = data.get("emotions", {})
+    if not isinstance(emotions, dict):
+        emotions = {}
+    # Ensure all emotions are present
+    emotions = {emotion: max(0.0, float(emotions.get(emotion, 0.0) or 0.0)) for emotion in EMOTIONS}
+    
+    # Normalize to sum to 1
+    total = sum(emotions.values())
+    if total == 0:
+        emotions = {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS}
+    else:
+        emotions = {k: v / total for k, v in emotions.items()}
+    
+    # Get summary and suggestions
+    summary = str(data.get("summary", "No summary available."))
+    if len(summary) > 320:
+        summary = summary[:317] + "..."
+    
+    suggestions = data.get("suggestions", [])
+    if not isinstance(suggestions, list):
+        suggestions = []
+    suggestions = [str(s) for s in suggestions[:2]]
+    while len(suggestions) < 2:
+        suggestions.append("Take care of yourself today")
     
+    return {
+        "sentiment": sentiment,
+        "mood_score": mood_score,
+        "emotions": emotions,
+        "summary": summary,
+        "suggestions": suggestions,
+        "model_used": model_used,
+        "tokens": tokens,
+    }
+
+
+def _parse_response(response) -> Dict:
+    """Turn a chat completion into a normalized result (raises JSONDecodeError on bad JSON)."""
+    content = response.choices[0].message.content
+    tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+    return _normalize_result(_extract_json(content), response.model, tokens)
+
+
+def _placeholder_result(text: str, summary: str, suggestions: List[str], model_used: str) -> Dict:
+    """Placeholder result scored by the local lexicon so charts get a usable estimate."""
+    sentiment, emotions = lexicon.score_emotions(text)
+    return {
+        "sentiment": sentiment,
+        "mood_score": int((sentiment + 1) * 50),
+        "emotions": emotions,
+        "summary": summary,
+        "suggestions": suggestions,
+        "model_used": model_used,
+        "tokens": 0,
+    }
+
+
+def _unavailable_result(text: str = "") -> Dict:
+    """Placeholder result when no API key is configured."""
+    return _placeholder_result(
+        text,
+        "AI analysis unavailable. Your entry has been saved.",
+        ["Take a moment to reflect on your day", "Consider talking to someone you trust"],
+        "none",
+    )
+
+
+def _error_result(text: str = "", summary: str = "Analysis unavailable. Your entry has been saved.") -> Dict:
+    """Placeholder result when the analysis failed."""
+    return _placeholder_result(
+        text,
+        summary,
+        ["Take a moment to reflect", "Consider talking to someone"],
+        "error",
+    )
+
+
+def _is_provider_failure(e: Exception) -> bool:
+    """Errors that mean the provider is overloaded or unreachable (retryable, count against the breaker)."""
+    if isinstance(e, (RateLimitError, APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def _api_error_result(text: str, e: Exception) -> Dict:
+    """Log an OpenAI error and turn it into a user-friendly placeholder result."""
+    # Fail-fast rejections are expected while degraded; don't flood the log
+    if isinstance(e, (rate_limit.CircuitOpenError, rate_limit.RateLimitExceeded)):
+        logging.warning(f"OpenAI call skipped: {e}")
+    else:
+        logging.error(f"OpenAI API error: {e}")
+    
+    # User-friendly error messages
+    if isinstance(e, AuthenticationError):
+        user_message = "API key is invalid or expired. Please check your OpenAI API key in settings. Your entry has been saved."
+    elif isinstance(e, (RateLimitError, rate_limit.RateLimitExceeded)):
+        user_message = "API rate limit reached. Please try again later. Your entry has been saved."
+    elif isinstance(e, rate_limit.CircuitOpenError) or _is_provider_failure(e):
+        user_message = "OpenAI service is temporarily unavailable. Please try again later. Your entry has been saved."
+    else:
+        user_message = "AI analysis is temporarily unavailable. Your entry has been saved."
+    
+    return _error_result(text, user_message)
+
+
+def _estimate_request_tokens(kwargs: Dict) -> int:
+    """Token reservation for a request: locally counted prompt tokens plus the completion cap."""
+    return token_budget.count_message_tokens(kwargs["messages"], kwargs["model"]) + int(kwargs.get("max_tokens", 0))
+
+
+def _reserve_capacity(limiter: rate_limit.ModelLimiter, estimate: int, deadline: float, priority: str) -> float:
+    """Pass the circuit breaker and reserve limiter capacity; returns the wait before sending."""
+    rate_limit.breaker.allow()
+    headroom = 0.0 if priority == "interactive" else AI_BACKGROUND_RATE_HEADROOM
+    try:
+        return limiter.reserve(estimate, max(0.0, deadline - time.monotonic()), headroom)
+    except rate_limit.RateLimitExceeded:
+        rate_limit.breaker.release()
+        raise
+
+
+def _slot_timeout(priority: str, deadline: float) -> Optional[float]:
+    """How long a call may wait for a scheduler slot: interactive calls share the request deadline."""
+    if priority != "interactive":
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def _retry_delay(limiter: rate_limit.ModelLimiter, e: Exception, attempt: int, deadline: float) -> float:
+    """Record a failed call and return the wait before retrying it; re-raises when giving up."""
+    if not _is_provider_failure(e):
+        # The provider answered - the request itself was rejected (bad key, bad request)
+        rate_limit.breaker.record_success()
+        raise e
+    
+    rate_limit.breaker.record_failure()
+    retry_after = rate_limit.retry_after_seconds(e)
+    if retry_after is not None:
+        limiter.pause(retry_after)
+    delay = retry_after if retry_after is not None else rate_limit.backoff_delay(attempt)
+    if attempt >= OPENAI_MAX_RETRIES or time.monotonic() + delay > deadline:
+        raise e
+    return delay
+
+
+def _record_success(limiter: rate_limit.ModelLimiter, estimate: int, response):
+    """Close the breaker and settle the token reservation against actual usage."""
+    rate_limit.breaker.record_success()
+    usage = getattr(response, "usage", None)
+    if usage:
+        limiter.settle(estimate, usage.total_tokens)
+
+
+# Telemetry row ids of the OpenAI calls made for the analysis in progress
+_request_ids: ContextVar[Optional[List[int]]] = ContextVar("ai_request_ids", default=None)
+
+
+@contextmanager
+def _collect_request_ids():
+    """Collect the ai_request ids of calls made inside the block."""
+    ids: List[int] = []
+    token = _request_ids.set(ids)
+    try:
+        yield ids
+    finally:
+        _request_ids.reset(token)
+
+
+def _request_outcome(e: Exception) -> str:
+    """ai_request outcome for a failed call."""
+    if isinstance(e, rate_limit.CircuitOpenError):
+        return "circuit_open"
+    if isinstance(e, rate_limit.RateLimitExceeded):
+        return "throttled"
+    if isinstance(e, RateLimitError):
+        return "rate_limited"
+    if isinstance(e, APITimeoutError):
+        return "timeout"
+    if isinstance(e, APIConnectionError):
+        return "connection_error"
+    if isinstance(e, AuthenticationError):
+        return "auth_error"
+    if isinstance(e, APIStatusError) and e.status_code >= 500:
+        return "server_error"
+    return "error"
+
+
+def _record_request(
+    model: str,
+    kind: str,
+    entries: int,
+    started: float,
+    retries: int,
+    outcome: str,
+    usage=None,
+    route: str = "fast",
+) -> Optional[int]:
+    """Write one ai_request telemetry row; never lets telemetry break an analysis."""
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
     try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.2,
-            max_tokens=500,
+        request_id = record_ai_request(
+            model=model,
+            kind=kind,
+            route=route,
+            entries=entries,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            cost_usd=calculate_request_cost(model, prompt_tokens, completion_tokens, cached_tokens),
+            latency_ms=(time.monotonic() - started) * 1000.0,
+            retries=retries,
+            outcome=outcome,
         )
-        
-        content = response.choices[0].message.content
-        model_used = response.model
-        tokens = response.usage.total_tokens if response.usage else 0
-        
-        # Extract JSON from response
-        json_str = content.strip()
-        if "```json" in json_str:
-            json_str = re.search(r"```json\s*(.*?)\s*```", json_str, re.DOTALL).group(1)
-        elif "```" in json_str:
-            json_str = re.search(r"```\s*(.*?)\s*```", json_str, re.DOTALL).group(1)
-        elif "{" in json_str:
-            json_str = re.search(r"\{.*\}", json_str, re.DOTALL).group(0)
-        
-        data = json.loads(json_str)
-        
-        # Sanitize and normalize
-        sentiment = max(-1.0, min(1.0, float(data.get("sentiment", 0.0))))
-        mood_score = int((sentiment + 1) * 50)
-        
-        # Normalize emotions
-        emotions = data.get("emotions", {})
-        # Ensure all emotions are present
-        for emotion in EMOTIONS:
-            if emotion not in emotions:
-                emotions[emotion] = 0.0
-        
-        # Normalize to sum to 1
-        total = sum(float(v) for v in emotions.values())
-        if total == 0:
-            emotions = {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS}
+    except Exception as e:
+        logging.warning(f"Could not record AI request telemetry: {e}")
+        return None
+    
+    ids = _request_ids.get()
+    if ids is not None:
+        ids.append(request_id)
+    return request_id
+
+
+def _create_completion(
+    client: OpenAI,
+    request_kind: str = "analysis",
+    entries: int = 1,
+    route: str = "fast",
+    **kwargs,
+):
+    """
+    chat.completions.create behind the shared limiter, retry policy and circuit breaker.
+    
+    Waits for requests/tokens-per-minute capacity, honors Retry-After, retries
+    provider failures with jittered exponential backoff, and raises
+    rate_limit.CircuitOpenError / RateLimitExceeded instead of waiting longer
+    than OPENAI_MAX_WAIT_SECONDS. Every call is recorded in ai_request
+    (streamed calls are recorded by the caller once their usage arrives).
+    
+    Each attempt holds a scheduler slot of the context's priority class;
+    background classes wait for one as long as it takes.
+    """
+    limiter = rate_limit.get_limiter(kwargs["model"])
+    estimate = _estimate_request_tokens(kwargs)
+    priority = current_priority()
+    started = time.monotonic()
+    deadline = started + OPENAI_MAX_WAIT_SECONDS
+    attempt = 0
+    
+    try:
+        while True:
+            error = None
+            with scheduler.slot(priority, _slot_timeout(priority, deadline)):
+                wait = _reserve_capacity(limiter, estimate, deadline, priority)
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    response = client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                time.sleep(_retry_delay(limiter, error, attempt, deadline))
+                attempt += 1
+                continue
+            _record_success(limiter, estimate, response)
+            break
+    except Exception as e:
+        _record_request(kwargs["model"], request_kind, entries, started, attempt, _request_outcome(e), route=route)
+        raise
+    
+    if not kwargs.get("stream"):
+        model = getattr(response, "model", None) or kwargs["model"]
+        _record_request(model, request_kind, entries, started, attempt, "ok", getattr(response, "usage", None), route)
+    return response
+
+
+async def _create_completion_async(
+    client: AsyncOpenAI,
+    request_kind: str = "analysis",
+    entries: int = 1,
+    route: str = "fast",
+    **kwargs,
+):
+    """Async version of _create_completion (sleeps without blocking the event loop)."""
+    limiter = rate_limit.get_limiter(kwargs["model"])
+    estimate = _estimate_request_tokens(kwargs)
+    priority = current_priority()
+    started = time.monotonic()
+    deadline = started + OPENAI_MAX_WAIT_SECONDS
+    attempt = 0
+    
+    try:
+        while True:
+            error = None
+            await scheduler.acquire_async(priority, _slot_timeout(priority, deadline))
+            try:
+                wait = _reserve_capacity(limiter, estimate, deadline, priority)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    response = await client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    error = e
+            finally:
+                scheduler.release(priority)
+            if error is not None:
+                await asyncio.sleep(_retry_delay(limiter, error, attempt, deadline))
+                attempt += 1
+                continue
+            _record_success(limiter, estimate, response)
+            break
+    except Exception as e:
+        await asyncio.to_thread(
+            _record_request, kwargs["model"], request_kind, entries, started, attempt, _request_outcome(e), None, route
+        )
+        raise
+    
+    model = getattr(response, "model", None) or kwargs["model"]
+    await asyncio.to_thread(
+        _record_request, model, request_kind, entries, started, attempt, "ok", getattr(response, "usage", None), route
+    )
+    return response
+
+
+def _route_model(text: str) -> Tuple[str, str]:
+    """(model, route) for the first analysis attempt: long entries go straight to the strong model."""
+    if OPENAI_STRONG_MODEL and len(text) > ROUTER_SHORT_MAX_CHARS:
+        return OPENAI_STRONG_MODEL, "strong"
+    return OPENAI_MODEL, "fast"
+
+
+def _escalation_reason(text: str, route: str, result: Dict) -> Optional[str]:
+    """Why a fast-route result is too low-confidence to keep (None to keep it)."""
+    if route != "fast" or not OPENAI_STRONG_MODEL:
+        return None
+    if max(result["emotions"].values()) <= ROUTER_FLAT_EMOTION_MAX:
+        return "flat_emotions"
+    if abs(result["sentiment"]) < ROUTER_NEUTRAL_SENTIMENT:
+        # Near-neutral sentiment is suspicious only when the wording itself is strong
+        wording, _ = lexicon.score_emotions(text)
+        if abs(wording) >= ROUTER_STRONG_WORDING:
+            return "neutral_sentiment"
+    return None
+
+
+def _analyze_with_model(client: OpenAI, sent: str, tags: Optional[List[str]], model: str, route: str) -> Dict:
+    """One analysis of sent on model, retried once with the stricter prompt; raises JSONDecodeError if both fail."""
+    try:
+        response = _create_completion(client, route=route, **_completion_kwargs(sent, tags, model))
+        return _parse_response(response)
+    except json.JSONDecodeError:
+        response = _create_completion(client, request_kind="retry", route=route, **_retry_completion_kwargs(sent, model))
+        return _parse_response(response)
+
+
+def _escalate(client: OpenAI, sent: str, tags: Optional[List[str]], first: Optional[Dict], reason: str) -> Dict:
+    """Re-run an analysis of the budgeted text on the strong model; keeps the first result if escalation fails."""
+    logging.info(f"Escalating analysis to {OPENAI_STRONG_MODEL}: {reason}")
+    try:
+        escalated = _analyze_with_model(client, sent, tags, OPENAI_STRONG_MODEL, "escalated")
+    except Exception as e:
+        if first is None:
+            raise
+        logging.warning(f"Escalation failed, keeping the first result: {e}")
+        return first
+    if first is not None:
+        escalated["tokens"] += first["tokens"]
+    return escalated
+
+
+def _analyze_routed(client: OpenAI, text: str, sent: str, tags: Optional[List[str]]) -> Dict:
+    """
+    Analyze on the routed model and escalate low-confidence or unparseable fast results.
+    
+    Routing and escalation look at the full text; the requests send sent, the
+    text after the input budget.
+    """
+    model, route = _route_model(text)
+    try:
+        result = _analyze_with_model(client, sent, tags, model, route)
+    except json.JSONDecodeError:
+        if route != "fast" or not OPENAI_STRONG_MODEL:
+            raise
+        return _escalate(client, sent, tags, None, "parse_failure")
+    
+    reason = _escalation_reason(text, route, result)
+    return _escalate(client, sent, tags, result, reason) if reason else result
+
+
+def _entry_sentences(sent: str) -> List[str]:
+    """Sentences of the budgeted entry text that are scored one by one."""
+    return token_budget.split_sentences(sent) or [sent.strip()]
+
+
+def _sentence_cache_key(sentence: str, model: str) -> str:
+    """Sentence score cache key under the current model and sentence prompt."""
+    return analysis_cache.cache_key(sentence, None, model, f"{PROMPT_VERSION}/{SENTENCE_SYSTEM_PROMPT}")
+
+
+def _sentence_cache_get(keys: List[str]) -> Dict[str, Dict]:
+    """Memoized sentence scores; cache errors count as misses."""
+    try:
+        return analysis_cache.get_sentences(keys)
+    except Exception as e:
+        logging.warning(f"Sentence cache lookup failed: {e}")
+        return {}
+
+
+def _sentence_cache_put(scores: Dict[str, Dict]):
+    """Memoize fresh sentence scores; a failed store never fails the analysis."""
+    try:
+        analysis_cache.put_sentences(scores)
+    except Exception as e:
+        logging.warning(f"Sentence cache store failed: {e}")
+
+
+def _plan_sentences(sentences: List[str], model: str, cached: Dict[str, Dict]) -> Tuple[List[str], List[str]]:
+    """
+    (key per sentence, distinct sentences still to score), recording the tokens the hits saved.
+    
+    A hit saves the sentence's prompt tokens and its share of the completion.
+    """
+    keys = [_sentence_cache_key(sentence, model) for sentence in sentences]
+    missing: Dict[str, str] = {}
+    saved = 0
+    for key, sentence in zip(keys, sentences):
+        if key in cached:
+            saved += token_budget.count_tokens(sentence, model) + SENTENCE_COMPLETION_TOKENS
         else:
-            emotions = {k: max(0.0, float(v)) / total for k, v in emotions.items()}
-        
-        # Get summary and suggestions
-        summary = data.get("summary", "No summary available.")
-        if len(summary) > 320:
-            summary = summary[:317] + "..."
+            missing.setdefault(key, sentence)
+    if saved:
+        analysis_cache.record_sentence_savings(saved)
+    return keys, list(missing.values())
+
+
+def _sentence_kwargs(sentences: List[str], model: str) -> Dict:
+    """chat.completions.create arguments that score each sentence separately."""
+    items = [{"id": str(index), "text": sentence} for index, sentence in enumerate(sentences)]
+    prompt = f'''Sentences (JSON array): {json.dumps(items, ensure_ascii=False)}
+
+Score each sentence on its own. Return a JSON array with one object per sentence, each with keys:
+- id (the sentence's id, unchanged)
+- sentiment (float between -1 and 1)
+- emotions (object with keys: joy, sad, anger, fear, anticipation, trust, surprise, disgust; values should sum to 1)
+
+Return only valid JSON, no other text.'''
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SENTENCE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+        "max_tokens": SENTENCE_COMPLETION_TOKENS * len(sentences) + 20,
+    }
+
+
+def _parse_sentence_scores(response, sentences: List[str], model: str) -> Dict[str, Dict]:
+    """
+    Sentence key -> score from a sentence-scoring response.
+    
+    Raises JSONDecodeError unless every sentence got a valid score, so the
+    caller can fall back to analyzing the whole entry.
+    """
+    data = _extract_json(response.choices[0].message.content)
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    if not isinstance(data, list):
+        data = []
+    
+    scores: Dict[int, Dict] = {}
+    for element in data:
+        if not isinstance(element, dict):
+            continue
+        try:
+            index = int(element.get("id"))
+            normalized = _normalize_result(element, "", 0)
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if 0 <= index < len(sentences) and index not in scores:
+            scores[index] = {"sentiment": normalized["sentiment"], "emotions": normalized["emotions"]}
+    
+    if len(scores) < len(sentences):
+        raise json.JSONDecodeError(f"{len(sentences) - len(scores)} sentence score(s) missing", "", 0)
+    return {_sentence_cache_key(sentences[index], model): score for index, score in scores.items()}
+
+
+def _aggregate_sentences(sentences: List[str], scores: List[Dict]) -> Dict:
+    """Entry sentiment and emotions as the mean of sentence scores weighted by sentence length."""
+    weights = [len(sentence) for sentence in sentences]
+    total = sum(weights) or 1
+    return {
+        "sentiment": sum(weight * score["sentiment"] for weight, score in zip(weights, scores)) / total,
+        "emotions": {
+            emotion: sum(weight * score["emotions"].get(emotion, 0.0) for weight, score in zip(weights, scores)) / total
+            for emotion in EMOTIONS
+        },
+    }
+
+
+def _summary_kwargs(sent: str, tags: Optional[List[str]], result: Dict, model: str) -> Dict:
+    """chat.completions.create arguments for the summary and suggestions of already scored (budgeted) text."""
+    tags_str = ", ".join(tags) if tags else "none"
+    emotions = result["emotions"]
+    strongest = ", ".join(sorted(emotions, key=emotions.get, reverse=True)[:2])
+    prompt = f'''Text: """{sent}"""
+
+Tags: {tags_str}
+
+Overall sentiment: {result["sentiment"]:.2f}. Strongest emotions: {strongest}.
+
+Return JSON with keys:
+- summary (string, max 320 characters)
+- suggestions (array of exactly 2 short strings)
+
+Return only valid JSON, no other text.'''
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+        "max_tokens": SUMMARY_COMPLETION_TOKENS,
+    }
+
+
+def _merge_summary(result: Dict, response) -> Dict:
+    """Add the summary and suggestions from a summary response (raises on an invalid one)."""
+    data = _extract_json(response.choices[0].message.content)
+    if not isinstance(data, dict) or not data.get("summary"):
+        raise ValueError("Summary response has no summary")
+    parsed = _normalize_result(data, "", 0)
+    tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+    return {
+        **result,
+        "summary": parsed["summary"],
+        "suggestions": parsed["suggestions"],
+        "tokens": result["tokens"] + tokens,
+    }
+
+
+def _local_summary(result: Dict) -> Dict:
+    """Summary and lexicon suggestions without another request."""
+    top_emotion = max(result["emotions"], key=result["emotions"].get)
+    return {
+        **result,
+        "summary": f"Scored sentence by sentence: your words lean towards {top_emotion}.",
+        "suggestions": lexicon.SUGGESTIONS.get(top_emotion, lexicon.SUGGESTIONS["neutral"]),
+    }
+
+
+def _analyze_by_sentence(client: OpenAI, text: str, sent: str, tags: Optional[List[str]]) -> Dict:
+    """
+    Analyze text sentence by sentence, sending only sentences without a memoized score.
+    
+    The missing sentences are scored in one request and memoized; the entry's
+    sentiment and emotions are their length-weighted mean, so a re-submitted or
+    lightly edited entry only pays for what changed. Low-confidence fast results
+    escalate like whole-entry ones. The summary and suggestions come from a
+    second request on the same routed model (ANALYSIS_SUMMARY_ENABLED), so a
+    new entry costs two requests instead of one; without it the lexicon
+    suggestions are used. sent is text after the input budget. Raises
+    JSONDecodeError if the sentence scores are unusable.
+    """
+    model, route = _route_model(text)
+    sentences = _entry_sentences(sent)
+    cached = _sentence_cache_get([_sentence_cache_key(sentence, model) for sentence in sentences])
+    keys, missing = _plan_sentences(sentences, model, cached)
+    
+    model_used, tokens = model, 0
+    if missing:
+        response = _create_completion(client, request_kind="sentences", route=route, **_sentence_kwargs(missing, model))
+        fresh = _parse_sentence_scores(response, missing, model)
+        _sentence_cache_put(fresh)
+        cached = {**cached, **fresh}
+        model_used = getattr(response, "model", None) or model
+        tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+    
+    result = _normalize_result(_aggregate_sentences(sentences, [cached[key] for key in keys]), model_used, tokens)
+    reason = _escalation_reason(text, route, result)
+    if reason:
+        return _escalate(client, sent, tags, result, reason)
+    
+    if not ANALYSIS_SUMMARY_ENABLED:
+        return _local_summary(result)
+    try:
+        # The entry was already counted by its sentence request, if there was one
+        response = _create_completion(
+            client,
+            request_kind="summary",
+            entries=0 if missing else 1,
+            route=route,
+            **_summary_kwargs(sent, tags, result, model),
+        )
+        return _merge_summary(result, response)
+    except Exception as e:
+        logging.warning(f"Summary request failed, using local suggestions: {e}")
+        return _local_summary(result)
+
+
+def _analyze_text_uncached(text: str, tags: Optional[List[str]] = None) -> Dict:
+    """Run the OpenAI analysis for one text (no caching)."""
+    client = get_client()
+    
+    # If no API key, return default values
+    if not client:
+        return _unavailable_result(text)
+    
+    # Condense once; every request for this entry sends the same budgeted text
+    sent = token_budget.budget_text(text, _route_model(text)[0])
+    try:
+        if ANALYSIS_SENTENCE_MEMO:
+            try:
+                return _analyze_by_sentence(client, text, sent, tags)
+            except json.JSONDecodeError as e:
+                logging.warning(f"Sentence scoring failed, analyzing the whole entry: {e}")
+        return _analyze_routed(client, text, sent, tags)
+    
+    except json.JSONDecodeError:
+        # Final fallback after the stricter-prompt retry (and escalation) failed
+        return _error_result(text)
+    
+    except Exception as e:
+        return _api_error_result(text, e)
+
+
+# Sections yielded by analyze_text_stream, in this order
+STREAM_SECTIONS = ("sentiment", "emotions", "summary", "suggestions")
+
+# Match a section's JSON value once it is complete inside a partial response
+_STREAM_PATTERNS = {
+    "sentiment": re.compile(r'"sentiment"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*[,}\n]'),
+    "emotions": re.compile(r'"emotions"\s*:\s*(\{[^{}]*\})'),
+    "summary": re.compile(r'"summary"\s*:\s*("(?:[^"\\]|\\.)*")'),
+    "suggestions": re.compile(r'"suggestions"\s*:\s*(\[(?:[^\[\]"]|"(?:[^"\\]|\\.)*")*\])'),
+}
+
+
+def _partial_section(content: str, section: str) -> Optional[Any]:
+    """Normalized value of one section if it is already complete in a partial response."""
+    match = _STREAM_PATTERNS[section].search(content)
+    if not match:
+        return None
+    try:
+        raw = json.loads(match.group(1))
+        return _normalize_result({section: raw}, "", 0)[section]
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
+def _result_sections(result: Dict, start: int = 0) -> Iterator[Tuple[str, Any]]:
+    """Yield a finished result section by section, then the result itself."""
+    for section in STREAM_SECTIONS[start:]:
+        yield section, result[section]
+    yield "result", result
+
+
+def analyze_text_stream(text: str, tags: Optional[List[str]] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Analyze text like analyze_text, yielding sections as soon as they can be parsed.
+    
+    Yields (section, value) pairs in STREAM_SECTIONS order while the response
+    streams in, then ("result", result) with the final validated result - the
+    one to persist, which may differ from partial values if the response turned
+    out to be invalid. Cached, lexicon and placeholder results come all at once.
+    Streamed responses always cover the whole entry, so with ANALYSIS_SENTENCE_MEMO
+    the sentence-level analysis runs instead and its result comes all at once.
+    """
+    if _use_lexicon():
+        yield from _result_sections(lexicon.score_text(text))
+        return
+    
+    if ANALYSIS_SENTENCE_MEMO:
+        yield from _result_sections(analyze_text(text, tags))
+        return
+    
+    key = _cache_key(text, tags)
+    cached = _cache_get(key)
+    if cached:
+        yield from _result_sections(cached)
+        return
+    
+    distilled = _distilled_result(text)
+    if distilled:
+        yield from _result_sections(distilled)
+        return
+    
+    client = get_client()
+    if not client:
+        yield from _result_sections(_unavailable_result(text))
+        return
+    
+    # A request for the same text is already streaming: wait for its final result
+    future, leader = analysis_cache.join_flight(key)
+    if not leader:
+        try:
+            result = analysis_cache.as_shared(future.result())
+        except Exception as e:
+            result = _api_error_result(text, e)
+        yield from _result_sections(result)
+        return
+    
+    result = None
+    streamed = 0
+    request_ids: List[Optional[int]] = []
+    try:
+        try:
+            content: List[str] = []
+            model, route = _route_model(text)
+            sent = token_budget.budget_text(text, model)
+            model_used, tokens, usage = model, 0, None
+            started = time.monotonic()
+            stream = _create_completion(
+                client,
+                request_kind="stream",
+                route=route,
+                stream=True,
+                stream_options={"include_usage": True},
+                **_completion_kwargs(sent, tags, model),
+            )
+            for chunk in stream:
+                model_used = getattr(chunk, "model", None) or model_used
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                    tokens = usage.total_tokens
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                content.append(chunk.choices[0].delta.content)
+                
+                partial = "".join(content)
+                while streamed < len(STREAM_SECTIONS):
+                    value = _partial_section(partial, STREAM_SECTIONS[streamed])
+                    if value is None:
+                        break
+                    yield STREAM_SECTIONS[streamed], value
+                    streamed += 1
+            
+            # Streamed calls are recorded here, once the final chunk has carried the usage
+            request_ids.append(_record_request(model_used, "stream", 1, started, 0, "ok", usage, route))
+            result = _normalize_result(_extract_json("".join(content)), model_used, tokens)
+            
+            # Low-confidence fast answers are redone on the strong model; the final result replaces the streamed one
+            reason = _escalation_reason(text, route, result)
+            if reason:
+                with _collect_request_ids() as escalation_ids:
+                    result = _escalate(client, sent, tags, result, reason)
+                request_ids.extend(escalation_ids)
         
-        suggestions = data.get("suggestions", [])
-        if not isinstance(suggestions, list):
-            suggestions = []
-        suggestions = [str(s) for s in suggestions[:2]]
-        while len(suggestions) < 2:
-            suggestions.append("Take care of yourself today")
+        except json.JSONDecodeError:
+            # Retry once with stricter prompt (not streamed), then escalate if the fast model still fails
+            with _collect_request_ids() as retry_ids:
+                try:
+                    try:
+                        response = _create_completion(
+                            client, request_kind="retry", route=route, **_retry_completion_kwargs(sent, model)
+                        )
+                        result = _parse_response(response)
+                    except json.JSONDecodeError:
+                        if route != "fast" or not OPENAI_STRONG_MODEL:
+                            raise
+                        result = _escalate(client, sent, tags, None, "parse_failure")
+                except Exception:
+                    result = _error_result(text)
+            request_ids.extend(retry_ids)
         
-        return {
-            "sentiment": sentiment,
-            "mood_score": mood_score,
-            "emotions": emotions,
-            "summary": summary,
-            "suggestions": suggestions,
-            "model_used": model_used,
-            "tokens": tokens,
-        }
+        except Exception as e:
+            result = _api_error_result(text, e)
         
-    except json.JSONDecodeError:
-        # Retry once with stricter prompt
+        _cache_put(key, result)
+        result = {**result, "request_ids": [request_id for request_id in request_ids if request_id]}
+    finally:
+        # Followers must not hang if this generator is abandoned mid-stream
+        if result is None:
+            analysis_cache.finish_flight(key, future, error=RuntimeError("Streaming analysis was interrupted"))
+        else:
+            analysis_cache.finish_flight(key, future, result=result)
+    
+    yield from _result_sections(result, start=streamed)
+
+
+def _build_packed_prompt(items: List[Tuple[str, str, Optional[List[str]]]]) -> str:
+    """User prompt asking for one result per (id, budgeted text, tags) item."""
+    entries = [{"id": item_id, "text": text, "tags": tags or []} for item_id, text, tags in items]
+    return f'''Entries (JSON array): {json.dumps(entries, ensure_ascii=False)}
+
+Analyze each entry independently. Return a JSON array with one object per entry, each with keys:
+- id (the entry's id, unchanged)
+- sentiment (float between -1 and 1)
+- emotions (object with keys: joy, sad, anger, fear, anticipation, trust, surprise, disgust; values should sum to 1)
+- summary (string, max 320 characters)
+- suggestions (array of exactly 2 short strings)
+
+Return only valid JSON, no other text.'''
+
+
+def _split_tokens(total: int, texts: List[str]) -> List[int]:
+    """Split a request's token count across its entries in proportion to text length."""
+    weights = [len(text) + 1 for text in texts]
+    shares = [total * weight // sum(weights) for weight in weights]
+    # Hand the rounding remainder to the last entry so the shares add up exactly
+    shares[-1] += total - sum(shares)
+    return shares
+
+
+def _analyze_pack(client: OpenAI, items: List[Tuple[str, str, Optional[List[str]]]]) -> Dict[str, Dict]:
+    """
+    Analyze several (id, budgeted text, tags) items in one request.
+    
+    Returns:
+        dict of item id -> normalized result, for the items the model answered validly
+    """
+    response = _create_completion(
+        client,
+        request_kind="packed",
+        entries=len(items),
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _build_packed_prompt(items)},
+        ],
+        temperature=0.2,
+        max_tokens=300 * len(items),
+    )
+    total_tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+    texts = {item_id: text for item_id, text, _ in items}
+    
+    data = _extract_json(response.choices[0].message.content)
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    if not isinstance(data, list):
+        return {}
+    
+    results = {}
+    for element in data:
+        if not isinstance(element, dict):
+            continue
+        item_id = str(element.get("id", ""))
+        if item_id not in texts or item_id in results:
+            continue
         try:
-            retry_prompt = f'''Text: """{text}"""
+            results[item_id] = _normalize_result(element, response.model, 0)
+        except (TypeError, ValueError, AttributeError):
+            continue
+    
+    # The whole request's tokens are charged to the entries it actually answered
+    if results:
+        shares = _split_tokens(total_tokens, [texts[item_id] for item_id in results])
+        for result, share in zip(results.values(), shares):
+            result["tokens"] = share
+    return results
 
-Return JSON only with keys: sentiment (float -1 to 1), emotions (object with keys: joy, sad, anger, fear, anticipation, trust, surprise, disgust; values sum to 1), summary (string), suggestions (array of 2 strings).
 
-JSON:'''
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Return only valid JSON. No other text."},
-                    {"role": "user", "content": retry_prompt},
-                ],
-                temperature=0.1,
-                max_tokens=500,
+def analyze_packed(
+    texts: List[str],
+    tags: Optional[List[Optional[List[str]]]] = None,
+    pack_size: int = ANALYSIS_PACK_SIZE,
+) -> List[Dict]:
+    """
+    Analyze many texts with several entries per request (for bulk paths).
+    
+    Packing amortizes the system prompt and JSON instructions over pack_size
+    entries. Each element of the returned array is validated with the normal
+    normalization; any item that is missing or invalid falls back to a single
+    analyze_text call. Tokens are attributed per entry in proportion to text
+    length, and each result carries the request_ids of the shared call so the
+    caller can link it to every entry. Results come back in input order.
+    """
+    if _use_lexicon():
+        return lexicon.score_many(texts)
+    
+    tags = tags or [None] * len(texts)
+    results: List[Optional[Dict]] = [None] * len(texts)
+    keys = [_cache_key(text, item_tags) for text, item_tags in zip(texts, tags)]
+    
+    pending = []
+    for index, key in enumerate(keys):
+        cached = _cache_get(key) or _distilled_result(texts[index])
+        if cached:
+            results[index] = cached
+        elif _route_model(texts[index])[1] == "fast":
+            # Entries routed to the strong model skip packing and go through analyze_text
+            pending.append(index)
+    
+    client = get_client()
+    # A pack of one saves nothing; it goes through analyze_text (routing, coalescing)
+    if client and pack_size > 1 and len(pending) > 1:
+        for start in range(0, len(pending), pack_size):
+            pack = pending[start:start + pack_size]
+            sent = {index: token_budget.budget_text(texts[index], OPENAI_MODEL) for index in pack}
+            items = [(str(index), sent[index], tags[index]) for index in pack]
+            with _collect_request_ids() as pack_ids:
+                try:
+                    answered = _analyze_pack(client, items)
+                except Exception as e:
+                    logging.warning(f"Packed analysis failed, falling back to single requests: {e}")
+                    answered = {}
+            for index in pack:
+                result = answered.get(str(index))
+                if result:
+                    with _collect_request_ids() as escalation_ids:
+                        reason = _escalation_reason(texts[index], "fast", result)
+                        if reason:
+                            result = _escalate(client, sent[index], tags[index], result, reason)
+                    _cache_put(keys[index], result)
+                    # Every entry of the pack links to the shared call, so usage counts it once
+                    results[index] = {**result, "request_ids": pack_ids + escalation_ids}
+    
+    # Anything the packed requests didn't cover gets the normal single-entry path
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = analyze_text(texts[index], tags[index])
+    
+    return results
+
+
+# Async clients are bound to the event loop that created their connection pool
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> Optional[AsyncOpenAI]:
+    """Get the AsyncOpenAI client for the running event loop (rebuilt when the key changes)."""
+    api_key = _resolve_api_key()
+    if not api_key:
+        return None
+    
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        cached = _async_clients.get(loop)
+        if cached and cached[0] == api_key:
+            return cached[1]
+        try:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=OPENAI_BASE_URL or None,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    ),
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+                ),
+                timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+                max_retries=0,
             )
-            content = response.choices[0].message.content
-            json_str = re.search(r"\{.*\}", content, re.DOTALL).group(0)
-            data = json.loads(json_str)
-            
-            # Same sanitization as above
-            sentiment = max(-1.0, min(1.0, float(data.get("sentiment", 0.0))))
-            mood_score = int((sentiment + 1) * 50)
-            emotions = data.get("emotions", {})
-            for emotion in EMOTIONS:
-                if emotion not in emotions:
-                    emotions[emotion] = 0.0
-            total = sum(float(v) for v in emotions.values()) or 1.0
-            emotions = {k: max(0.0, float(v)) / total for k, v in emotions.items()}
-            summary = data.get("summary", "No summary available.")[:320]
-            suggestions = data.get("suggestions", [])[:2]
-            while len(suggestions) < 2:
-                suggestions.append("Take care of yourself today")
-            
-            return {
-                "sentiment": sentiment,
-                "mood_score": mood_score,
-                "emotions": emotions,
-                "summary": summary,
-                "suggestions": suggestions,
-                "model_used": response.model,
-                "tokens": response.usage.total_tokens if hasattr(response, 'usage') else 0,
-            }
         except Exception:
-            # Final fallback
-            return {
-                "sentiment": 0.0,
-                "mood_score": 50,
-                "emotions": {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS},
-                "summary": "Analysis unavailable. Your entry has been saved.",
-                "suggestions": ["Take a moment to reflect", "Consider talking to someone"],
-                "model_used": "error",
-                "tokens": 0,
-            }
+            return None
+        _async_clients[loop] = (api_key, client)
+        return client
+
+
+async def analyze_text_async(text: str, tags: Optional[List[str]] = None) -> Dict:
+    """Async version of analyze_text (same caching, retry and normalization)."""
+    if _use_lexicon():
+        return lexicon.score_text(text)
     
+    key = _cache_key(text, tags)
+    # Cache I/O is blocking SQLite work, so keep it off the event loop
+    cached = await asyncio.to_thread(_cache_get, key)
+    if cached:
+        return cached
+    
+    distilled = _distilled_result(text)
+    if distilled:
+        return distilled
+    
+    async def compute() -> Dict:
+        with _collect_request_ids() as request_ids:
+            result = await _analyze_text_uncached_async(text, tags)
+        await asyncio.to_thread(_cache_put, key, result)
+        return {**result, "request_ids": request_ids}
+    
+    return await analysis_cache.single_flight_async(key, compute)
+
+
+async def _analyze_with_model_async(
+    client: AsyncOpenAI, sent: str, tags: Optional[List[str]], model: str, route: str
+) -> Dict:
+    """Async _analyze_with_model."""
+    try:
+        response = await _create_completion_async(client, route=route, **_completion_kwargs(sent, tags, model))
+        return _parse_response(response)
+    except json.JSONDecodeError:
+        response = await _create_completion_async(
+            client, request_kind="retry", route=route, **_retry_completion_kwargs(sent, model)
+        )
+        return _parse_response(response)
+
+
+async def _escalate_async(
+    client: AsyncOpenAI, sent: str, tags: Optional[List[str]], first: Optional[Dict], reason: str
+) -> Dict:
+    """Async _escalate."""
+    logging.info(f"Escalating analysis to {OPENAI_STRONG_MODEL}: {reason}")
+    try:
+        escalated = await _analyze_with_model_async(client, sent, tags, OPENAI_STRONG_MODEL, "escalated")
     except Exception as e:
-        # Graceful degradation - log error for debugging
-        import logging
-        error_msg = str(e)
-        logging.error(f"OpenAI API error: {error_msg}")
-        
-        # User-friendly error messages
-        if "401" in error_msg or "Incorrect API key" in error_msg or "Invalid API key" in error_msg:
-            user_message = "API key is invalid or expired. Please check your OpenAI API key in settings. Your entry has been saved."
-        elif "429" in error_msg or "rate limit" in error_msg.lower():
-            user_message = "API rate limit reached. Please try again later. Your entry has been saved."
-        elif "500" in error_msg or "503" in error_msg:
-            user_message = "OpenAI service is temporarily unavailable. Please try again later. Your entry has been saved."
-        else:
-            user_message = "AI analysis is temporarily unavailable. Your entry has been saved."
+        if first is None:
+            raise
+        logging.warning(f"Escalation failed, keeping the first result: {e}")
+        return first
+    if first is not None:
+        escalated["tokens"] += first["tokens"]
+    return escalated
+
+
+async def _analyze_by_sentence_async(client: AsyncOpenAI, text: str, sent: str, tags: Optional[List[str]]) -> Dict:
+    """Async _analyze_by_sentence."""
+    model, route = _route_model(text)
+    sentences = _entry_sentences(sent)
+    cached = await asyncio.to_thread(
+        _sentence_cache_get, [_sentence_cache_key(sentence, model) for sentence in sentences]
+    )
+    keys, missing = _plan_sentences(sentences, model, cached)
+    
+    model_used, tokens = model, 0
+    if missing:
+        response = await _create_completion_async(
+            client, request_kind="sentences", route=route, **_sentence_kwargs(missing, model)
+        )
+        fresh = _parse_sentence_scores(response, missing, model)
+        await asyncio.to_thread(_sentence_cache_put, fresh)
+        cached = {**cached, **fresh}
+        model_used = getattr(response, "model", None) or model
+        tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+    
+    result = _normalize_result(_aggregate_sentences(sentences, [cached[key] for key in keys]), model_used, tokens)
+    reason = _escalation_reason(text, route, result)
+    if reason:
+        return await _escalate_async(client, sent, tags, result, reason)
+    
+    if not ANALYSIS_SUMMARY_ENABLED:
+        return _local_summary(result)
+    try:
+        response = await _create_completion_async(
+            client,
+            request_kind="summary",
+            entries=0 if missing else 1,
+            route=route,
+            **_summary_kwargs(sent, tags, result, model),
+        )
+        return _merge_summary(result, response)
+    except Exception as e:
+        logging.warning(f"Summary request failed, using local suggestions: {e}")
+        return _local_summary(result)
+
+
+async def _analyze_text_uncached_async(text: str, tags: Optional[List[str]] = None) -> Dict:
+    """Run the OpenAI analysis for one text on the async client (no caching)."""
+    client = get_async_client()
+    if not client:
+        return _unavailable_result(text)
+    
+    model, route = _route_model(text)
+    sent = token_budget.budget_text(text, model)
+    if ANALYSIS_SENTENCE_MEMO:
+        try:
+            return await _analyze_by_sentence_async(client, text, sent, tags)
+        except json.JSONDecodeError as e:
+            logging.warning(f"Sentence scoring failed, analyzing the whole entry: {e}")
+        except Exception as e:
+            return _api_error_result(text, e)
+    
+    try:
+        try:
+            result = await _analyze_with_model_async(client, sent, tags, model, route)
+        except json.JSONDecodeError:
+            if route != "fast" or not OPENAI_STRONG_MODEL:
+                raise
+            return await _escalate_async(client, sent, tags, None, "parse_failure")
         
-        return {
-            "sentiment": 0.0,
-            "mood_score": 50,
-            "emotions": {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS},
-            "summary": user_message,
-            "suggestions": ["Take a moment to reflect", "Consider talking to someone"],
-            "model_used": "error",
-            "tokens": 0,
-        }
+        reason = _escalation_reason(text, route, result)
+        return await _escalate_async(client, sent, tags, result, reason) if reason else result
+    
+    except json.JSONDecodeError:
+        return _error_result(text)
+    
+    except Exception as e:
+        return _api_error_result(text, e)
+
+
+async def analyze_many_async(
+    texts: List[str],
+    tags: Optional[List[Optional[List[str]]]] = None,
+    concurrency: int = 8,
+    priority: str = "bulk",
+) -> List[Dict]:
+    """
+    Analyze many texts concurrently, at most `concurrency` requests in flight.
+    
+    The calls run in the scheduler's priority class (bulk by default, so a
+    batch never crowds out check-ins). Results come back in input order. A
+    failure on one item yields an error placeholder for that item only.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tags = tags or [None] * len(texts)
+    
+    async def run_one(text: str, item_tags: Optional[List[str]]) -> Dict:
+        async with semaphore:
+            try:
+                return await analyze_text_async(text, item_tags)
+            except Exception as e:
+                return _api_error_result(text, e)
+    
+    # Tasks copy the context when created, so each one runs in the priority class
+    with use_priority(priority):
+        return await asyncio.gather(*(run_one(text, item_tags) for text, item_tags in zip(texts, tags)))
+
 
+def analyze_many(
+    texts: List[str],
+    tags: Optional[List[Optional[List[str]]]] = None,
+    concurrency: int = 8,
+    priority: str = "bulk",
+) -> List[Dict]:
+    """Blocking wrapper around analyze_many_async for scripts and Streamlit pages."""
+    return asyncio.run(analyze_many_async(texts, tags=tags, concurrency=concurrency, priority=priority))
@@ -0,0 +1,315 @@
+"""Persistent, content-addressed cache for AI analysis results."""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import text as sql_text
+from sqlmodel import Session, select, func
+from core.db import engine, AnalysisCache, SentenceScore
+from core.config import ANALYSIS_CACHE_TTL_SECONDS, ANALYSIS_CACHE_MAX_ENTRIES, SENTENCE_CACHE_MAX_ENTRIES
+
+# Small in-process front so repeat hits skip the database entirely
+MEMORY_CACHE_SIZE = 512
+
+# In-process front for sentence scores (small, and openers like "Today was long." repeat a lot)
+SENTENCE_MEMORY_SIZE = 4096
+
+# Only rewrite last_used_at when it is older than this, so hits stay read-only
+TOUCH_INTERVAL_SECONDS = 300
+
+# Run the TTL/size eviction pass once per this many stores
+EVICT_EVERY_STORES = 32
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, result)
+_sentence_memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, score)
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+    "coalesced": 0,
+    "sentence_hits": 0,
+    "sentence_misses": 0,
+    "sentence_stores": 0,
+    "sentence_tokens_saved": 0,
+}
+_inflight: Dict[str, Future] = {}  # key -> result of the analysis currently running for it
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache keys (case-folded, whitespace collapsed)."""
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+
+def cache_key(text: str, tags: Optional[List[str]], model: str, prompt: str) -> str:
+    """Hash of normalized text, tags, model and prompt version."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    norm_tags = sorted({normalize_text(tag) for tag in (tags or []) if tag.strip()})
+    payload = json.dumps([normalize_text(text), norm_tags, model, prompt_hash], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(
+    key: str,
+    created_at: int,
+    result: Dict,
+    memory: "OrderedDict[str, tuple]" = _memory,
+    size: int = MEMORY_CACHE_SIZE,
+):
+    """Store a result in an in-process LRU front."""
+    with _lock:
+        memory[key] = (created_at, result)
+        memory.move_to_end(key)
+        while len(memory) > size:
+            memory.popitem(last=False)
+
+
+def _as_hit(result: Dict) -> Dict:
+    """Copy of a cached result marked as costing no tokens."""
+    hit = json.loads(json.dumps(result))
+    hit["tokens"] = 0
+    hit["cached"] = True
+    return hit
+
+
+def get(key: str) -> Optional[Dict]:
+    """Return a cached result for key, or None on miss/expiry."""
+    now = int(time.time())
+    
+    with _lock:
+        cached = _memory.get(key)
+        if cached and now - cached[0] < ANALYSIS_CACHE_TTL_SECONDS:
+            _memory.move_to_end(key)
+            _stats["hits"] += 1
+            return _as_hit(cached[1])
+    
+    with Session(engine) as session:
+        row = session.get(AnalysisCache, key)
+        if not row or now - row.created_at >= ANALYSIS_CACHE_TTL_SECONDS:
+            with _lock:
+                _stats["misses"] += 1
+            return None
+        
+        result = json.loads(row.result_json)
+        if now - row.last_used_at >= TOUCH_INTERVAL_SECONDS:
+            row.last_used_at = now
+            session.add(row)
+            session.commit()
+        created_at = row.created_at
+    
+    _remember(key, created_at, result)
+    with _lock:
+        _stats["hits"] += 1
+    return _as_hit(result)
+
+
+def put(key: str, result: Dict):
+    """Store a sanitized analysis result, then enforce TTL and size bounds."""
+    now = int(time.time())
+    stored = {k: v for k, v in result.items() if k not in ("cached", "coalesced", "request_ids")}
+    
+    with Session(engine) as session:
+        row = session.get(AnalysisCache, key)
+        if row is None:
+            row = AnalysisCache(key=key, result_json="{}")
+        row.result_json = json.dumps(stored)
+        row.created_at = now
+        row.last_used_at = now
+        session.add(row)
+        session.commit()
+    
+    _remember(key, now, stored)
+    with _lock:
+        _stats["stores"] += 1
+        due = _stats["stores"] % EVICT_EVERY_STORES == 1
+    if due:
+        _evict(now)
+
+
+def get_sentences(keys: List[str]) -> Dict[str, Dict]:
+    """
+    Memoized scores for the sentence keys that have one.
+    
+    Returns:
+        dict of key -> {"sentiment": float, "emotions": dict}, for hits only
+    """
+    now = int(time.time())
+    found: Dict[str, Dict] = {}
+    with _lock:
+        for key in keys:
+            cached = _sentence_memory.get(key)
+            if cached and now - cached[0] < ANALYSIS_CACHE_TTL_SECONDS:
+                _sentence_memory.move_to_end(key)
+                found[key] = cached[1]
+    
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    if missing:
+        with Session(engine) as session:
+            rows = session.exec(select(SentenceScore).where(SentenceScore.key.in_(missing))).all()
+            touched = False
+            for row in rows:
+                if now - row.created_at >= ANALYSIS_CACHE_TTL_SECONDS:
+                    continue
+                score = {"sentiment": row.sentiment, "emotions": json.loads(row.emotions_json)}
+                found[row.key] = score
+                _remember(row.key, row.created_at, score, _sentence_memory, SENTENCE_MEMORY_SIZE)
+                if now - row.last_used_at >= TOUCH_INTERVAL_SECONDS:
+                    row.last_used_at = now
+                    session.add(row)
+                    touched = True
+            if touched:
+                session.commit()
+    
+    with _lock:
+        _stats["sentence_hits"] += sum(1 for key in keys if key in found)
+        _stats["sentence_misses"] += sum(1 for key in keys if key not in found)
+    return found
+
+
+def put_sentences(scores: Dict[str, Dict]):
+    """Memoize sentence scores (key -> {"sentiment", "emotions"}), then enforce TTL and size bounds."""
+    if not scores:
+        return
+    now = int(time.time())
+    
+    with Session(engine) as session:
+        for key, score in scores.items():
+            row = session.get(SentenceScore, key)
+            if row is None:
+                row = SentenceScore(key=key, sentiment=0.0, emotions_json="{}")
+            row.sentiment = score["sentiment"]
+            row.emotions_json = json.dumps(score["emotions"])
+            row.created_at = now
+            row.last_used_at = now
+            session.add(row)
+        session.commit()
+    
+    for key, score in scores.items():
+        _remember(key, now, score, _sentence_memory, SENTENCE_MEMORY_SIZE)
+    with _lock:
+        before = _stats["sentence_stores"]
+        _stats["sentence_stores"] += len(scores)
+        due = before // EVICT_EVERY_STORES != _stats["sentence_stores"] // EVICT_EVERY_STORES
+    if due:
+        _evict(now, "sentence_score", SENTENCE_CACHE_MAX_ENTRIES)
+
+
+def record_sentence_savings(tokens: int):
+    """Count tokens that memoized sentence scores kept out of requests."""
+    with _lock:
+        _stats["sentence_tokens_saved"] += tokens
+
+
+def _evict(now: int, table: str = "analysis_cache", max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+    """Drop expired rows and the least recently used rows beyond the size bound."""
+    with engine.begin() as conn:
+        expired = conn.execute(
+            sql_text(f"DELETE FROM {table} WHERE created_at < :cutoff"),
+            {"cutoff": now - ANALYSIS_CACHE_TTL_SECONDS},
+        ).rowcount
+        overflow = conn.execute(
+            sql_text(
+                f"DELETE FROM {table} WHERE key IN ("
+                f"SELECT key FROM {table} ORDER BY last_used_at DESC LIMIT -1 OFFSET :max_entries)"
+            ),
+            {"max_entries": max_entries},
+        ).rowcount
+    
+    if expired or overflow:
+        with _lock:
+            _stats["evictions"] += (expired or 0) + (overflow or 0)
+
+
+def join_flight(key: str):
+    """Return (future, is_leader): the leader runs the analysis, followers wait on its future."""
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            _stats["coalesced"] += 1
+            return future, False
+        future = Future()
+        _inflight[key] = future
+        return future, True
+
+
+def finish_flight(key: str, future: Future, result: Optional[Dict] = None, error: Optional[BaseException] = None):
+    """Publish the leader's outcome to every follower and close the flight."""
+    with _lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def as_shared(result: Dict) -> Dict:
+    """Copy of another caller's result; it was paid for once, so it costs no tokens here."""
+    shared = json.loads(json.dumps(result))
+    shared["tokens"] = 0
+    shared["coalesced"] = True
+    # The telemetry rows belong to the caller that made the request
+    shared.pop("request_ids", None)
+    return shared
+
+
+def single_flight(key: str, compute: Callable[[], Dict]) -> Dict:
+    """Run compute() once per key at a time; concurrent callers with the same key share its result."""
+    future, leader = join_flight(key)
+    if not leader:
+        return as_shared(future.result())
+    
+    try:
+        result = compute()
+    except BaseException as e:
+        finish_flight(key, future, error=e)
+        raise
+    finish_flight(key, future, result=result)
+    return result
+
+
+async def single_flight_async(key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+    """Async single_flight; coalesces with sync and async callers alike."""
+    future, leader = join_flight(key)
+    if not leader:
+        return as_shared(await asyncio.wrap_future(future))
+    
+    try:
+        result = await compute()
+    except BaseException as e:
+        finish_flight(key, future, error=e)
+        raise
+    finish_flight(key, future, result=result)
+    return result
+
+
+def clear():
+    """Remove every cached result and memoized sentence score."""
+    with engine.begin() as conn:
+        conn.execute(sql_text("DELETE FROM analysis_cache"))
+        conn.execute(sql_text("DELETE FROM sentence_score"))
+    with _lock:
+        _memory.clear()
+        _sentence_memory.clear()
+
+
+def get_cache_stats() -> Dict:
+    """Hit/miss, coalesced-call and sentence counters for this process plus the size of the persistent caches."""
+    with Session(engine) as session:
+        entries = session.exec(select(func.count()).select_from(AnalysisCache)).one()
+        sentence_entries = session.exec(select(func.count()).select_from(SentenceScore)).one()
+    
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["entries"] = entries
+    sentence_lookups = stats["sentence_hits"] + stats["sentence_misses"]
+    stats["sentence_hit_rate"] = stats["sentence_hits"] / sentence_lookups if sentence_lookups else 0.0
+    stats["sentence_entries"] = sentence_entries
+    return stats
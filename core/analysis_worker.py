@@ -0,0 +1,278 @@
+"""Background worker that (re-)analyzes queued entries off the request path."""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional
+from sqlmodel import Session
+from core.db import (
+    engine,
+    Entry,
+    parse_tags,
+    update_entry_analysis,
+    enqueue_analysis_jobs,
+    claim_analysis_jobs,
+    finish_analysis_job,
+    reset_running_analysis_jobs,
+    get_analysis_job_counts,
+    get_analysis_queue_depth,
+    link_ai_requests,
+)
+from core.ai import analyze_text_stream, analyze_packed, analysis_available, UNANALYZED_MODELS
+from core.rate_limit import breaker
+from core.scheduler import PRIORITIES, DRAIN_CYCLE, WAIT_SAMPLES, percentile, use_priority, get_scheduler_status
+from core.config import (
+    REANALYSIS_REQUESTS_PER_MINUTE,
+    REANALYSIS_MAX_ATTEMPTS,
+    ANALYSIS_PACK_SIZE,
+    AI_INTERACTIVE_RESERVED,
+)
+
+# How long the worker sleeps when the queue is empty, no API key is configured or the breaker is open
+IDLE_SLEEP_SECONDS = 15
+
+# Jobs claimed per database round-trip (analyzed together in packed requests)
+CLAIM_BATCH_SIZE = max(10, ANALYSIS_PACK_SIZE)
+
+# Check-ins analyzed side by side by the interactive lane
+INTERACTIVE_WORKERS = max(1, AI_INTERACTIVE_RESERVED)
+
+_lock = threading.Lock()
+# Interactive check-ins get their own lane so they never queue behind a background batch
+_threads: Dict[str, threading.Thread] = {}
+_wake = {"interactive": threading.Event(), "background": threading.Event()}
+_status = {"processed": 0, "failed": 0, "last_error": "", "last_run_at": 0}
+# Seconds from enqueue to claim per priority class (job timestamps have 1 s resolution)
+_queue_waits: Dict[str, Deque[float]] = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+
+# Latest results by entry id, so a waiting check-in page can show fields entries don't store (suggestions)
+RECENT_RESULTS_SIZE = 256
+_recent_results: "OrderedDict[int, Dict]" = OrderedDict()
+# Sections of a check-in's analysis parsed so far from its streamed response (see analyze_text_stream)
+_partial_results: "OrderedDict[int, Dict]" = OrderedDict()
+
+
+def queue_unanalyzed_entries(user_id: Optional[int] = None, priority: str = "bulk") -> int:
+    """Queue every entry saved with a placeholder analysis and wake the worker."""
+    queued = enqueue_analysis_jobs(UNANALYZED_MODELS, user_id=user_id, priority=priority)
+    if queued:
+        _wake["background"].set()
+    return queued
+
+
+def wake_worker():
+    """Ask a sleeping worker to check the queue now."""
+    for event in _wake.values():
+        event.set()
+
+
+def get_recent_result(entry_id: int) -> Optional[Dict]:
+    """The full analysis result the worker stored for an entry, if still remembered."""
+    with _lock:
+        return _recent_results.get(entry_id)
+
+
+def get_partial_result(entry_id: int) -> Optional[Dict]:
+    """
+    Sections of an entry's analysis that have streamed in so far, if it is being analyzed.
+    
+    Returns:
+        dict with whichever of sentiment, emotions, summary and suggestions have
+        arrived (in that order); only the final result is ever saved
+    """
+    with _lock:
+        partial = _partial_results.get(entry_id)
+        return dict(partial) if partial is not None else None
+
+
+def _publish_partial(entry_id: int, section: str, value):
+    """Make one streamed section visible to get_partial_result."""
+    with _lock:
+        _partial_results.setdefault(entry_id, {})[section] = value
+        _partial_results.move_to_end(entry_id)
+        while len(_partial_results) > RECENT_RESULTS_SIZE:
+            _partial_results.popitem(last=False)
+
+
+def start_worker() -> bool:
+    """Start the process-wide worker lanes if they are not already running."""
+    with _lock:
+        if _threads and all(thread.is_alive() for thread in _threads.values()):
+            return False
+        # Jobs a previous worker left mid-flight are the resume point
+        reset_running_analysis_jobs()
+        for lane, target in (("interactive", _run_interactive), ("background", _run_background)):
+            if lane not in _threads or not _threads[lane].is_alive():
+                _threads[lane] = threading.Thread(target=target, name=f"analysis-worker-{lane}", daemon=True)
+                _threads[lane].start()
+        return True
+
+
+def get_worker_status() -> Dict:
+    """
+    Worker liveness, counters and queue metrics.
+    
+    Returns:
+        dict with keys: processed, failed, last_error, last_run_at, running,
+        jobs (count per status), queue (priority -> pending, oldest_wait,
+        wait_p50_s, wait_p95_s), scheduler (see AIScheduler.snapshot)
+    """
+    with _lock:
+        status = dict(_status)
+        status["running"] = bool(_threads) and all(thread.is_alive() for thread in _threads.values())
+        waits = {priority: list(samples) for priority, samples in _queue_waits.items()}
+    status["jobs"] = get_analysis_job_counts()
+    depth = get_analysis_queue_depth()
+    status["queue"] = {
+        priority: {
+            "pending": depth.get(priority, {}).get("pending", 0),
+            "oldest_wait": depth.get(priority, {}).get("oldest_wait", 0),
+            "wait_p50_s": percentile(waits[priority], 50),
+            "wait_p95_s": percentile(waits[priority], 95),
+        }
+        for priority in PRIORITIES
+    }
+    status["scheduler"] = get_scheduler_status()
+    return status
+
+
+def _claim(priority: str, limit: int) -> List:
+    """Claim due jobs of one class, or none while analysis is unavailable or the provider is unhealthy."""
+    # Leave jobs queued (attempts untouched) while the provider is unhealthy
+    if not analysis_available() or breaker.is_open():
+        return []
+    jobs = claim_analysis_jobs(limit, priority)
+    now = time.time()
+    with _lock:
+        for job in jobs:
+            _queue_waits[priority].append(max(0.0, now - max(job.created_at, job.next_run_at)))
+    return jobs
+
+
+def _run_interactive():
+    """Interactive lane: analyze check-ins as soon as they are queued, a few at a time."""
+    with ThreadPoolExecutor(INTERACTIVE_WORKERS, thread_name_prefix="analysis-interactive") as executor:
+        while True:
+            try:
+                jobs = _claim("interactive", INTERACTIVE_WORKERS)
+            except Exception as e:
+                logging.error(f"Analysis worker could not claim jobs: {e}")
+                jobs = []
+            
+            if not jobs:
+                _wake["interactive"].wait(IDLE_SLEEP_SECONDS)
+                _wake["interactive"].clear()
+                continue
+            list(executor.map(_process_job, jobs))
+
+
+def _run_background():
+    """Background lane: drain near-line and bulk jobs fairly, at the configured rate."""
+    min_interval = 60.0 / REANALYSIS_REQUESTS_PER_MINUTE if REANALYSIS_REQUESTS_PER_MINUTE > 0 else 0.0
+    next_call_at = 0.0
+    turn = 0
+    
+    while True:
+        # Start each round at the next DRAIN_CYCLE position so bulk work is never starved
+        cycle = DRAIN_CYCLE[turn % len(DRAIN_CYCLE):] + DRAIN_CYCLE[:turn % len(DRAIN_CYCLE)]
+        turn += 1
+        jobs, priority = [], None
+        try:
+            for priority in dict.fromkeys(cycle):
+                jobs = _claim(priority, CLAIM_BATCH_SIZE)
+                if jobs:
+                    break
+        except Exception as e:
+            logging.error(f"Analysis worker could not claim jobs: {e}")
+            jobs = []
+        
+        if not jobs:
+            _wake["background"].wait(IDLE_SLEEP_SECONDS)
+            _wake["background"].clear()
+            continue
+        
+        # Simple rate limit: space packed requests evenly
+        delay = next_call_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        requests = -(-len(jobs) // max(1, ANALYSIS_PACK_SIZE))
+        next_call_at = time.monotonic() + min_interval * requests
+        with use_priority(priority):
+            _process_batch(jobs)
+
+
+def _process_job(job):
+    """Analyze one interactive job's entry on its own streamed request, publishing sections as they arrive."""
+    with Session(engine) as session:
+        entry = session.get(Entry, job.entry_id)
+        work = (entry.text, parse_tags(entry.tags)) if entry is not None else None
+    if work is None:
+        finish_analysis_job(job.id)
+        return
+    
+    result = None
+    try:
+        for section, value in analyze_text_stream(*work):
+            if section == "result":
+                result = value
+            else:
+                _publish_partial(job.entry_id, section, value)
+    except Exception as e:
+        result = e
+    _record(job, result)
+
+
+def _process_batch(jobs):
+    """Analyze a batch of jobs' entries with packed requests and store results in place."""
+    with Session(engine) as session:
+        entries = {job.id: session.get(Entry, job.entry_id) for job in jobs}
+        work = [
+            (job, entries[job.id].text, parse_tags(entries[job.id].tags))
+            for job in jobs
+            if entries[job.id] is not None
+        ]
+    
+    # Entries deleted since they were queued need no analysis
+    for job in jobs:
+        if entries[job.id] is None:
+            finish_analysis_job(job.id)
+    
+    if not work:
+        return
+    
+    try:
+        results = analyze_packed([text for _, text, _ in work], [tags for _, _, tags in work])
+    except Exception as e:
+        results = [e] * len(work)
+    
+    for (job, _, _), result in zip(work, results):
+        _record(job, result)
+
+
+def _record(job, result):
+    """Store one job's analysis result, or put the job back for a retry."""
+    try:
+        if isinstance(result, Exception):
+            raise result
+        if result["model_used"] in UNANALYZED_MODELS:
+            raise RuntimeError(result["summary"])
+        
+        update_entry_analysis(job.entry_id, result)
+        link_ai_requests(result.get("request_ids", []), job.entry_id)
+        finish_analysis_job(job.id)
+        with _lock:
+            _recent_results[job.entry_id] = result
+            while len(_recent_results) > RECENT_RESULTS_SIZE:
+                _recent_results.popitem(last=False)
+            _status["processed"] += 1
+            _status["last_run_at"] = int(time.time())
+    except Exception as e:
+        logging.warning(f"Analysis job {job.id} failed: {e}")
+        finish_analysis_job(job.id, error=str(e), max_attempts=REANALYSIS_MAX_ATTEMPTS)
+        with _lock:
+            # A retry starts a fresh stream; don't keep showing the failed one's sections
+            _partial_results.pop(job.entry_id, None)
+            _status["failed"] += 1
+            _status["last_error"] = str(e)
+            _status["last_run_at"] = int(time.time())
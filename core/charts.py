@@ -1,18 +1,22 @@
 """Chart utilities using Plotly and Altair."""
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
-import json
-from core.db import Entry
+from typing import List, Dict, Optional, Tuple, Union
+from datetime import datetime
+from core.db import Entry, DailyRollup
+from core.entry_frame import EntryFrame, WEEKDAYS, as_entry_frame
 from core.config import MOOD_COLORS, EMOTIONS
 
+# Entry-level chart builders take an EntryFrame (or a list of entries, converted once)
+Entries = Union[EntryFrame, List[Entry]]
 
-def mood_time_series(entries: List[Entry], days: int = 30) -> go.Figure:
+
+def mood_time_series(entries: Entries, days: int = 30) -> go.Figure:
     """Create time series chart of mood scores."""
-    if not entries:
+    frame = as_entry_frame(entries)
+    if not len(frame):
         fig = go.Figure()
         fig.add_annotation(
             text="No data available",
@@ -22,27 +26,41 @@ def mood_time_series(entries: List[Entry], days: int = 30) -> go.Figure:
         )
         return fig
     
-    df = pd.DataFrame([
-        {
-            "date": datetime.fromtimestamp(e.created_at).date(),
-            "mood_score": e.mood_score,
-            "sentiment": e.sentiment,
-        }
-        for e in entries
-    ])
+    # Average per day
+    day_values, avg_mood = frame.daily_mood()
+    df_grouped = pd.DataFrame({"date": pd.to_datetime(day_values), "mood_score": avg_mood})
     
-    # Group by date and calculate average
-    df_grouped = df.groupby("date")["mood_score"].mean().reset_index()
-    df_grouped["date"] = pd.to_datetime(df_grouped["date"])
+    return _mood_line_figure(df_grouped)
+
+
+def mood_time_series_from_rollups(rollups: List[DailyRollup]) -> go.Figure:
+    """Create time series chart of mood scores from daily rollups."""
+    if not rollups:
+        fig = go.Figure()
+        fig.add_annotation(
+            text="No data available",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5,
+            showarrow=False,
+        )
+        return fig
+    
+    df_grouped = pd.DataFrame({
+        "date": pd.to_datetime([r.day for r in rollups]),
+        "mood_score": [r.avg_mood for r in rollups],
+    })
     
+    return _mood_line_figure(df_grouped)
+
+
+def _mood_line_figure(df_grouped: pd.DataFrame) -> go.Figure:
+    """Plot one average mood score per date."""
     # Color based on mood score
-    df_grouped["color"] = df_grouped["mood_score"].apply(
-        lambda x: (
-            MOOD_COLORS["low"] if x < 40
-            else MOOD_COLORS["medium_low"] if x < 60
-            else MOOD_COLORS["medium_high"] if x < 80
-            else MOOD_COLORS["high"]
-        )
+    mood = df_grouped["mood_score"].to_numpy()
+    df_grouped["color"] = np.select(
+        [mood < 40, mood < 60, mood < 80],
+        [MOOD_COLORS["low"], MOOD_COLORS["medium_low"], MOOD_COLORS["medium_high"]],
+        default=MOOD_COLORS["high"],
     )
     
     fig = px.line(
@@ -75,9 +93,10 @@ def mood_time_series(entries: List[Entry], days: int = 30) -> go.Figure:
     return fig
 
 
-def emotion_radar(entries: List[Entry]) -> go.Figure:
+def emotion_radar(entries: Entries) -> go.Figure:
     """Create radar chart of average emotions."""
-    if not entries:
+    frame = as_entry_frame(entries)
+    if not len(frame):
         fig = go.Figure()
         fig.add_annotation(
             text="No data available",
@@ -87,24 +106,37 @@ def emotion_radar(entries: List[Entry]) -> go.Figure:
         )
         return fig
     
-    # Aggregate emotions
-    emotion_sums = {emotion: 0.0 for emotion in EMOTIONS}
-    count = 0
-    
-    for entry in entries:
-        try:
-            emotions = json.loads(entry.emotions_json)
-            for emotion in EMOTIONS:
-                emotion_sums[emotion] += emotions.get(emotion, 0.0)
-            count += 1
-        except Exception:
-            continue
+    return _emotion_radar_figure(frame.average_emotions())
+
+
+def emotion_radar_from_rollups(rollups: List[DailyRollup]) -> go.Figure:
+    """Create radar chart of average emotions from daily rollups."""
+    if not rollups:
+        fig = go.Figure()
+        fig.add_annotation(
+            text="No data available",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5,
+            showarrow=False,
+        )
+        return fig
     
+    return _emotion_radar_figure(average_emotions_from_rollups(rollups))
+
+
+def average_emotions_from_rollups(rollups: List[DailyRollup]) -> Dict[str, float]:
+    """Average emotion distribution across all entries covered by the rollups."""
+    count = sum(r.count for r in rollups)
     if count == 0:
-        emotion_avgs = {emotion: 0.0 for emotion in EMOTIONS}
-    else:
-        emotion_avgs = {emotion: emotion_sums[emotion] / count for emotion in EMOTIONS}
-    
+        return {emotion: 0.0 for emotion in EMOTIONS}
+    return {
+        emotion: sum(getattr(r, f"{emotion}_sum") for r in rollups) / count
+        for emotion in EMOTIONS
+    }
+
+
+def _emotion_radar_figure(emotion_avgs: Dict[str, float]) -> go.Figure:
+    """Plot an average emotion distribution as a radar chart."""
     # Create radar chart
     fig = go.Figure()
     
@@ -132,17 +164,20 @@ def emotion_radar(entries: List[Entry]) -> go.Figure:
     return fig
 
 
-def tag_frequency(entries: List[Entry], top_n: int = 10) -> go.Figure:
+def tag_frequency(entries: Entries, top_n: int = 10) -> go.Figure:
     """Create bar chart of tag frequencies."""
-    tag_counts = {}
-    for entry in entries:
-        if entry.tags:
-            for tag in entry.tags.split(","):
-                tag = tag.strip()
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-    
-    if not tag_counts:
+    return _tag_bar_figure(as_entry_frame(entries).tag_counts(limit=top_n))
+
+
+def tag_frequency_from_counts(tag_counts: List[Tuple[str, int]], top_n: int = 10) -> go.Figure:
+    """Create bar chart of tag frequencies from (tag, count) pairs, e.g. get_tag_counts."""
+    sorted_tags = sorted(tag_counts, key=lambda x: x[1], reverse=True)[:top_n]
+    return _tag_bar_figure(sorted_tags)
+
+
+def _tag_bar_figure(sorted_tags: List[Tuple[str, int]]) -> go.Figure:
+    """Plot the most frequent tags as a horizontal bar chart."""
+    if not sorted_tags:
         fig = go.Figure()
         fig.add_annotation(
             text="No tags available",
@@ -152,7 +187,6 @@ def tag_frequency(entries: List[Entry], top_n: int = 10) -> go.Figure:
         )
         return fig
     
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
     tags, counts = zip(*sorted_tags) if sorted_tags else ([], [])
     
     fig = px.bar(
@@ -173,9 +207,10 @@ def tag_frequency(entries: List[Entry], top_n: int = 10) -> go.Figure:
     return fig
 
 
-def hour_of_day_heatmap(entries: List[Entry]) -> go.Figure:
+def hour_of_day_heatmap(entries: Entries) -> go.Figure:
     """Create heatmap of mood by hour of day and day of week."""
-    if not entries:
+    frame = as_entry_frame(entries)
+    if not len(frame):
         fig = go.Figure()
         fig.add_annotation(
             text="No data available",
@@ -185,29 +220,17 @@ def hour_of_day_heatmap(entries: List[Entry]) -> go.Figure:
         )
         return fig
     
-    data = []
-    for entry in entries:
-        dt = datetime.fromtimestamp(entry.created_at)
-        data.append({
-            "hour": dt.hour,
-            "day_of_week": dt.strftime("%A"),
-            "mood_score": entry.mood_score,
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Pivot table
-    days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    pivot = df.pivot_table(
-        values="mood_score",
-        index="day_of_week",
-        columns="hour",
-        aggfunc="mean",
+    # Average mood per (weekday, hour), keeping only the days and hours that have entries
+    matrix = frame.hour_weekday_mood()
+    has_data = ~np.isnan(matrix)
+    weekdays = np.nonzero(has_data.any(axis=1))[0]
+    hours = np.nonzero(has_data.any(axis=0))[0]
+    pivot = pd.DataFrame(
+        matrix[np.ix_(weekdays, hours)],
+        index=pd.Index([WEEKDAYS[d] for d in weekdays], name="day_of_week"),
+        columns=pd.Index(hours.tolist(), name="hour"),
     )
     
-    # Reorder rows
-    pivot = pivot.reindex([d for d in days_order if d in pivot.index])
-    
     fig = px.imshow(
         pivot,
         labels=dict(x="Hour of Day", y="Day of Week", color="Mood Score"),
@@ -224,9 +247,10 @@ def hour_of_day_heatmap(entries: List[Entry]) -> go.Figure:
     return fig
 
 
-def calendar_heatmap(entries: List[Entry], year: Optional[int] = None) -> go.Figure:
+def calendar_heatmap(entries: Entries, year: Optional[int] = None) -> go.Figure:
     """Create calendar heatmap of mood scores."""
-    if not entries:
+    frame = as_entry_frame(entries)
+    if not len(frame):
         fig = go.Figure()
         fig.add_annotation(
             text="No data available",
@@ -239,22 +263,41 @@ def calendar_heatmap(entries: List[Entry], year: Optional[int] = None) -> go.Fig
     if year is None:
         year = datetime.now().year
     
-    # Create date range for the year
-    start_date = datetime(year, 1, 1)
-    end_date = datetime(year, 12, 31)
+    # Average mood per date within the year
+    day_values, moods = frame.in_year(year).daily_mood()
+    avg_mood = dict(zip(day_values.astype(object), moods.tolist()))
+    
+    return _calendar_figure(avg_mood, year)
+
+
+def calendar_heatmap_from_rollups(rollups: List[DailyRollup], year: Optional[int] = None) -> go.Figure:
+    """Create calendar heatmap of mood scores from daily rollups."""
+    if not rollups:
+        fig = go.Figure()
+        fig.add_annotation(
+            text="No data available",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5,
+            showarrow=False,
+        )
+        return fig
     
-    # Group entries by date
-    mood_by_date = {}
-    for entry in entries:
-        date = datetime.fromtimestamp(entry.created_at).date()
-        if start_date.date() <= date <= end_date.date():
-            if date not in mood_by_date:
-                mood_by_date[date] = []
-            mood_by_date[date].append(entry.mood_score)
+    if year is None:
+        year = datetime.now().year
     
-    # Calculate average mood per date
-    avg_mood = {date: sum(scores) / len(scores) for date, scores in mood_by_date.items()}
+    # Rollup days are ISO strings, so the year is their prefix
+    prefix = f"{year:04d}-"
+    avg_mood = {
+        datetime.strptime(r.day, "%Y-%m-%d").date(): r.avg_mood
+        for r in rollups
+        if r.day.startswith(prefix)
+    }
     
+    return _calendar_figure(avg_mood, year)
+
+
+def _calendar_figure(avg_mood: Dict, year: int) -> go.Figure:
+    """Plot average mood per date for a single year."""
     # Create data for heatmap
     dates = list(avg_mood.keys())
     moods = list(avg_mood.values())
@@ -297,9 +340,10 @@ def calendar_heatmap(entries: List[Entry], year: Optional[int] = None) -> go.Fig
     return fig
 
 
-def sentiment_distribution(entries: List[Entry]) -> go.Figure:
+def sentiment_distribution(entries: Entries) -> go.Figure:
     """Create histogram of sentiment distribution."""
-    if not entries:
+    frame = as_entry_frame(entries)
+    if not len(frame):
         fig = go.Figure()
         fig.add_annotation(
             text="No data available",
@@ -309,10 +353,8 @@ def sentiment_distribution(entries: List[Entry]) -> go.Figure:
         )
         return fig
     
-    sentiments = [e.sentiment for e in entries]
-    
     fig = px.histogram(
-        x=sentiments,
+        x=frame.sentiment,
         nbins=20,
         title="Sentiment Distribution",
         labels={"x": "Sentiment (-1 to 1)", "y": "Frequency"},
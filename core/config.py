@@ -76,15 +76,90 @@ APP_AUTH_PIN = get_config("APP_AUTH_PIN", "0000")
 # OpenAI Configuration
 OPENAI_API_KEY = get_config("OPENAI_API_KEY", "")
 OPENAI_MODEL = get_config("OPENAI_MODEL", "gpt-4o-mini")
+# Model routing: OPENAI_MODEL is the fast/cheap default; when OPENAI_STRONG_MODEL is set, long entries
+# go straight to it and low-confidence fast results are escalated to it
+OPENAI_STRONG_MODEL = get_config("OPENAI_STRONG_MODEL", "")
+ROUTER_SHORT_MAX_CHARS = int(get_config("ROUTER_SHORT_MAX_CHARS", "600"))
+ROUTER_FLAT_EMOTION_MAX = float(get_config("ROUTER_FLAT_EMOTION_MAX", "0.2"))
+ROUTER_NEUTRAL_SENTIMENT = float(get_config("ROUTER_NEUTRAL_SENTIMENT", "0.15"))
+ROUTER_STRONG_WORDING = float(get_config("ROUTER_STRONG_WORDING", "0.5"))
+# Alternative API endpoint, e.g. the local mock server in tools/mock_openai.py (empty = api.openai.com)
+OPENAI_BASE_URL = get_config("OPENAI_BASE_URL", "")
+
+# OpenAI HTTP client (one shared keep-alive pool per process)
+OPENAI_TIMEOUT_SECONDS = float(get_config("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(get_config("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+OPENAI_MAX_CONNECTIONS = int(get_config("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(get_config("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_MAX_RETRIES = int(get_config("OPENAI_MAX_RETRIES", "2"))
+
+# Process-wide OpenAI rate limits (defaults per model; OPENAI_RATE_LIMITS overrides per model as
+# JSON, e.g. {"gpt-4o-mini": {"rpm": 500, "tpm": 200000}})
+OPENAI_REQUESTS_PER_MINUTE = float(get_config("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = float(get_config("OPENAI_TOKENS_PER_MINUTE", "200000"))
+OPENAI_RATE_LIMITS = get_config("OPENAI_RATE_LIMITS", "")
+# Longest a call waits for rate-limit capacity (or a retry) before using the fallback result
+OPENAI_MAX_WAIT_SECONDS = float(get_config("OPENAI_MAX_WAIT_SECONDS", "20"))
+OPENAI_BACKOFF_BASE_SECONDS = float(get_config("OPENAI_BACKOFF_BASE_SECONDS", "1"))
+
+# Circuit breaker: consecutive provider failures before failing fast, and how long to stay open
+CIRCUIT_BREAKER_FAILURES = int(get_config("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET_SECONDS = float(get_config("CIRCUIT_BREAKER_RESET_SECONDS", "60"))
+
+# Shared AI scheduler: concurrent OpenAI calls in total and per background class,
+# and slots that only interactive (check-in) calls may use
+AI_MAX_CONCURRENCY = int(get_config("AI_MAX_CONCURRENCY", "8"))
+AI_NEARLINE_CONCURRENCY = int(get_config("AI_NEARLINE_CONCURRENCY", "4"))
+AI_BULK_CONCURRENCY = int(get_config("AI_BULK_CONCURRENCY", "2"))
+AI_INTERACTIVE_RESERVED = int(get_config("AI_INTERACTIVE_RESERVED", "2"))
+# Share of every rate limit that near-line and bulk calls leave for interactive calls
+AI_BACKGROUND_RATE_HEADROOM = float(get_config("AI_BACKGROUND_RATE_HEADROOM", "0.2"))
 
 # Database Configuration
 DB_URL = get_config("DB_URL", "sqlite:///moodmeter.db")
 
+# Analysis provider: "openai" (API, local lexicon estimate as fallback) or "lexicon" (offline only)
+ANALYSIS_PROVIDER = get_config("ANALYSIS_PROVIDER", "openai").strip().lower()
+
+# Bulk analysis: entries sent per packed request
+ANALYSIS_PACK_SIZE = int(get_config("ANALYSIS_PACK_SIZE", "8"))
+
+# Longest entry text (in tokens) sent for analysis; longer entries keep their most important sentences (0 = no limit)
+ANALYSIS_INPUT_TOKEN_BUDGET = int(get_config("ANALYSIS_INPUT_TOKEN_BUDGET", "1000"))
+
+# Background re-analysis of entries saved without a real AI result
+REANALYSIS_REQUESTS_PER_MINUTE = float(get_config("REANALYSIS_REQUESTS_PER_MINUTE", "30"))
+REANALYSIS_MAX_ATTEMPTS = int(get_config("REANALYSIS_MAX_ATTEMPTS", "5"))
+
+# Check-in saves first and polls for the background analysis: poll interval and when to stop waiting
+CHECKIN_POLL_SECONDS = float(get_config("CHECKIN_POLL_SECONDS", "2"))
+CHECKIN_POLL_TIMEOUT_SECONDS = float(get_config("CHECKIN_POLL_TIMEOUT_SECONDS", "120"))
+
+# Analysis cache (identical check-ins reuse a stored result instead of a new API call)
+ANALYSIS_CACHE_TTL_SECONDS = int(get_config("ANALYSIS_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(get_config("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+
+# Sentence-level analysis (opt-in): only sentences without a memoized score are sent, and the summary
+# and suggestions come from a second, cheap request per entry (ANALYSIS_SUMMARY_ENABLED=false uses
+# lexicon suggestions instead). Pays off when entries are often re-submitted or lightly edited.
+ANALYSIS_SENTENCE_MEMO = get_config("ANALYSIS_SENTENCE_MEMO", "false").strip().lower() in ("1", "true", "yes")
+ANALYSIS_SUMMARY_ENABLED = get_config("ANALYSIS_SUMMARY_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+SENTENCE_CACHE_MAX_ENTRIES = int(get_config("SENTENCE_CACHE_MAX_ENTRIES", "50000"))
+
+# Chart cache: serialized figures kept in memory per user/cohort, date range and data version
+FIGURE_CACHE_MAX_BYTES = int(get_config("FIGURE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
 # Directories
 BASE_DIR = Path(__file__).parent.parent
 PROMPTS_DIR = BASE_DIR / "prompts"
 ASSETS_DIR = BASE_DIR / "assets"
 
+# Distilled local model: where versions are saved, whether analyze_text may use it, and the
+# held-out agreement with API labels its confidence threshold must reach
+DISTILL_DIR = Path(get_config("DISTILL_DIR", str(BASE_DIR / "models")))
+DISTILL_ENABLED = get_config("DISTILL_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+DISTILL_TARGET_AGREEMENT = float(get_config("DISTILL_TARGET_AGREEMENT", "0.9"))
+
 # Mood Score Bands
 MOOD_BANDS = {
     "low": (0, 39),
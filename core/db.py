@@ -1,14 +1,24 @@
 """Database models and CRUD operations using SQLModel."""
 import json
+import re
+import threading
 import time
-from typing import Optional, List
+from itertools import islice
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, Any, Union
 from datetime import datetime, timedelta
+from sqlalchemy import Index, func, insert, text
 from sqlmodel import SQLModel, Field, create_engine, Session, select
-from core.config import DB_URL
+from core.config import DB_URL, EMOTIONS
 
 # Create engine with extend_existing to handle module reloads
 engine = create_engine(DB_URL, echo=False)
 
+# Data versions: bumped whenever entries change so derived results (cached figures) can tell they
+# are stale. They start from the load time, so a module reload never reuses an earlier version.
+_DATA_VERSION_BASE = time.time_ns()
+_data_versions: Dict[Optional[int], int] = {}  # user id (None = any user) -> version
+_data_version_lock = threading.Lock()
+
 # Define models with extend_existing=True to handle Streamlit module reloads
 # This prevents errors when Streamlit reloads modules on page navigation
 # Using __table_args__ with extend_existing=True allows redefinition during module reloads
@@ -37,11 +47,135 @@ class Entry(SQLModel, table=True):
     sentiment: float = 0.0
     mood_score: int = 50
     emotions_json: str = "{}"
+    # Typed copy of emotions_json (one column per EMOTIONS key) for SQL/NumPy aggregation
+    emotion_joy: float = 0.0
+    emotion_sad: float = 0.0
+    emotion_anger: float = 0.0
+    emotion_fear: float = 0.0
+    emotion_anticipation: float = 0.0
+    emotion_trust: float = 0.0
+    emotion_surprise: float = 0.0
+    emotion_disgust: float = 0.0
     tags: str = ""
     source: str = "manual"
     timezone: str = ""
     model_used: str = ""
     tokens: int = 0
+    
+    @property
+    def emotions(self) -> Dict[str, float]:
+        """Emotion distribution read from the typed columns (no JSON decoding)."""
+        return {emotion: getattr(self, f"emotion_{emotion}") for emotion in EMOTIONS}
+
+
+# Entry column names holding each emotion, in EMOTIONS order
+EMOTION_COLUMNS = [f"emotion_{emotion}" for emotion in EMOTIONS]
+
+
+def emotion_columns(emotions: Optional[dict]) -> Dict[str, float]:
+    """Map an emotions dict onto Entry's typed emotion columns."""
+    values = {}
+    for emotion, column in zip(EMOTIONS, EMOTION_COLUMNS):
+        try:
+            values[column] = float((emotions or {}).get(emotion, 0.0))
+        except (TypeError, ValueError):
+            values[column] = 0.0
+    return values
+
+
+class EntryTag(SQLModel, table=True):
+    """Normalized entry tag (one row per entry and tag)."""
+    __tablename__ = "entry_tag"
+    __table_args__ = (
+        Index("ix_entry_tag_user_tag", "user_id", "tag"),
+        Index("ix_entry_tag_user_created", "user_id", "created_at"),
+        {"extend_existing": True},
+    )
+    
+    entry_id: int = Field(foreign_key="entry.id", primary_key=True)
+    tag: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    created_at: int = 0  # copied from the entry so date-ranged tag counts skip the join
+
+
+class AnalysisCache(SQLModel, table=True):
+    """Cached analyze_text result, keyed by a hash of the normalized request."""
+    __tablename__ = "analysis_cache"
+    __table_args__ = {"extend_existing": True}
+    
+    key: str = Field(primary_key=True)
+    result_json: str
+    created_at: int = Field(default_factory=lambda: int(time.time()), index=True)
+    last_used_at: int = Field(default_factory=lambda: int(time.time()), index=True)
+
+
+class SentenceScore(SQLModel, table=True):
+    """Memoized sentiment and emotions of one sentence, keyed by a hash of the normalized sentence."""
+    __tablename__ = "sentence_score"
+    __table_args__ = {"extend_existing": True}
+    
+    key: str = Field(primary_key=True)
+    sentiment: float
+    emotions_json: str
+    created_at: int = Field(default_factory=lambda: int(time.time()), index=True)
+    last_used_at: int = Field(default_factory=lambda: int(time.time()), index=True)
+
+
+class AnalysisJob(SQLModel, table=True):
+    """Queued (re-)analysis of an entry; the row doubles as the worker's checkpoint."""
+    __tablename__ = "analysis_job"
+    __table_args__ = (
+        # The worker claims due pending jobs one priority class at a time
+        Index("ix_analysis_job_claim", "status", "priority", "next_run_at"),
+        {"extend_existing": True},
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entry_id: int = Field(foreign_key="entry.id", index=True)
+    status: str = Field(default="pending", index=True)  # pending, running, done, failed
+    priority: str = "bulk"  # interactive, nearline, bulk (see core.scheduler)
+    attempts: int = 0
+    last_error: str = ""
+    next_run_at: int = Field(default_factory=lambda: int(time.time()), index=True)
+    created_at: int = Field(default_factory=lambda: int(time.time()))
+    updated_at: int = Field(default_factory=lambda: int(time.time()))
+
+
+class AiRequest(SQLModel, table=True):
+    """One OpenAI call (including its retries) with exact token usage, latency and outcome."""
+    __tablename__ = "ai_request"
+    __table_args__ = (
+        # Covering index for date-ranged cost/token totals
+        Index("ix_ai_request_created_cost", "created_at", "model", "cost_usd", "prompt_tokens", "completion_tokens"),
+        # Latency percentiles read successful calls in latency order; created_at is covered for date ranges
+        Index("ix_ai_request_outcome_latency", "outcome", "latency_ms", "created_at"),
+        Index("ix_ai_request_route_latency", "outcome", "route", "latency_ms", "created_at"),
+        {"extend_existing": True},
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: int = Field(default_factory=lambda: int(time.time()))
+    model: str = ""
+    kind: str = "analysis"  # analysis, retry, packed, stream, sentences, summary
+    route: str = "fast"  # fast, strong, escalated (see core.ai model routing)
+    entries: int = 1  # entries answered by the call (packed calls cover several)
+    entry_id: Optional[int] = Field(default=None, index=True)  # set for single-entry calls; see AiRequestEntry
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: float = 0.0
+    retries: int = 0
+    outcome: str = "ok"  # ok, rate_limited, server_error, timeout, connection_error, auth_error, error, throttled, circuit_open
+
+
+class AiRequestEntry(SQLModel, table=True):
+    """Entry analyzed by an ai_request call (one row per call and entry, so packed calls link every entry)."""
+    __tablename__ = "ai_request_entry"
+    __table_args__ = {"extend_existing": True}
+    
+    request_id: int = Field(foreign_key="ai_request.id", primary_key=True)
+    entry_id: int = Field(foreign_key="entry.id", primary_key=True, index=True)
 
 
 class Cohort(SQLModel, table=True):
@@ -64,9 +198,312 @@ class CohortMember(SQLModel, table=True):
     cohort_id: int = Field(foreign_key="cohort.id", index=True)
 
 
+class DailyRollup(SQLModel, table=True):
+    """Per-user daily mood aggregates, kept in step with entry writes."""
+    __tablename__ = "daily_rollup"
+    __table_args__ = {"extend_existing": True}
+    
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    day: str = Field(primary_key=True)  # YYYY-MM-DD in local time
+    count: int = 0
+    mood_sum: float = 0.0
+    mood_min: int = 100
+    mood_max: int = 0
+    sentiment_sum: float = 0.0
+    joy_sum: float = 0.0
+    sad_sum: float = 0.0
+    anger_sum: float = 0.0
+    fear_sum: float = 0.0
+    anticipation_sum: float = 0.0
+    trust_sum: float = 0.0
+    surprise_sum: float = 0.0
+    disgust_sum: float = 0.0
+    
+    @property
+    def avg_mood(self) -> float:
+        """Average mood score for the day."""
+        return self.mood_sum / self.count if self.count else 0.0
+    
+    @property
+    def avg_sentiment(self) -> float:
+        """Average sentiment for the day."""
+        return self.sentiment_sum / self.count if self.count else 0.0
+    
+    def emotion_sums(self) -> Dict[str, float]:
+        """Summed emotion vector for the day."""
+        return {emotion: getattr(self, f"{emotion}_sum") for emotion in EMOTIONS}
+
+
+# Bump when adding an entry to _MIGRATIONS (stored in SQLite's PRAGMA user_version)
+SCHEMA_VERSION = 7
+
+
 def init_db():
-    """Initialize database tables."""
+    """Initialize database tables and run pending migrations."""
     SQLModel.metadata.create_all(engine)
+    _run_migrations()
+
+
+def _run_migrations():
+    """Apply schema/data migrations newer than the database's user_version."""
+    if engine.dialect.name != "sqlite":
+        return
+    
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+        if version >= SCHEMA_VERSION:
+            return
+        
+        for target, migrate in _MIGRATIONS:
+            if version < target:
+                migrate(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {target}")
+
+
+def day_key(timestamp: int) -> str:
+    """Local calendar day (YYYY-MM-DD) for a unix timestamp, as stored in daily_rollup."""
+    return datetime.fromtimestamp(timestamp).date().isoformat()
+
+
+_ROLLUP_SUM_COLUMNS = ["mood_sum", "sentiment_sum"] + [f"{emotion}_sum" for emotion in EMOTIONS]
+
+_ROLLUP_UPSERT_SQL = text(
+    "INSERT INTO daily_rollup (user_id, day, count, mood_min, mood_max, "
+    + ", ".join(_ROLLUP_SUM_COLUMNS)
+    + ") VALUES (:user_id, :day, :count, :mood_min, :mood_max, "
+    + ", ".join(f":{col}" for col in _ROLLUP_SUM_COLUMNS)
+    + ") ON CONFLICT (user_id, day) DO UPDATE SET "
+    + "count = count + excluded.count, "
+    + "mood_min = MIN(mood_min, excluded.mood_min), "
+    + "mood_max = MAX(mood_max, excluded.mood_max), "
+    + ", ".join(f"{col} = {col} + excluded.{col}" for col in _ROLLUP_SUM_COLUMNS)
+)
+
+
+def _rollup_delta(values: dict) -> dict:
+    """Build the daily_rollup increment contributed by a single entry's column values."""
+    delta = {
+        "user_id": values["user_id"],
+        "day": day_key(values["created_at"]),
+        "count": 1,
+        "mood_min": values["mood_score"],
+        "mood_max": values["mood_score"],
+        "mood_sum": float(values["mood_score"]),
+        "sentiment_sum": float(values["sentiment"]),
+    }
+    for emotion, column in zip(EMOTIONS, EMOTION_COLUMNS):
+        delta[f"{emotion}_sum"] = values[column]
+    return delta
+
+
+def _merge_rollup_deltas(deltas: Iterable[dict]) -> List[dict]:
+    """Combine increments that hit the same (user_id, day) so each row is upserted once."""
+    merged = {}
+    for delta in deltas:
+        key = (delta["user_id"], delta["day"])
+        if key not in merged:
+            merged[key] = dict(delta)
+            continue
+        total = merged[key]
+        total["count"] += delta["count"]
+        total["mood_min"] = min(total["mood_min"], delta["mood_min"])
+        total["mood_max"] = max(total["mood_max"], delta["mood_max"])
+        for column in _ROLLUP_SUM_COLUMNS:
+            total[column] += delta[column]
+    return list(merged.values())
+
+
+def _apply_rollup_deltas(session: Session, deltas: List[dict]):
+    """Upsert rollup increments inside the caller's transaction."""
+    if deltas:
+        session.execute(_ROLLUP_UPSERT_SQL, deltas)
+
+
+def _rebuild_daily_rollup_sql(conn, user_id: Optional[int] = None, day: Optional[str] = None):
+    """Recompute daily_rollup rows from the entry table with a single GROUP BY.
+    
+    With day (YYYY-MM-DD, requires user_id) only that one rollup row is rebuilt.
+    """
+    where = "WHERE user_id = :user_id" if user_id is not None else ""
+    rollup_where = where
+    emotion_sums = ", ".join(f"SUM({column})" for column in EMOTION_COLUMNS)
+    params = {"user_id": user_id} if user_id is not None else {}
+    if day is not None:
+        start = datetime.strptime(day, "%Y-%m-%d")
+        params.update({
+            "day": day,
+            "start_ts": int(start.timestamp()),
+            "end_ts": int((start + timedelta(days=1)).timestamp()),
+        })
+        where += " AND created_at >= :start_ts AND created_at < :end_ts"
+        rollup_where += " AND day = :day"
+    conn.execute(text(f"DELETE FROM daily_rollup {rollup_where}"), params)
+    conn.execute(
+        text(
+            "INSERT INTO daily_rollup (user_id, day, count, mood_min, mood_max, "
+            + ", ".join(_ROLLUP_SUM_COLUMNS)
+            + ") SELECT user_id, date(created_at, 'unixepoch', 'localtime') AS day, "
+            + "COUNT(*), MIN(mood_score), MAX(mood_score), SUM(mood_score), SUM(sentiment), "
+            + emotion_sums
+            + f" FROM entry {where} GROUP BY user_id, day"
+        ),
+        params,
+    )
+
+
+def _add_emotion_columns(conn):
+    """Add the typed emotion columns to entry and backfill them from emotions_json."""
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(entry)").all()}
+    for column in EMOTION_COLUMNS:
+        if column not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE entry ADD COLUMN {column} FLOAT NOT NULL DEFAULT 0.0")
+    conn.exec_driver_sql(
+        "UPDATE entry SET "
+        + ", ".join(
+            f"{column} = CASE WHEN json_valid(emotions_json) "
+            f"THEN CAST(COALESCE(json_extract(emotions_json, '$.{emotion}'), 0) AS REAL) ELSE 0 END"
+            for emotion, column in zip(EMOTIONS, EMOTION_COLUMNS)
+        )
+    )
+
+
+def _build_daily_rollup(conn):
+    """Initial daily_rollup build (reads the typed emotion columns, so add them first)."""
+    _add_emotion_columns(conn)
+    _rebuild_daily_rollup_sql(conn)
+
+
+def rebuild_daily_rollup(user_id: Optional[int] = None):
+    """Rebuild daily rollups from scratch for one user, or for everyone."""
+    with engine.begin() as conn:
+        _rebuild_daily_rollup_sql(conn, user_id)
+    _bump_data_version(user_id)
+
+
+def _create_entry_fts(conn):
+    """Create the FTS5 index over entry text/summary/tags and its sync triggers."""
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS entry_fts USING fts5("
+        "text, summary, tags, content='entry', content_rowid='id', "
+        "tokenize='porter unicode61')"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS entry_fts_ai AFTER INSERT ON entry BEGIN "
+        "INSERT INTO entry_fts(rowid, text, summary, tags) "
+        "VALUES (new.id, new.text, new.summary, new.tags); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS entry_fts_ad AFTER DELETE ON entry BEGIN "
+        "INSERT INTO entry_fts(entry_fts, rowid, text, summary, tags) "
+        "VALUES ('delete', old.id, old.text, old.summary, old.tags); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS entry_fts_au AFTER UPDATE OF text, summary, tags ON entry BEGIN "
+        "INSERT INTO entry_fts(entry_fts, rowid, text, summary, tags) "
+        "VALUES ('delete', old.id, old.text, old.summary, old.tags); "
+        "INSERT INTO entry_fts(rowid, text, summary, tags) "
+        "VALUES (new.id, new.text, new.summary, new.tags); "
+        "END"
+    )
+    # Index rows that existed before the table was created
+    conn.exec_driver_sql("INSERT INTO entry_fts(entry_fts) VALUES ('rebuild')")
+
+
+def parse_tags(tags: str) -> List[str]:
+    """Split a comma-separated tag string into unique, stripped tags."""
+    seen = []
+    for tag in (tags or "").split(","):
+        tag = tag.strip()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def _entry_tag_rows(entry_id: int, user_id: int, created_at: int, tags: str) -> List[dict]:
+    """Build entry_tag rows for one entry."""
+    return [
+        {"entry_id": entry_id, "tag": tag, "user_id": user_id, "created_at": created_at}
+        for tag in parse_tags(tags)
+    ]
+
+
+_ENTRY_TAG_INSERT_SQL = text(
+    "INSERT OR IGNORE INTO entry_tag (entry_id, tag, user_id, created_at) "
+    "VALUES (:entry_id, :tag, :user_id, :created_at)"
+)
+
+
+def _backfill_entry_tags(conn):
+    """Populate entry_tag from the comma-separated Entry.tags column."""
+    rows = conn.execute(
+        text("SELECT id, user_id, created_at, tags FROM entry WHERE tags != ''")
+    ).all()
+    tag_rows = []
+    for row in rows:
+        tag_rows.extend(_entry_tag_rows(row.id, row.user_id, row.created_at, row.tags))
+    if tag_rows:
+        conn.execute(_ENTRY_TAG_INSERT_SQL, tag_rows)
+
+
+def _add_ai_request_route(conn):
+    """Add ai_request.route to tables created before model routing."""
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(ai_request)").all()}
+    if "route" not in existing:
+        conn.exec_driver_sql("ALTER TABLE ai_request ADD COLUMN route VARCHAR NOT NULL DEFAULT 'fast'")
+
+
+def _add_analysis_job_priority(conn):
+    """Add analysis_job.priority to tables created before the AI scheduler (existing jobs are bulk)."""
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(analysis_job)").all()}
+    if "priority" not in existing:
+        conn.exec_driver_sql("ALTER TABLE analysis_job ADD COLUMN priority VARCHAR NOT NULL DEFAULT 'bulk'")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_analysis_job_claim ON analysis_job (status, priority, next_run_at)"
+    )
+
+
+def _link_ai_request_entries(conn):
+    """Copy single-entry telemetry links into ai_request_entry and rebuild the latency indexes to cover created_at."""
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO ai_request_entry (request_id, entry_id) "
+        "SELECT id, entry_id FROM ai_request WHERE entry_id IS NOT NULL"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_ai_request_outcome_latency")
+    conn.exec_driver_sql("CREATE INDEX ix_ai_request_outcome_latency ON ai_request (outcome, latency_ms, created_at)")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ai_request_route_latency ON ai_request (outcome, route, latency_ms, created_at)"
+    )
+
+
+_MIGRATIONS = [
+    (1, _build_daily_rollup),
+    (2, _create_entry_fts),
+    (3, _backfill_entry_tags),
+    (4, _add_emotion_columns),
+    (5, _add_ai_request_route),
+    (6, _add_analysis_job_priority),
+    (7, _link_ai_request_entries),
+]
+
+
+def get_data_version(user_id: Optional[int] = None) -> int:
+    """Version of a user's entries (None: of all entries); it changes on every write in this process."""
+    with _data_version_lock:
+        return _data_versions.get(user_id, _DATA_VERSION_BASE)
+
+
+def _bump_data_version(user_id: Optional[int] = None):
+    """Mark a user's entries (None: every user's entries) as changed."""
+    global _DATA_VERSION_BASE
+    with _data_version_lock:
+        if user_id is None:
+            _DATA_VERSION_BASE = time.time_ns()
+            _data_versions.clear()
+            return
+        for key in (user_id, None):
+            _data_versions[key] = _data_versions.get(key, _DATA_VERSION_BASE) + 1
 
 
 def get_or_create_user(username: str = "default", role: str = "student") -> User:
@@ -81,6 +518,64 @@ def get_or_create_user(username: str = "default", role: str = "student") -> User
         return user
 
 
+def _entry_values(
+    user_id: int,
+    text: str,
+    summary: str = "",
+    sentiment: float = 0.0,
+    mood_score: int = 50,
+    emotions: Union[dict, str, None] = None,
+    tags: Union[str, List[str]] = "",
+    source: str = "manual",
+    model_used: str = "",
+    tokens: int = 0,
+    created_at: Union[int, float, str, datetime, None] = None,
+) -> Dict[str, Any]:
+    """
+    Validate and normalize entry fields into entry column values.
+    
+    Accepts the loose types found in import files (ISO datetimes, JSON emotion
+    strings, tag lists) and raises ValueError/TypeError for unusable rows.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("missing text")
+    
+    if created_at is None or created_at == "":
+        created_ts = int(time.time())
+    elif isinstance(created_at, datetime):
+        created_ts = int(created_at.timestamp())
+    elif isinstance(created_at, str):
+        created_ts = int(datetime.fromisoformat(created_at).timestamp())
+    else:
+        created_ts = int(created_at)
+    
+    if isinstance(emotions, str):
+        try:
+            emotions = json.loads(emotions) if emotions.strip() else {}
+        except json.JSONDecodeError:
+            emotions = {}
+    if not isinstance(emotions, dict):
+        emotions = {}
+    
+    if isinstance(tags, (list, tuple)):
+        tags = ",".join(str(tag).strip() for tag in tags if str(tag).strip())
+    
+    return {
+        "user_id": user_id,
+        "created_at": created_ts,
+        "text": text,
+        "summary": summary or "",
+        "sentiment": float(sentiment),
+        "mood_score": int(mood_score),
+        "emotions_json": json.dumps(emotions),
+        **emotion_columns(emotions),
+        "tags": tags or "",
+        "source": source or "manual",
+        "model_used": model_used or "",
+        "tokens": int(tokens or 0),
+    }
+
+
 def add_entry(
     user_id: int,
     text: str,
@@ -94,24 +589,86 @@ def add_entry(
     tokens: int = 0,
 ) -> Entry:
     """Add a new entry."""
-    emotions_json = json.dumps(emotions or {})
-    entry = Entry(
+    values = _entry_values(
         user_id=user_id,
         text=text,
         summary=summary,
         sentiment=sentiment,
         mood_score=mood_score,
-        emotions_json=emotions_json,
+        emotions=emotions,
         tags=tags,
         source=source,
         model_used=model_used,
         tokens=tokens,
     )
+    entry = Entry(**values)
     with Session(engine) as session:
         session.add(entry)
+        session.flush()
+        _apply_rollup_deltas(session, [_rollup_delta(values)])
+        for tag_row in _entry_tag_rows(entry.id, user_id, entry.created_at, entry.tags):
+            session.add(EntryTag(**tag_row))
         session.commit()
         session.refresh(entry)
-        return entry
+    _bump_data_version(user_id)
+    return entry
+
+
+def add_entries_bulk(
+    user_id: int,
+    rows: Iterable[dict],
+    chunk_size: int = 1000,
+) -> Dict:
+    """
+    Insert many entries in a single transaction using chunked executemany batches.
+    
+    Each row is a dict of add_entry keyword arguments, optionally with created_at
+    (unix timestamp, ISO string or datetime). Rows that fail validation are
+    skipped and reported; everything else commits together, including tags and
+    daily rollups.
+    
+    Returns:
+        dict with keys: imported, errors, error_rows (list of (row index, message))
+    """
+    imported = 0
+    error_rows = []
+    numbered = enumerate(rows)
+    
+    with Session(engine) as session:
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            
+            values = []
+            for index, row in chunk:
+                try:
+                    values.append(_entry_values(user_id=user_id, **row))
+                except (TypeError, ValueError, KeyError) as e:
+                    error_rows.append((index, str(e)))
+            if not values:
+                continue
+            
+            # RETURNING the tag columns lets us build entry_tag rows without relying on row order
+            inserted = session.execute(
+                insert(Entry).returning(Entry.id, Entry.created_at, Entry.tags),
+                values,
+            ).all()
+            
+            tag_rows = []
+            for entry_id, created_at, tags in inserted:
+                tag_rows.extend(_entry_tag_rows(entry_id, user_id, created_at, tags))
+            if tag_rows:
+                session.execute(_ENTRY_TAG_INSERT_SQL, tag_rows)
+            
+            _apply_rollup_deltas(session, _merge_rollup_deltas(_rollup_delta(v) for v in values))
+            imported += len(values)
+        
+        session.commit()
+    
+    if imported:
+        _bump_data_version(user_id)
+    return {"imported": imported, "errors": len(error_rows), "error_rows": error_rows}
 
 
 def get_entries(
@@ -134,9 +691,14 @@ def get_entries(
             stmt = stmt.where(Entry.created_at <= end_ts)
         
         if tags:
-            # Filter by tags (comma-separated in database)
+            # Entries must carry every requested tag (exact match via entry_tag)
             for tag in tags:
-                stmt = stmt.where(Entry.tags.contains(tag))
+                stmt = stmt.where(Entry.id.in_(
+                    select(EntryTag.entry_id).where(
+                        EntryTag.user_id == user_id,
+                        EntryTag.tag == tag.strip(),
+                    )
+                ))
         
         stmt = stmt.order_by(Entry.created_at.desc())
         
@@ -146,29 +708,212 @@ def get_entries(
         return list(session.exec(stmt).all())
 
 
-def search_entries(user_id: int, query: str) -> List[Entry]:
-    """Search entries by text content."""
+def get_entry(entry_id: int) -> Optional[Entry]:
+    """Get one entry by id."""
+    with Session(engine) as session:
+        return session.get(Entry, entry_id)
+
+
+def get_emotion_averages(
+    user_id: int = 1,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Dict[str, float]:
+    """Average emotion distribution over a user's entries, computed with SQL AVG()."""
+    with Session(engine) as session:
+        stmt = select(*[func.avg(getattr(Entry, column)) for column in EMOTION_COLUMNS]).where(
+            Entry.user_id == user_id
+        )
+        
+        if start_date:
+            stmt = stmt.where(Entry.created_at >= int(start_date.timestamp()))
+        
+        if end_date:
+            stmt = stmt.where(Entry.created_at <= int(end_date.timestamp()))
+        
+        averages = session.exec(stmt).one()
+        return {emotion: float(value or 0.0) for emotion, value in zip(EMOTIONS, averages)}
+
+
+def iter_entries(user_id: int, chunk_size: int = 1000) -> Iterator[Entry]:
+    """Stream a user's entries oldest first, fetching chunk_size rows at a time."""
     with Session(engine) as session:
-        stmt = select(Entry).where(
-            Entry.user_id == user_id,
-            Entry.text.contains(query)
-        ).order_by(Entry.created_at.desc())
+        stmt = (
+            select(Entry)
+            .where(Entry.user_id == user_id)
+            .order_by(Entry.created_at, Entry.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for entry in session.exec(stmt):
+            yield entry
+            # Drop the yielded row from the identity map so memory stays flat
+            session.expunge(entry)
+
+
+def count_entries(user_id: int) -> int:
+    """Count a user's entries without loading them."""
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Entry).where(Entry.user_id == user_id)).one()
+
+
+def get_daily_rollups(
+    user_id: int = 1,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[DailyRollup]:
+    """Get one aggregate row per day with entries, oldest first."""
+    with Session(engine) as session:
+        stmt = select(DailyRollup).where(DailyRollup.user_id == user_id)
+        
+        if start_date:
+            stmt = stmt.where(DailyRollup.day >= start_date.strftime("%Y-%m-%d"))
+        
+        if end_date:
+            stmt = stmt.where(DailyRollup.day <= end_date.strftime("%Y-%m-%d"))
+        
+        stmt = stmt.order_by(DailyRollup.day)
         return list(session.exec(stmt).all())
 
 
+def _fts_match_query(query: str) -> str:
+    """Turn free-form user input into a safe FTS5 MATCH expression.
+    
+    Every word is quoted (so punctuation can't produce FTS syntax errors) and
+    the last word is a prefix match, which keeps search-as-you-type useful.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+
+def _search_filters(
+    user_id: int,
+    query: str,
+    min_sentiment: Optional[float],
+    max_sentiment: Optional[float],
+) -> Tuple[str, Dict]:
+    """WHERE clause and parameters shared by the FTS search and its count (empty clause: nothing can match)."""
+    match = _fts_match_query(query)
+    if not match:
+        return "", {}
+    where = "entry_fts MATCH :match AND entry.user_id = :user_id"
+    params = {"match": match, "user_id": user_id}
+    if min_sentiment is not None:
+        where += " AND entry.sentiment >= :min_sentiment"
+        params["min_sentiment"] = min_sentiment
+    if max_sentiment is not None:
+        where += " AND entry.sentiment <= :max_sentiment"
+        params["max_sentiment"] = max_sentiment
+    return where, params
+
+
+def _substring_search(user_id: int, query: str, min_sentiment: Optional[float], max_sentiment: Optional[float]):
+    """Select statement for the substring-scan fallback used outside SQLite."""
+    stmt = select(Entry).where(Entry.user_id == user_id, Entry.text.contains(query))
+    if min_sentiment is not None:
+        stmt = stmt.where(Entry.sentiment >= min_sentiment)
+    if max_sentiment is not None:
+        stmt = stmt.where(Entry.sentiment <= max_sentiment)
+    return stmt
+
+
+def search_entries_ranked(
+    user_id: int,
+    query: str,
+    limit: Optional[int] = 50,
+    offset: int = 0,
+    min_sentiment: Optional[float] = None,
+    max_sentiment: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Full-text search over entry text, summary and tags, best matches first.
+    
+    The sentiment bounds (inclusive) are applied in the query, before the
+    limit and offset, so every page is full; count_search_entries gives the
+    number of matches for the same filters.
+    
+    Returns:
+        list of dicts with keys: entry, snippet, rank (bm25, lower is better)
+    """
+    if engine.dialect.name != "sqlite":
+        # No FTS5 outside SQLite - fall back to a substring scan
+        with Session(engine) as session:
+            stmt = _substring_search(user_id, query, min_sentiment, max_sentiment)
+            stmt = stmt.order_by(Entry.created_at.desc()).offset(offset)
+            if limit:
+                stmt = stmt.limit(limit)
+            return [
+                {"entry": entry, "snippet": entry.text[:100], "rank": 0.0}
+                for entry in session.exec(stmt).all()
+            ]
+    
+    where, params = _search_filters(user_id, query, min_sentiment, max_sentiment)
+    if not where:
+        return []
+    
+    with Session(engine) as session:
+        rows = session.execute(
+            text(
+                "SELECT entry.id, bm25(entry_fts, 4.0, 2.0, 1.0) AS rank, "
+                "snippet(entry_fts, -1, '**', '**', '…', 12) AS snippet "
+                f"FROM entry_fts JOIN entry ON entry.id = entry_fts.rowid WHERE {where} "
+                "ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            {**params, "limit": limit if limit else -1, "offset": offset},
+        ).all()
+        if not rows:
+            return []
+        
+        entries = session.exec(select(Entry).where(Entry.id.in_([row.id for row in rows]))).all()
+        by_id = {entry.id: entry for entry in entries}
+        return [
+            {"entry": by_id[row.id], "snippet": row.snippet, "rank": row.rank}
+            for row in rows
+            if row.id in by_id
+        ]
+
+
+def count_search_entries(
+    user_id: int,
+    query: str,
+    min_sentiment: Optional[float] = None,
+    max_sentiment: Optional[float] = None,
+) -> int:
+    """Number of entries search_entries_ranked matches with the same query and sentiment bounds."""
+    if engine.dialect.name != "sqlite":
+        with Session(engine) as session:
+            stmt = _substring_search(user_id, query, min_sentiment, max_sentiment)
+            return session.exec(select(func.count()).select_from(stmt.subquery())).one()
+    
+    where, params = _search_filters(user_id, query, min_sentiment, max_sentiment)
+    if not where:
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(
+            text(f"SELECT COUNT(*) FROM entry_fts JOIN entry ON entry.id = entry_fts.rowid WHERE {where}"),
+            params,
+        ).scalar_one()
+
+
+def search_entries(user_id: int, query: str, limit: Optional[int] = None) -> List[Entry]:
+    """Search entries by text content, best matches first."""
+    return [hit["entry"] for hit in search_entries_ranked(user_id, query, limit=limit)]
+
+
 def get_streak(user_id: int) -> int:
     """Calculate current streak of consecutive days with entries."""
-    entries = get_entries(user_id=user_id, limit=365)
-    if not entries:
+    rollups = get_daily_rollups(
+        user_id=user_id,
+        start_date=datetime.now() - timedelta(days=365),
+    )
+    if not rollups:
         return 0
     
-    # Get unique dates
-    dates = set()
-    for entry in entries:
-        date = datetime.fromtimestamp(entry.created_at).date()
-        dates.add(date)
-    
-    dates = sorted(dates, reverse=True)
+    # One rollup row per day with entries
+    dates = sorted((datetime.strptime(r.day, "%Y-%m-%d").date() for r in rollups), reverse=True)
     if not dates:
         return 0
     
@@ -192,12 +937,39 @@ def get_streak(user_id: int) -> int:
 
 def get_all_tags(user_id: int) -> List[str]:
     """Get all unique tags for a user."""
-    entries = get_entries(user_id=user_id)
-    tags = set()
-    for entry in entries:
-        if entry.tags:
-            tags.update(entry.tags.split(","))
-    return sorted([tag.strip() for tag in tags if tag.strip()])
+    with Session(engine) as session:
+        stmt = (
+            select(EntryTag.tag)
+            .where(EntryTag.user_id == user_id)
+            .distinct()
+            .order_by(EntryTag.tag)
+        )
+        return list(session.exec(stmt).all())
+
+
+def get_tag_counts(
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[Tuple[str, int]]:
+    """Get (tag, entry count) pairs for a user, most frequent first."""
+    with Session(engine) as session:
+        count = func.count().label("count")
+        stmt = select(EntryTag.tag, count).where(EntryTag.user_id == user_id)
+        
+        if start_date:
+            stmt = stmt.where(EntryTag.created_at >= int(start_date.timestamp()))
+        
+        if end_date:
+            stmt = stmt.where(EntryTag.created_at <= int(end_date.timestamp()))
+        
+        stmt = stmt.group_by(EntryTag.tag).order_by(count.desc(), EntryTag.tag)
+        
+        if limit:
+            stmt = stmt.limit(limit)
+        
+        return [(tag, n) for tag, n in session.exec(stmt).all()]
 
 
 def get_cohort_entries(cohort_id: int) -> List[Entry]:
@@ -214,3 +986,296 @@ def get_cohort_entries(cohort_id: int) -> List[Entry]:
         stmt = select(Entry).where(Entry.user_id.in_(user_ids))
         return list(session.exec(stmt).all())
 
+
+
+def update_entry_analysis(entry_id: int, result: Dict) -> Optional[Entry]:
+    """Replace an entry's analysis fields in place and refresh its daily rollup."""
+    with Session(engine) as session:
+        entry = session.get(Entry, entry_id)
+        if not entry:
+            return None
+        
+        emotions = result.get("emotions") or {}
+        entry.summary = result.get("summary", "")
+        entry.sentiment = float(result.get("sentiment", 0.0))
+        entry.mood_score = int(result.get("mood_score", 50))
+        entry.emotions_json = json.dumps(emotions)
+        for column, value in emotion_columns(emotions).items():
+            setattr(entry, column, value)
+        entry.model_used = result.get("model_used", "")
+        entry.tokens = int(result.get("tokens", 0))
+        session.add(entry)
+        session.flush()
+        
+        # Min/max can't be decremented, so rebuild the entry's day from its entries
+        _rebuild_daily_rollup_sql(session, entry.user_id, day_key(entry.created_at))
+        session.commit()
+        session.refresh(entry)
+    _bump_data_version(entry.user_id)
+    return entry
+
+
+def enqueue_analysis_jobs(
+    model_used: Iterable[str],
+    user_id: Optional[int] = None,
+    priority: str = "bulk",
+) -> int:
+    """Queue entries whose model_used is in model_used, skipping ones already queued."""
+    models = list(model_used)
+    if not models:
+        return 0
+    
+    now = int(time.time())
+    params = {f"model_{i}": model for i, model in enumerate(models)}
+    params.update({"now": now, "user_id": user_id, "priority": priority})
+    model_list = ", ".join(f":model_{i}" for i in range(len(models)))
+    user_filter = "AND entry.user_id = :user_id" if user_id is not None else ""
+    
+    with engine.begin() as conn:
+        return conn.execute(
+            text(
+                "INSERT INTO analysis_job "
+                "(entry_id, status, priority, attempts, last_error, next_run_at, created_at, updated_at) "
+                "SELECT entry.id, 'pending', :priority, 0, '', :now, :now, :now FROM entry "
+                f"WHERE entry.model_used IN ({model_list}) {user_filter} "
+                "AND entry.id NOT IN (SELECT entry_id FROM analysis_job WHERE status IN ('pending', 'running'))"
+            ),
+            params,
+        ).rowcount
+
+
+def enqueue_analysis_job(entry_id: int, priority: str = "nearline") -> AnalysisJob:
+    """Queue a single entry for analysis."""
+    job = AnalysisJob(entry_id=entry_id, priority=priority)
+    with Session(engine) as session:
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
+
+
+def claim_analysis_jobs(limit: int = 10, priority: Optional[str] = None) -> List[AnalysisJob]:
+    """Atomically mark up to limit due pending jobs (of one priority class, if given) as running and return them."""
+    now = int(time.time())
+    priority_filter = "AND priority = :priority " if priority else ""
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text(
+                "UPDATE analysis_job SET status = 'running', attempts = attempts + 1, updated_at = :now "
+                "WHERE id IN (SELECT id FROM analysis_job WHERE status = 'pending' "
+                f"{priority_filter}AND next_run_at <= :now ORDER BY id LIMIT :limit) "
+                "RETURNING id, entry_id, status, priority, attempts, last_error, next_run_at, created_at, updated_at"
+            ),
+            {"now": now, "limit": limit, "priority": priority},
+        ).all()
+    return sorted((AnalysisJob(**row._mapping) for row in rows), key=lambda job: job.id)
+
+
+def finish_analysis_job(
+    job_id: int,
+    error: Optional[str] = None,
+    retry_delay: int = 60,
+    max_attempts: int = 5,
+):
+    """Mark a running job done, or back to pending (failed after max_attempts) on error."""
+    now = int(time.time())
+    with Session(engine) as session:
+        job = session.get(AnalysisJob, job_id)
+        if not job:
+            return
+        if error is None:
+            job.status = "done"
+            job.last_error = ""
+        else:
+            job.last_error = error[:500]
+            job.status = "failed" if job.attempts >= max_attempts else "pending"
+            # Exponential backoff between attempts
+            job.next_run_at = now + retry_delay * (2 ** max(0, job.attempts - 1))
+        job.updated_at = now
+        session.add(job)
+        session.commit()
+
+
+def reset_running_analysis_jobs() -> int:
+    """Return jobs left 'running' by a crashed or restarted worker to the queue."""
+    with engine.begin() as conn:
+        return conn.execute(
+            text("UPDATE analysis_job SET status = 'pending' WHERE status = 'running'")
+        ).rowcount
+
+
+def get_analysis_job_counts() -> Dict[str, int]:
+    """Number of analysis jobs per status."""
+    with Session(engine) as session:
+        rows = session.exec(
+            select(AnalysisJob.status, func.count()).group_by(AnalysisJob.status)
+        ).all()
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    counts.update({status: n for status, n in rows})
+    return counts
+
+
+def get_labeled_entries(exclude_models: Iterable[str]) -> List[Tuple[int, str, float, List[float]]]:
+    """
+    Entries with a stored AI analysis, as training labels.
+    
+    Returns:
+        list of (entry id, text, sentiment, emotion values in EMOTIONS order),
+        skipping entries whose model_used is empty, in exclude_models or a
+        distilled local model
+    """
+    models = list(exclude_models)
+    params = {f"model_{i}": model for i, model in enumerate(models)}
+    model_filter = f"AND model_used NOT IN ({', '.join(f':model_{i}' for i in range(len(models)))}) " if models else ""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                f"SELECT id, text, sentiment, {', '.join(EMOTION_COLUMNS)} FROM entry "
+                f"WHERE model_used != '' AND model_used NOT LIKE 'distilled%' {model_filter}ORDER BY id"
+            ),
+            params,
+        ).all()
+    return [(row[0], row[1], float(row[2]), [float(value or 0.0) for value in row[3:]]) for row in rows]
+
+
+def get_model_used_counts() -> Dict[str, int]:
+    """Number of entries per model_used value."""
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT model_used, COUNT(*) FROM entry GROUP BY model_used")).all()
+    return {model: count for model, count in rows}
+
+
+def get_analysis_queue_depth() -> Dict[str, Dict[str, int]]:
+    """
+    Pending analysis jobs per priority class.
+    
+    Returns:
+        dict of priority -> {"pending": count, "oldest_wait": seconds the oldest due job has waited}
+    """
+    now = int(time.time())
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT priority, COUNT(*), MIN(next_run_at) FROM analysis_job "
+                "WHERE status = 'pending' GROUP BY priority"
+            )
+        ).all()
+    return {
+        priority: {"pending": count, "oldest_wait": max(0, now - (oldest or now))}
+        for priority, count, oldest in rows
+    }
+
+
+def record_ai_request(**fields) -> int:
+    """Insert an ai_request row and return its id."""
+    with engine.begin() as conn:
+        return conn.execute(insert(AiRequest).values(**fields).returning(AiRequest.id)).scalar_one()
+
+
+def link_ai_requests(request_ids: Iterable[int], entry_id: int):
+    """Attribute ai_request rows to an entry they analyzed (a packed call is linked to each of its entries)."""
+    ids = [int(request_id) for request_id in request_ids if request_id]
+    if not ids:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT OR IGNORE INTO ai_request_entry (request_id, entry_id) VALUES (:request_id, :entry_id)"),
+            [{"request_id": request_id, "entry_id": entry_id} for request_id in ids],
+        )
+        conn.execute(
+            AiRequest.__table__.update()
+            .where(AiRequest.id.in_(ids), AiRequest.entry_id.is_(None), AiRequest.entries <= 1)
+            .values(entry_id=entry_id)
+        )
+
+
+def get_ai_request_totals(start_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Call counts, exact token sums and cost per model, route, call kind and outcome."""
+    with Session(engine) as session:
+        stmt = select(
+            AiRequest.model,
+            AiRequest.route,
+            AiRequest.kind,
+            AiRequest.outcome,
+            func.count(),
+            func.sum(AiRequest.prompt_tokens),
+            func.sum(AiRequest.completion_tokens),
+            func.sum(AiRequest.cached_tokens),
+            func.sum(AiRequest.cost_usd),
+            func.sum(AiRequest.entries),
+        )
+        if start_date:
+            stmt = stmt.where(AiRequest.created_at >= int(start_date.timestamp()))
+        stmt = stmt.group_by(AiRequest.model, AiRequest.route, AiRequest.kind, AiRequest.outcome)
+        
+        return [
+            {
+                "model": model,
+                "route": route,
+                "kind": kind,
+                "outcome": outcome,
+                "requests": requests,
+                "prompt_tokens": prompt or 0,
+                "completion_tokens": completion or 0,
+                "cached_tokens": cached or 0,
+                "cost": cost or 0.0,
+                "entries": entries or 0,
+            }
+            for model, route, kind, outcome, requests, prompt, completion, cached, cost, entries in session.exec(stmt).all()
+        ]
+
+
+def get_ai_latency_percentiles(
+    percentiles: Tuple[int, ...] = (50, 95),
+    start_date: Optional[datetime] = None,
+    route: Optional[str] = None,
+) -> Dict[int, Optional[float]]:
+    """Latency (ms) percentiles of successful calls, each read with one indexed OFFSET lookup."""
+    params = {"since": int(start_date.timestamp()) if start_date else 0, "route": route}
+    where = "outcome = 'ok' AND created_at >= :since" + (" AND route = :route" if route else "")
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) FROM ai_request WHERE {where}"), params).scalar_one()
+        
+        result = {}
+        for percentile in percentiles:
+            if not total:
+                result[percentile] = None
+                continue
+            # Nearest-rank percentile
+            offset = max(0, -(-percentile * total // 100) - 1)
+            result[percentile] = conn.execute(
+                text(f"SELECT latency_ms FROM ai_request WHERE {where} ORDER BY latency_ms LIMIT 1 OFFSET :offset"),
+                {**params, "offset": offset},
+            ).scalar_one()
+        return result
+
+
+def get_ai_cost_by_day(start_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Cost, tokens and calls per local day, oldest first."""
+    since = int(start_date.timestamp()) if start_date else 0
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT date(created_at, 'unixepoch', 'localtime') AS day, COUNT(*), "
+                "SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd) "
+                "FROM ai_request WHERE created_at >= :since GROUP BY day ORDER BY day"
+            ),
+            {"since": since},
+        ).all()
+    return [
+        {"day": day, "requests": requests, "prompt_tokens": prompt or 0, "completion_tokens": completion or 0, "cost": cost or 0.0}
+        for day, requests, prompt, completion, cost in rows
+    ]
+
+
+def get_unmetered_token_usage() -> List[Tuple[str, int, int]]:
+    """(model_used, tokens, entries) for analyzed entries that have no ai_request rows (analyzed before telemetry)."""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT model_used, SUM(tokens), COUNT(*) FROM entry "
+                "WHERE tokens > 0 AND id NOT IN (SELECT entry_id FROM ai_request_entry) "
+                "GROUP BY model_used"
+            )
+        ).all()
+    return [(model or "unknown", tokens or 0, n) for model, tokens, n in rows]
@@ -0,0 +1,353 @@
+"""Small local model distilled from stored AI analyses, used to skip confident API calls."""
+import json
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.config import EMOTIONS, DISTILL_DIR, DISTILL_ENABLED, DISTILL_TARGET_AGREEMENT
+from core.db import get_labeled_entries
+from core.lexicon import NEGATIONS, SUGGESTIONS
+
+# Hashed feature space (unigrams and bigrams); collisions are rare enough at journal-entry sizes
+HASH_DIM = 2 ** 14
+
+# Words after a negation (within this many) are featurized as negated ("not_happy")
+NEGATION_SCOPE = 3
+
+# Entries needed before a model is trained, and the share held out to measure agreement
+MIN_TRAINING_EXAMPLES = 200
+HOLDOUT_FRACTION = 0.2
+
+# Mini-batch gradient descent settings
+EPOCHS = 12
+BATCH_SIZE = 128
+LEARNING_RATE = 1.0
+L2 = 1e-6
+
+# Held-out predictions a confidence threshold must be measured on; with fewer, a lucky
+# handful could pass the agreement target and the model is not trusted at all
+MIN_CONFIDENT_SUPPORT = 30
+
+# Sentiment within this distance of 0 counts as neutral when comparing with the API label
+NEUTRAL_BAND = 0.25
+
+# model_used values that are not API labels (placeholders and local scorers)
+NON_API_MODELS = ("none", "error", "pending", "lexicon")
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_MODEL_FILE_RE = re.compile(r"distilled-v(\d+)\.npz$")
+
+_lock = threading.Lock()
+_model: Optional["DistilledModel"] = None
+_loaded = False
+_stats = {"predictions": 0, "confident": 0}
+
+
+def _grams(text: str) -> List[str]:
+    """Unigrams (negation-marked) and bigrams of a text."""
+    words = []
+    negated = 0
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in NEGATIONS:
+            negated = NEGATION_SCOPE
+            words.append(word)
+            continue
+        words.append(f"not_{word}" if negated else word)
+        negated = max(0, negated - 1)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def featurize(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse (indices, values) of a text's signed, log-scaled, L2-normalized hashed n-grams."""
+    counts: Counter = Counter()
+    for gram in _grams(text):
+        hashed = zlib.crc32(gram.encode("utf-8"))
+        # The bit above the index picks a sign, so collisions tend to cancel out
+        sign = 1.0 if (hashed // HASH_DIM) % 2 == 0 else -1.0
+        counts[hashed % HASH_DIM] += sign
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    raw = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    values = np.sign(raw) * (1.0 + np.log(np.maximum(np.abs(raw), 1.0)))
+    norm = float(np.linalg.norm(values))
+    return indices, (values / norm if norm else values).astype(np.float32)
+
+
+def _dense(features: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """Dense feature matrix for a mini-batch."""
+    matrix = np.zeros((len(features), HASH_DIM), dtype=np.float32)
+    for row, (indices, values) in enumerate(features):
+        matrix[row, indices] += values
+    return matrix
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def _band(sentiment) -> np.ndarray:
+    """-1, 0 or 1 per sentiment value (negative, neutral, positive)."""
+    sentiment = np.asarray(sentiment)
+    return np.where(sentiment > NEUTRAL_BAND, 1, np.where(sentiment < -NEUTRAL_BAND, -1, 0))
+
+
+class DistilledModel:
+    """Linear sentiment regression and softmax emotion classifier over hashed n-grams."""
+    
+    def __init__(self, sentiment_weights, sentiment_bias, emotion_weights, emotion_bias, meta: Dict):
+        self.sentiment_weights = sentiment_weights
+        self.sentiment_bias = float(sentiment_bias)
+        self.emotion_weights = emotion_weights
+        self.emotion_bias = emotion_bias
+        self.meta = meta
+    
+    @property
+    def version(self) -> int:
+        return self.meta["version"]
+    
+    @property
+    def threshold(self) -> float:
+        """Confidence at or above which predictions are trusted (inf when none are)."""
+        threshold = self.meta["metrics"].get("threshold")
+        return math.inf if threshold is None else threshold
+    
+    def predict_features(self, features: Tuple[np.ndarray, np.ndarray]) -> Tuple[float, np.ndarray, float]:
+        """(sentiment, emotion distribution, confidence) for one featurized text."""
+        indices, values = features
+        sentiment = float(np.clip(values @ self.sentiment_weights[indices] + self.sentiment_bias, -1.0, 1.0))
+        emotions = _softmax(values @ self.emotion_weights[indices] + self.emotion_bias)
+        top_two = np.sort(emotions)[-2:]
+        # Margin between the two likeliest emotions: small when the model can't tell them apart
+        return sentiment, emotions, float(top_two[1] - top_two[0])
+    
+    def predict(self, text: str) -> Tuple[float, Dict[str, float], float]:
+        """(sentiment, emotions dict, confidence) for a text."""
+        sentiment, emotions, confidence = self.predict_features(featurize(text))
+        return sentiment, dict(zip(EMOTIONS, (float(value) for value in emotions))), confidence
+    
+    def save(self, directory: Path):
+        """Write the weights and metadata for this version."""
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = directory / f"distilled-v{self.version}"
+        np.savez_compressed(
+            f"{stem}.npz",
+            sentiment_weights=self.sentiment_weights,
+            sentiment_bias=np.array(self.sentiment_bias),
+            emotion_weights=self.emotion_weights,
+            emotion_bias=self.emotion_bias,
+        )
+        Path(f"{stem}.json").write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+    
+    @classmethod
+    def load(cls, path: Path) -> "DistilledModel":
+        """Load a saved version from its .npz file (metadata from the matching .json)."""
+        arrays = np.load(path)
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        return cls(
+            arrays["sentiment_weights"],
+            arrays["sentiment_bias"],
+            arrays["emotion_weights"],
+            arrays["emotion_bias"],
+            meta,
+        )
+
+
+def _fit(features, sentiments: np.ndarray, emotions: np.ndarray, seed: int = 0):
+    """Mini-batch gradient descent on squared error (sentiment) and cross-entropy (emotions)."""
+    rng = np.random.default_rng(seed)
+    sentiment_weights = np.zeros(HASH_DIM, dtype=np.float32)
+    emotion_weights = np.zeros((HASH_DIM, len(EMOTIONS)), dtype=np.float32)
+    # Start from the label means so rare features only learn deviations
+    sentiment_bias = float(sentiments.mean())
+    emotion_bias = np.log(np.maximum(emotions.mean(axis=0), 1e-6)).astype(np.float32)
+    
+    for epoch in range(EPOCHS):
+        learning_rate = LEARNING_RATE / (1.0 + epoch)
+        order = rng.permutation(len(features))
+        for start in range(0, len(order), BATCH_SIZE):
+            batch = order[start:start + BATCH_SIZE]
+            matrix = _dense([features[i] for i in batch])
+            
+            sentiment_error = matrix @ sentiment_weights + sentiment_bias - sentiments[batch]
+            sentiment_weights -= learning_rate * (matrix.T @ sentiment_error / len(batch) + L2 * sentiment_weights)
+            sentiment_bias -= learning_rate * float(sentiment_error.mean())
+            
+            emotion_error = _softmax(matrix @ emotion_weights + emotion_bias) - emotions[batch]
+            emotion_weights -= learning_rate * (matrix.T @ emotion_error / len(batch) + L2 * emotion_weights)
+            emotion_bias -= learning_rate * emotion_error.mean(axis=0)
+    
+    return sentiment_weights, sentiment_bias, emotion_weights, emotion_bias
+
+
+def _evaluate(model: DistilledModel, features, sentiments: np.ndarray, emotions: np.ndarray) -> Dict:
+    """Agreement with held-out API labels, and the confidence threshold that reaches the target."""
+    predictions = [model.predict_features(item) for item in features]
+    predicted_sentiment = np.array([prediction[0] for prediction in predictions])
+    predicted_top = np.array([int(np.argmax(prediction[1])) for prediction in predictions])
+    confidence = np.array([prediction[2] for prediction in predictions])
+    
+    sentiment_agrees = _band(predicted_sentiment) == _band(sentiments)
+    emotion_agrees = predicted_top == emotions.argmax(axis=1)
+    agrees = sentiment_agrees & emotion_agrees
+    
+    # Lowest confidence cut-off whose trusted predictions still agree with the API often enough,
+    # measured on at least MIN_CONFIDENT_SUPPORT of them (else no threshold: never confident)
+    threshold, coverage, confident_agreement, support = None, 0.0, None, 0
+    order = np.argsort(-confidence)
+    running = np.cumsum(agrees[order]) / np.arange(1, len(order) + 1)
+    passing = np.nonzero(running >= DISTILL_TARGET_AGREEMENT)[0]
+    passing = passing[passing + 1 >= MIN_CONFIDENT_SUPPORT]
+    if len(passing):
+        cut = passing[-1]
+        threshold = float(confidence[order][cut])
+        coverage = float((cut + 1) / len(order))
+        confident_agreement = float(running[cut])
+        support = int(cut + 1)
+    
+    return {
+        "holdout": len(features),
+        "sentiment_mae": float(np.abs(predicted_sentiment - sentiments).mean()),
+        "sentiment_agreement": float(sentiment_agrees.mean()),
+        "emotion_agreement": float(emotion_agrees.mean()),
+        "agreement": float(agrees.mean()),
+        "target_agreement": DISTILL_TARGET_AGREEMENT,
+        "threshold": threshold,
+        "coverage": coverage,
+        "confident_agreement": confident_agreement,
+        "support": support,
+        "min_support": MIN_CONFIDENT_SUPPORT,
+    }
+
+
+def _versions(directory: Path) -> List[Tuple[int, Path]]:
+    """Saved (version, path) pairs, oldest first."""
+    if not directory.exists():
+        return []
+    found = []
+    for path in directory.glob("distilled-v*.npz"):
+        match = _MODEL_FILE_RE.search(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def train(directory: Optional[Path] = None) -> DistilledModel:
+    """
+    Train a new model version from the stored API labels and make it the active one.
+    
+    Entries are split deterministically by id into training and held-out sets;
+    the held-out agreement picks the confidence threshold. Raises ValueError
+    when there are fewer than MIN_TRAINING_EXAMPLES labeled entries.
+    """
+    global _model, _loaded
+    directory = Path(directory or DISTILL_DIR)
+    rows = get_labeled_entries(NON_API_MODELS)
+    if len(rows) < MIN_TRAINING_EXAMPLES:
+        raise ValueError(f"Need at least {MIN_TRAINING_EXAMPLES} AI-analyzed entries to train, found {len(rows)}")
+    
+    started = time.monotonic()
+    features = [featurize(text) for _, text, _, _ in rows]
+    sentiments = np.array([sentiment for _, _, sentiment, _ in rows], dtype=np.float32)
+    emotions = np.array([values for _, _, _, values in rows], dtype=np.float32)
+    emotions = emotions / np.maximum(emotions.sum(axis=1, keepdims=True), 1e-9)
+    # Hash of the id, so an entry stays on the same side of the split across retrains
+    holdout = np.array([zlib.crc32(str(entry_id).encode()) % 100 < HOLDOUT_FRACTION * 100 for entry_id, _, _, _ in rows])
+    train_index, holdout_index = np.nonzero(~holdout)[0], np.nonzero(holdout)[0]
+    
+    weights = _fit([features[i] for i in train_index], sentiments[train_index], emotions[train_index])
+    version = (_versions(directory)[-1][0] + 1) if _versions(directory) else 1
+    meta = {
+        "version": version,
+        "trained_at": int(time.time()),
+        "examples": len(train_index),
+        "hash_dim": HASH_DIM,
+        "training_seconds": 0.0,
+        "metrics": {},
+    }
+    model = DistilledModel(*weights, meta)
+    model.meta["metrics"] = _evaluate(
+        model, [features[i] for i in holdout_index], sentiments[holdout_index], emotions[holdout_index]
+    )
+    model.meta["training_seconds"] = round(time.monotonic() - started, 2)
+    model.save(directory)
+    
+    metrics = model.meta["metrics"]
+    logging.info(
+        f"Trained distilled model v{version} on {len(train_index)} entries: agreement {metrics['agreement']:.1%}, "
+        f"{metrics['coverage']:.1%} of held-out entries above the confidence threshold"
+    )
+    with _lock:
+        _model, _loaded = model, True
+    return model
+
+
+def get_model() -> Optional[DistilledModel]:
+    """The newest saved model (loaded once per process), or None."""
+    global _model, _loaded
+    with _lock:
+        if not _loaded:
+            versions = _versions(Path(DISTILL_DIR))
+            try:
+                _model = DistilledModel.load(versions[-1][1]) if versions else None
+            except Exception as e:
+                logging.warning(f"Could not load distilled model: {e}")
+                _model = None
+            _loaded = True
+        return _model
+
+
+def predict_confident(text: str) -> Optional[Dict]:
+    """
+    The distilled model's analysis when it is confident enough to skip the API, else None.
+    
+    Returns:
+        dict with the same keys as core.ai.analyze_text, model_used "distilled-v<version>", tokens 0
+    """
+    model = get_model() if DISTILL_ENABLED else None
+    if model is None:
+        return None
+    
+    sentiment, emotions, confidence = model.predict(text)
+    confident = confidence >= model.threshold
+    with _lock:
+        _stats["predictions"] += 1
+        _stats["confident"] += int(confident)
+    if not confident:
+        return None
+    
+    top_emotion = max(emotions, key=emotions.get)
+    return {
+        "sentiment": sentiment,
+        "mood_score": int((sentiment + 1) * 50),
+        "emotions": emotions,
+        "summary": f"Estimated locally from your past check-ins: your words lean towards {top_emotion}.",
+        "suggestions": SUGGESTIONS.get(top_emotion, SUGGESTIONS["neutral"]),
+        "model_used": f"distilled-v{model.version}",
+        "tokens": 0,
+    }
+
+
+def get_distill_status() -> Dict:
+    """
+    Active model metadata and this process's gating counters.
+    
+    Returns:
+        dict with keys: enabled, model (metadata dict or None), predictions,
+        confident, calls_avoided_pct
+    """
+    model = get_model()
+    with _lock:
+        stats = dict(_stats)
+    stats["enabled"] = DISTILL_ENABLED
+    stats["model"] = model.meta if model else None
+    stats["calls_avoided_pct"] = stats["confident"] / stats["predictions"] * 100 if stats["predictions"] else 0.0
+    return stats
@@ -0,0 +1,292 @@
+"""Columnar (NumPy) view of entries, built once per query and shared by charts and insights."""
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from sqlmodel import Session, select
+from core.db import engine, Entry, EntryTag, CohortMember, EMOTION_COLUMNS, parse_tags
+from core.config import EMOTIONS
+
+# Weekday names in datetime.weekday() order (Monday = 0)
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# 1970-01-01 was a Thursday
+_EPOCH_WEEKDAY = 3
+
+
+def _local_calendar(ts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Local calendar day (datetime64[D]), hour and weekday of unix timestamps.
+    
+    The UTC offset is looked up once per distinct hour (DST changes on hour
+    boundaries), so the per-entry work is pure array arithmetic.
+    """
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64)
+    local = ts + offsets[inverse].reshape(ts.shape)
+    days = local // 86400
+    return (
+        days.astype("datetime64[D]"),
+        ((local % 86400) // 3600).astype(np.int8),
+        ((days + _EPOCH_WEEKDAY) % 7).astype(np.int8),
+    )
+
+
+class EntryFrame:
+    """
+    Entries as parallel NumPy arrays, oldest first.
+    
+    Row i of every array is one entry: ids, user_ids, ts (unix seconds), day
+    (local datetime64[D]), hour, weekday (Monday = 0), mood, sentiment and
+    emotions (n x len(EMOTIONS), EMOTIONS order). Tags are stored as one
+    (tag_rows[k], tag_codes[k]) pair per entry tag, with tag_codes indexing
+    tag_names. texts is only loaded when asked for.
+    """
+    
+    def __init__(
+        self,
+        ids: np.ndarray,
+        user_ids: np.ndarray,
+        ts: np.ndarray,
+        mood: np.ndarray,
+        sentiment: np.ndarray,
+        emotions: np.ndarray,
+        tag_rows: np.ndarray,
+        tag_codes: np.ndarray,
+        tag_names: List[str],
+        texts: Optional[List[str]] = None,
+    ):
+        order = np.argsort(ts, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.ids = ids[order]
+        self.user_ids = user_ids[order]
+        self.ts = ts[order]
+        self.day, self.hour, self.weekday = _local_calendar(self.ts)
+        self.mood = mood[order]
+        self.sentiment = sentiment[order]
+        self.emotions = emotions[order].reshape(len(order), len(EMOTIONS))
+        self.tag_rows = rank[tag_rows] if len(tag_rows) else tag_rows
+        self.tag_codes = tag_codes
+        self.tag_names = tag_names
+        self.texts = [texts[i] for i in order] if texts is not None else None
+    
+    def __len__(self) -> int:
+        return len(self.ts)
+    
+    @classmethod
+    def empty(cls) -> "EntryFrame":
+        """Frame with no entries."""
+        return cls._from_columns([], [], [], [], [], np.empty((0, len(EMOTIONS))), [], [])
+    
+    @classmethod
+    def _from_columns(
+        cls,
+        ids: Sequence[int],
+        user_ids: Sequence[int],
+        ts: Sequence[int],
+        mood: Sequence[float],
+        sentiment: Sequence[float],
+        emotions,
+        tag_entry_ids: Sequence[int],
+        tags: Sequence[str],
+        texts: Optional[List[str]] = None,
+    ) -> "EntryFrame":
+        """Build from plain columns; tags are (entry id, tag) pairs given as two sequences."""
+        ids = np.asarray(ids, dtype=np.int64)
+        tag_rows = np.zeros(0, dtype=np.int64)
+        tag_codes = np.zeros(0, dtype=np.int32)
+        tag_names: List[str] = []
+        if len(tags):
+            # Map each tag's entry id to the entry's row
+            by_id = np.argsort(ids)
+            tag_entry_ids = np.asarray(tag_entry_ids, dtype=np.int64)
+            positions = np.searchsorted(ids[by_id], tag_entry_ids)
+            known = (positions < len(ids)) & (ids[by_id][np.minimum(positions, len(ids) - 1)] == tag_entry_ids)
+            names, codes = np.unique(np.asarray(tags, dtype=str)[known], return_inverse=True)
+            tag_rows = by_id[positions[known]]
+            tag_codes = codes.astype(np.int32).reshape(-1)
+            tag_names = names.tolist()
+        return cls(
+            ids,
+            np.asarray(user_ids, dtype=np.int64),
+            np.asarray(ts, dtype=np.int64),
+            np.asarray(mood, dtype=np.float64),
+            np.asarray(sentiment, dtype=np.float64),
+            np.asarray(emotions, dtype=np.float64),
+            tag_rows,
+            tag_codes,
+            tag_names,
+            texts,
+        )
+    
+    @classmethod
+    def from_entries(cls, entries: Iterable[Entry], with_text: bool = False) -> "EntryFrame":
+        """Build from Entry objects (one pass over them; everything else is vectorized)."""
+        entries = list(entries)
+        tag_pairs = [(entry.id, tag) for entry in entries for tag in parse_tags(entry.tags)]
+        emotions = [[getattr(entry, column) for column in EMOTION_COLUMNS] for entry in entries]
+        return cls._from_columns(
+            [entry.id or 0 for entry in entries],
+            [entry.user_id for entry in entries],
+            [entry.created_at for entry in entries],
+            [entry.mood_score for entry in entries],
+            [entry.sentiment for entry in entries],
+            np.array(emotions, dtype=np.float64).reshape(-1, len(EMOTIONS)),
+            [entry_id for entry_id, _ in tag_pairs],
+            [tag for _, tag in tag_pairs],
+            [entry.text for entry in entries] if with_text else None,
+        )
+    
+    def take(self, mask: np.ndarray) -> "EntryFrame":
+        """Frame of the rows where mask is True."""
+        rows = np.nonzero(mask)[0]
+        kept_tags = mask[self.tag_rows] if len(self.tag_rows) else np.zeros(0, dtype=bool)
+        frame = EntryFrame.__new__(EntryFrame)
+        frame.ids = self.ids[rows]
+        frame.user_ids = self.user_ids[rows]
+        frame.ts = self.ts[rows]
+        frame.day, frame.hour, frame.weekday = self.day[rows], self.hour[rows], self.weekday[rows]
+        frame.mood = self.mood[rows]
+        frame.sentiment = self.sentiment[rows]
+        frame.emotions = self.emotions[rows]
+        # Rows keep their order, so a kept row's new index is the number of kept rows before it
+        frame.tag_rows = (np.cumsum(mask) - 1)[self.tag_rows[kept_tags]]
+        frame.tag_codes = self.tag_codes[kept_tags]
+        frame.tag_names = self.tag_names
+        frame.texts = [self.texts[i] for i in rows] if self.texts is not None else None
+        return frame
+    
+    def between(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> "EntryFrame":
+        """Entries created within [start_ts, end_ts] (either bound optional)."""
+        mask = np.ones(len(self), dtype=bool)
+        if start_ts is not None:
+            mask &= self.ts >= start_ts
+        if end_ts is not None:
+            mask &= self.ts <= end_ts
+        return self.take(mask)
+    
+    def in_year(self, year: int) -> "EntryFrame":
+        """Entries whose local calendar day falls in year."""
+        start, end = np.datetime64(f"{year:04d}-01-01"), np.datetime64(f"{year + 1:04d}-01-01")
+        return self.take((self.day >= start) & (self.day < end))
+    
+    def daily_mood(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(days, average mood per day), days ascending."""
+        days, inverse = np.unique(self.day, return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1), minlength=len(days))
+        sums = np.bincount(inverse.reshape(-1), weights=self.mood, minlength=len(days))
+        return days, sums / np.maximum(counts, 1)
+    
+    def average_emotions(self) -> Dict[str, float]:
+        """Average emotion distribution across the entries."""
+        if not len(self):
+            return {emotion: 0.0 for emotion in EMOTIONS}
+        return dict(zip(EMOTIONS, self.emotions.mean(axis=0).tolist()))
+    
+    def tag_counts(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """(tag, entry count) pairs, most frequent first (ties by tag), like get_tag_counts."""
+        counts = np.bincount(self.tag_codes, minlength=len(self.tag_names))
+        pairs = sorted(
+            ((self.tag_names[code], int(counts[code])) for code in np.nonzero(counts)[0]),
+            key=lambda pair: (-pair[1], pair[0]),
+        )
+        return pairs[:limit] if limit else pairs
+    
+    def hour_weekday_mood(self) -> np.ndarray:
+        """7 x 24 matrix of average mood by weekday (Monday first) and hour; NaN where there are no entries."""
+        cells = self.weekday.astype(np.int64) * 24 + self.hour
+        counts = np.bincount(cells, minlength=7 * 24)
+        sums = np.bincount(cells, weights=self.mood, minlength=7 * 24)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan).reshape(7, 24)
+    
+    def summary(self) -> Dict:
+        """
+        Headline numbers for the entries.
+        
+        Returns:
+            dict with keys: total_entries, avg_mood, avg_sentiment, days_with_entries, unique_users
+        """
+        count = len(self)
+        return {
+            "total_entries": count,
+            "avg_mood": float(self.mood.mean()) if count else 0.0,
+            "avg_sentiment": float(self.sentiment.mean()) if count else 0.0,
+            "days_with_entries": int(len(np.unique(self.day))),
+            "unique_users": int(len(np.unique(self.user_ids))),
+        }
+
+
+def as_entry_frame(entries: Union[EntryFrame, Iterable[Entry]]) -> EntryFrame:
+    """Pass frames through; build one from a list of Entry objects."""
+    if isinstance(entries, EntryFrame):
+        return entries
+    return EntryFrame.from_entries(entries or [])
+
+
+def _load(
+    user_ids: List[int],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    with_text: bool,
+) -> EntryFrame:
+    """Query the entry and tag columns for users in a date range straight into a frame."""
+    if not user_ids:
+        return EntryFrame.empty()
+    
+    columns = [Entry.id, Entry.user_id, Entry.created_at, Entry.mood_score, Entry.sentiment]
+    columns += [getattr(Entry, column) for column in EMOTION_COLUMNS]
+    if with_text:
+        columns.append(Entry.text)
+    
+    # Core rows rather than ORM results: no per-row identity or entity handling
+    with engine.connect() as conn:
+        stmt = select(*columns).where(Entry.user_id.in_(user_ids))
+        tag_stmt = select(EntryTag.entry_id, EntryTag.tag).where(EntryTag.user_id.in_(user_ids))
+        if start_date:
+            stmt = stmt.where(Entry.created_at >= int(start_date.timestamp()))
+            tag_stmt = tag_stmt.where(EntryTag.created_at >= int(start_date.timestamp()))
+        if end_date:
+            stmt = stmt.where(Entry.created_at <= int(end_date.timestamp()))
+            tag_stmt = tag_stmt.where(EntryTag.created_at <= int(end_date.timestamp()))
+        rows = conn.execute(stmt).all()
+        tag_rows = conn.execute(tag_stmt).all()
+    
+    if not rows:
+        return EntryFrame.empty()
+    
+    numeric = np.array([row[:5 + len(EMOTION_COLUMNS)] for row in rows], dtype=np.float64)
+    return EntryFrame._from_columns(
+        numeric[:, 0],
+        numeric[:, 1],
+        numeric[:, 2],
+        numeric[:, 3],
+        numeric[:, 4],
+        numeric[:, 5:],
+        [entry_id for entry_id, _ in tag_rows],
+        [tag for _, tag in tag_rows],
+        [row[-1] for row in rows] if with_text else None,
+    )
+
+
+def get_entry_frame(
+    user_id: int = 1,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    with_text: bool = False,
+) -> EntryFrame:
+    """A user's entries in a date range as an EntryFrame (no Entry objects are built)."""
+    return _load([user_id], start_date, end_date, with_text)
+
+
+def get_cohort_entry_frame(
+    cohort_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> EntryFrame:
+    """Entries of every user in a cohort in a date range as an EntryFrame (for teacher mode)."""
+    with Session(engine) as session:
+        stmt = select(CohortMember.user_id).where(CohortMember.cohort_id == cohort_id)
+        user_ids = list(session.exec(stmt).all())
+    return _load(user_ids, start_date, end_date, False)
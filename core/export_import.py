@@ -2,9 +2,57 @@
 import json
 import csv
 import io
-from typing import List, Dict
+import tempfile
+from typing import List, Dict, Iterable, Iterator, BinaryIO
 from datetime import datetime
-from core.db import Entry, add_entry, get_or_create_user
+from core.db import Entry, add_entries_bulk, iter_entries
+
+
+# Column order for CSV exports (also what import_from_csv reads back)
+CSV_HEADER = [
+    "id", "user_id", "created_at", "text", "summary",
+    "sentiment", "mood_score", "emotions_json", "tags",
+    "source", "model_used", "tokens",
+]
+
+# Flush streamed exports in blocks of roughly this many bytes
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+
+def _csv_row(entry: Entry) -> list:
+    """CSV export row for one entry."""
+    return [
+        entry.id,
+        entry.user_id,
+        datetime.fromtimestamp(entry.created_at).isoformat(),
+        entry.text,
+        entry.summary,
+        entry.sentiment,
+        entry.mood_score,
+        entry.emotions_json,
+        entry.tags,
+        entry.source,
+        entry.model_used,
+        entry.tokens,
+    ]
+
+
+def _json_item(entry: Entry) -> dict:
+    """JSON export object for one entry."""
+    return {
+        "id": entry.id,
+        "user_id": entry.user_id,
+        "created_at": datetime.fromtimestamp(entry.created_at).isoformat(),
+        "text": entry.text,
+        "summary": entry.summary,
+        "sentiment": entry.sentiment,
+        "mood_score": entry.mood_score,
+        "emotions": entry.emotions,
+        "tags": entry.tags.split(",") if entry.tags else [],
+        "source": entry.source,
+        "model_used": entry.model_used,
+        "tokens": entry.tokens,
+    }
 
 
 def export_to_csv(entries: List[Entry]) -> str:
@@ -13,139 +61,108 @@ def export_to_csv(entries: List[Entry]) -> str:
     writer = csv.writer(output)
     
     # Header
-    writer.writerow([
-        "id", "user_id", "created_at", "text", "summary",
-        "sentiment", "mood_score", "emotions_json", "tags",
-        "source", "model_used", "tokens",
-    ])
+    writer.writerow(CSV_HEADER)
     
     # Data rows
     for entry in entries:
-        writer.writerow([
-            entry.id,
-            entry.user_id,
-            datetime.fromtimestamp(entry.created_at).isoformat(),
-            entry.text,
-            entry.summary,
-            entry.sentiment,
-            entry.mood_score,
-            entry.emotions_json,
-            entry.tags,
-            entry.source,
-            entry.model_used,
-            entry.tokens,
-        ])
+        writer.writerow(_csv_row(entry))
     
     return output.getvalue()
 
 
 def export_to_json(entries: List[Entry]) -> str:
     """Export entries to JSON format."""
-    data = []
-    for entry in entries:
-        data.append({
-            "id": entry.id,
-            "user_id": entry.user_id,
-            "created_at": datetime.fromtimestamp(entry.created_at).isoformat(),
-            "text": entry.text,
-            "summary": entry.summary,
-            "sentiment": entry.sentiment,
-            "mood_score": entry.mood_score,
-            "emotions": json.loads(entry.emotions_json),
-            "tags": entry.tags.split(",") if entry.tags else [],
-            "source": entry.source,
-            "model_used": entry.model_used,
-            "tokens": entry.tokens,
-        })
-    
+    data = [_json_item(entry) for entry in entries]
     return json.dumps(data, indent=2)
 
 
-def import_from_csv(csv_content: str, user_id: int) -> Dict[str, int]:
-    """Import entries from CSV content."""
-    reader = csv.DictReader(io.StringIO(csv_content))
-    
-    imported = 0
-    errors = 0
+def iter_csv_export(user_id: int, chunk_size: int = 1000) -> Iterator[bytes]:
+    """Stream a user's entries as UTF-8 CSV blocks, in constant memory."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
     
-    for row in reader:
-        try:
-            # Parse datetime
-            created_at = datetime.fromisoformat(row["created_at"])
-            created_at_ts = int(created_at.timestamp())
-            
-            # Parse emotions
-            emotions_json = row.get("emotions_json", "{}")
-            try:
-                emotions = json.loads(emotions_json)
-            except Exception:
-                emotions = {}
-            
-            # Parse tags
-            tags = row.get("tags", "")
-            
-            # Create entry
-            add_entry(
-                user_id=user_id,
-                text=row["text"],
-                summary=row.get("summary", ""),
-                sentiment=float(row.get("sentiment", 0.0)),
-                mood_score=int(row.get("mood_score", 50)),
-                emotions=emotions,
-                tags=tags,
-                source=row.get("source", "import"),
-                model_used=row.get("model_used", ""),
-                tokens=int(row.get("tokens", 0)),
-            )
-            imported += 1
-        except Exception as e:
-            errors += 1
-            continue
+    for entry in iter_entries(user_id, chunk_size=chunk_size):
+        writer.writerow(_csv_row(entry))
+        if output.tell() >= EXPORT_BLOCK_SIZE:
+            yield output.getvalue().encode("utf-8")
+            output.seek(0)
+            output.truncate(0)
     
-    return {"imported": imported, "errors": errors}
+    yield output.getvalue().encode("utf-8")
 
 
-def import_from_json(json_content: str, user_id: int) -> Dict[str, int]:
-    """Import entries from JSON content."""
-    data = json.loads(json_content)
+def iter_json_export(user_id: int, chunk_size: int = 1000) -> Iterator[bytes]:
+    """Stream a user's entries as UTF-8 JSON blocks (same layout as export_to_json)."""
+    parts = []
+    size = 0
+    first = True
     
-    imported = 0
-    errors = 0
+    for entry in iter_entries(user_id, chunk_size=chunk_size):
+        item = json.dumps(_json_item(entry), indent=2).replace("\n", "\n  ")
+        part = ("[\n  " if first else ",\n  ") + item
+        first = False
+        parts.append(part)
+        size += len(part)
+        if size >= EXPORT_BLOCK_SIZE:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
     
-    for item in data:
-        try:
-            # Parse datetime
-            created_at = datetime.fromisoformat(item["created_at"])
-            created_at_ts = int(created_at.timestamp())
-            
-            # Parse emotions
-            emotions = item.get("emotions", {})
-            
-            # Parse tags
-            tags = item.get("tags", [])
-            if isinstance(tags, list):
-                tags = ",".join(tags)
-            else:
-                tags = str(tags)
-            
-            # Create entry
-            add_entry(
-                user_id=user_id,
-                text=item["text"],
-                summary=item.get("summary", ""),
-                sentiment=float(item.get("sentiment", 0.0)),
-                mood_score=int(item.get("mood_score", 50)),
-                emotions=emotions,
-                tags=tags,
-                source=item.get("source", "import"),
-                model_used=item.get("model_used", ""),
-                tokens=int(item.get("tokens", 0)),
-            )
-            imported += 1
-        except Exception as e:
-            errors += 1
-            continue
+    parts.append("[]" if first else "\n]")
+    yield "".join(parts).encode("utf-8")
+
+
+def spool_export(chunks: Iterable[bytes], max_memory: int = 8 * 1024 * 1024) -> BinaryIO:
+    """Write streamed export blocks to a temp file (kept in memory only while small) and rewind it."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    for chunk in chunks:
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def import_from_csv(csv_content: str, user_id: int) -> Dict:
+    """Import entries from CSV content in one bulk transaction."""
+    reader = csv.DictReader(io.StringIO(csv_content))
+    
+    rows = (
+        {
+            "text": row.get("text"),
+            "created_at": row.get("created_at"),
+            "summary": row.get("summary", ""),
+            "sentiment": row.get("sentiment") or 0.0,
+            "mood_score": row.get("mood_score") or 50,
+            "emotions": row.get("emotions_json", "{}"),
+            "tags": row.get("tags", ""),
+            "source": row.get("source") or "import",
+            "model_used": row.get("model_used", ""),
+            "tokens": row.get("tokens") or 0,
+        }
+        for row in reader
+    )
     
-    return {"imported": imported, "errors": errors}
+    return add_entries_bulk(user_id, rows)
 
 
+def import_from_json(json_content: str, user_id: int) -> Dict:
+    """Import entries from JSON content in one bulk transaction."""
+    data = json.loads(json_content)
+    
+    rows = (
+        {
+            "text": item.get("text"),
+            "created_at": item.get("created_at"),
+            "summary": item.get("summary", ""),
+            "sentiment": item.get("sentiment", 0.0),
+            "mood_score": item.get("mood_score", 50),
+            "emotions": item.get("emotions", {}),
+            "tags": item.get("tags", []),
+            "source": item.get("source", "import"),
+            "model_used": item.get("model_used", ""),
+            "tokens": item.get("tokens", 0),
+        } if isinstance(item, dict) else {}
+        for item in data
+    )
+    
+    return add_entries_bulk(user_id, rows)
@@ -0,0 +1,126 @@
+"""In-process cache for chart figures and other derived page results."""
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Optional, Tuple
+import plotly.graph_objects as go
+import plotly.io as pio
+from sqlmodel import Session, select
+from core.db import engine, CohortMember, get_data_version
+from core.config import FIGURE_CACHE_MAX_BYTES
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, bytes]" = OrderedDict()  # key -> serialized value, least recently used first
+_size = 0  # total bytes in _entries
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+}
+
+
+def user_scope(user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Tuple:
+    """Scope of a user's entries in a date range, with the version of that user's data."""
+    return ("user", user_id, str(start_date), str(end_date), get_data_version(user_id))
+
+
+def cohort_scope(cohort_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Tuple:
+    """Scope of a cohort's entries in a date range, with its members and the version of all data."""
+    with Session(engine) as session:
+        stmt = select(CohortMember.user_id).where(CohortMember.cohort_id == cohort_id)
+        members = sorted(session.exec(stmt).all())
+    return ("cohort", cohort_id, members, str(start_date), str(end_date), get_data_version())
+
+
+def cache_key(kind: str, scope: Tuple, params: Dict) -> str:
+    """Key for one result: what was built, over which scope, with which parameters."""
+    return json.dumps([kind, scope, sorted(params.items())], default=str)
+
+
+def _store(key: str, data: bytes):
+    """Keep a serialized value, evicting least recently used values beyond the byte budget."""
+    global _size
+    with _lock:
+        if key in _entries:
+            _size -= len(_entries.pop(key))
+        _entries[key] = data
+        _size += len(data)
+        _stats["stores"] += 1
+        while _size > FIGURE_CACHE_MAX_BYTES and _entries:
+            _, evicted = _entries.popitem(last=False)
+            _size -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def get_value(
+    kind: str,
+    scope: Tuple,
+    build: Callable[[], Any],
+    dumps: Callable[[Any], bytes],
+    loads: Callable[[bytes], Any],
+    **params,
+) -> Any:
+    """Cached result of build(); stored as dumps(result) and returned as loads(stored)."""
+    key = cache_key(kind, scope, params)
+    with _lock:
+        data = _entries.get(key)
+        if data is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    if data is not None:
+        return loads(data)
+    
+    value = build()
+    data = dumps(value)
+    # Values bigger than the whole budget would only flush everything else
+    if len(data) <= FIGURE_CACHE_MAX_BYTES:
+        _store(key, data)
+    return value
+
+
+def get_figure(kind: str, scope: Tuple, build: Callable[[], go.Figure], **params) -> go.Figure:
+    """Cached Plotly figure, kept as its JSON so every hit gets a fresh figure object."""
+    return get_value(
+        kind,
+        scope,
+        build,
+        dumps=lambda fig: fig.to_json().encode("utf-8"),
+        loads=lambda data: pio.from_json(data.decode("utf-8")),
+        **params,
+    )
+
+
+def get_json(kind: str, scope: Tuple, build: Callable[[], Any], **params) -> Any:
+    """Cached JSON-serializable value (lists, dicts, numbers)."""
+    return get_value(
+        kind,
+        scope,
+        build,
+        dumps=lambda value: json.dumps(value).encode("utf-8"),
+        loads=lambda data: json.loads(data.decode("utf-8")),
+        **params,
+    )
+
+
+def clear():
+    """Drop every cached value."""
+    global _size
+    with _lock:
+        _entries.clear()
+        _size = 0
+
+
+def get_figure_cache_stats() -> Dict:
+    """Hit/miss counters and current size of the chart cache."""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["bytes"] = _size
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["max_bytes"] = FIGURE_CACHE_MAX_BYTES
+    return stats
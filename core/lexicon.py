@@ -0,0 +1,297 @@
+"""Offline lexicon-based sentiment and emotion scoring (no API, no network)."""
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from core.config import EMOTIONS
+
+# word -> (valence in -1..1, {emotion: weight})
+EMOTION_LEXICON: Dict[str, Tuple[float, Dict[str, float]]] = {
+    # joy
+    "happy": (0.8, {"joy": 1.0}),
+    "glad": (0.6, {"joy": 0.8}),
+    "joy": (0.8, {"joy": 1.0}),
+    "fun": (0.6, {"joy": 0.8}),
+    "great": (0.7, {"joy": 0.7}),
+    "good": (0.5, {"joy": 0.5}),
+    "nice": (0.4, {"joy": 0.4}),
+    "amazing": (0.9, {"joy": 0.8, "surprise": 0.4}),
+    "awesome": (0.8, {"joy": 0.8}),
+    "wonderful": (0.8, {"joy": 0.9}),
+    "fantastic": (0.9, {"joy": 0.9}),
+    "excellent": (0.8, {"joy": 0.7, "trust": 0.2}),
+    "love": (0.8, {"joy": 0.8, "trust": 0.5}),
+    "loved": (0.8, {"joy": 0.8, "trust": 0.5}),
+    "enjoy": (0.6, {"joy": 0.8}),
+    "enjoyed": (0.6, {"joy": 0.8}),
+    "proud": (0.7, {"joy": 0.8, "trust": 0.3}),
+    "grateful": (0.7, {"joy": 0.6, "trust": 0.6}),
+    "thankful": (0.7, {"joy": 0.6, "trust": 0.6}),
+    "relieved": (0.5, {"joy": 0.6, "trust": 0.3}),
+    "relaxed": (0.5, {"joy": 0.5, "trust": 0.4}),
+    "calm": (0.4, {"trust": 0.6, "joy": 0.3}),
+    "chill": (0.4, {"joy": 0.4, "trust": 0.4}),
+    "chilled": (0.4, {"joy": 0.4, "trust": 0.4}),
+    "peaceful": (0.5, {"trust": 0.6, "joy": 0.4}),
+    "content": (0.4, {"joy": 0.5, "trust": 0.3}),
+    "better": (0.4, {"joy": 0.4, "anticipation": 0.2}),
+    "best": (0.7, {"joy": 0.7}),
+    "laugh": (0.6, {"joy": 0.9}),
+    "laughed": (0.6, {"joy": 0.9}),
+    "smile": (0.5, {"joy": 0.8}),
+    "win": (0.6, {"joy": 0.7, "surprise": 0.2}),
+    "passed": (0.6, {"joy": 0.7, "surprise": 0.2}),
+    "energized": (0.6, {"joy": 0.6, "anticipation": 0.5}),
+    "motivated": (0.6, {"anticipation": 0.8, "joy": 0.4}),
+    # trust
+    "confident": (0.6, {"trust": 0.8, "joy": 0.3}),
+    "safe": (0.4, {"trust": 0.8}),
+    "supported": (0.5, {"trust": 0.9}),
+    "support": (0.3, {"trust": 0.7}),
+    "friends": (0.3, {"trust": 0.6, "joy": 0.3}),
+    "friend": (0.3, {"trust": 0.6, "joy": 0.3}),
+    "helpful": (0.4, {"trust": 0.7}),
+    "trust": (0.4, {"trust": 1.0}),
+    "ready": (0.3, {"anticipation": 0.6, "trust": 0.4}),
+    # anticipation
+    "excited": (0.7, {"anticipation": 0.8, "joy": 0.6}),
+    "looking": (0.1, {"anticipation": 0.3}),
+    "forward": (0.2, {"anticipation": 0.5}),
+    "hope": (0.4, {"anticipation": 0.8, "trust": 0.3}),
+    "hopeful": (0.5, {"anticipation": 0.8, "trust": 0.3}),
+    "optimistic": (0.5, {"anticipation": 0.7, "joy": 0.4}),
+    "weekend": (0.2, {"anticipation": 0.5, "joy": 0.2}),
+    "plan": (0.1, {"anticipation": 0.6}),
+    "planning": (0.1, {"anticipation": 0.6}),
+    "upcoming": (0.0, {"anticipation": 0.7}),
+    "deadline": (-0.3, {"anticipation": 0.5, "fear": 0.5}),
+    "deadlines": (-0.3, {"anticipation": 0.5, "fear": 0.5}),
+    "curious": (0.3, {"anticipation": 0.6, "surprise": 0.4}),
+    # surprise
+    "surprised": (0.1, {"surprise": 1.0}),
+    "surprise": (0.1, {"surprise": 1.0}),
+    "unexpected": (0.0, {"surprise": 0.9}),
+    "suddenly": (0.0, {"surprise": 0.7}),
+    "shocked": (-0.3, {"surprise": 0.9, "fear": 0.3}),
+    "wow": (0.4, {"surprise": 0.9, "joy": 0.3}),
+    "weird": (-0.2, {"surprise": 0.6, "disgust": 0.2}),
+    # sad
+    "sad": (-0.7, {"sad": 1.0}),
+    "unhappy": (-0.7, {"sad": 0.9}),
+    "down": (-0.4, {"sad": 0.6}),
+    "depressed": (-0.9, {"sad": 1.0}),
+    "lonely": (-0.7, {"sad": 0.9}),
+    "alone": (-0.4, {"sad": 0.7}),
+    "cry": (-0.7, {"sad": 1.0}),
+    "cried": (-0.7, {"sad": 1.0}),
+    "crying": (-0.7, {"sad": 1.0}),
+    "miss": (-0.4, {"sad": 0.7}),
+    "lost": (-0.5, {"sad": 0.7, "fear": 0.2}),
+    "disappointed": (-0.6, {"sad": 0.8, "anger": 0.2}),
+    "hurt": (-0.6, {"sad": 0.8, "anger": 0.3}),
+    "pain": (-0.6, {"sad": 0.7, "fear": 0.2}),
+    "tired": (-0.4, {"sad": 0.6}),
+    "exhausted": (-0.6, {"sad": 0.7}),
+    "drained": (-0.5, {"sad": 0.7}),
+    "bored": (-0.3, {"sad": 0.4, "disgust": 0.3}),
+    "failed": (-0.7, {"sad": 0.8, "fear": 0.3}),
+    "fail": (-0.6, {"sad": 0.6, "fear": 0.5}),
+    "bad": (-0.5, {"sad": 0.5}),
+    "terrible": (-0.8, {"sad": 0.6, "disgust": 0.4}),
+    "awful": (-0.8, {"sad": 0.6, "disgust": 0.4}),
+    "worst": (-0.8, {"sad": 0.6, "anger": 0.3}),
+    "sick": (-0.5, {"sad": 0.6, "disgust": 0.3}),
+    "struggle": (-0.5, {"sad": 0.6, "fear": 0.3}),
+    "struggling": (-0.5, {"sad": 0.6, "fear": 0.3}),
+    "hard": (-0.3, {"sad": 0.4, "fear": 0.2}),
+    "difficult": (-0.4, {"sad": 0.4, "fear": 0.3}),
+    "tough": (-0.3, {"sad": 0.4}),
+    "pieces": (-0.3, {"sad": 0.5}),
+    # anger
+    "angry": (-0.7, {"anger": 1.0}),
+    "mad": (-0.6, {"anger": 0.9}),
+    "annoyed": (-0.5, {"anger": 0.8}),
+    "annoying": (-0.5, {"anger": 0.7, "disgust": 0.3}),
+    "frustrated": (-0.6, {"anger": 0.8, "sad": 0.3}),
+    "frustrating": (-0.6, {"anger": 0.8}),
+    "furious": (-0.9, {"anger": 1.0}),
+    "irritated": (-0.5, {"anger": 0.8}),
+    "hate": (-0.8, {"anger": 0.8, "disgust": 0.6}),
+    "unfair": (-0.6, {"anger": 0.8, "sad": 0.3}),
+    "argument": (-0.5, {"anger": 0.8}),
+    "fight": (-0.5, {"anger": 0.8, "fear": 0.2}),
+    # fear
+    "scared": (-0.7, {"fear": 1.0}),
+    "afraid": (-0.7, {"fear": 1.0}),
+    "anxious": (-0.6, {"fear": 0.9, "anticipation": 0.3}),
+    "anxiety": (-0.6, {"fear": 0.9}),
+    "worried": (-0.6, {"fear": 0.9}),
+    "worry": (-0.5, {"fear": 0.8}),
+    "nervous": (-0.5, {"fear": 0.8, "anticipation": 0.3}),
+    "stress": (-0.5, {"fear": 0.7, "anger": 0.2}),
+    "stressed": (-0.6, {"fear": 0.7, "anger": 0.2}),
+    "stressful": (-0.6, {"fear": 0.7}),
+    "overwhelmed": (-0.7, {"fear": 0.8, "sad": 0.4}),
+    "panic": (-0.8, {"fear": 1.0}),
+    "pressure": (-0.4, {"fear": 0.7}),
+    "exam": (-0.1, {"anticipation": 0.4, "fear": 0.4}),
+    "exams": (-0.1, {"anticipation": 0.4, "fear": 0.4}),
+    "test": (-0.1, {"anticipation": 0.4, "fear": 0.3}),
+    "unsure": (-0.3, {"fear": 0.6}),
+    "insecure": (-0.5, {"fear": 0.8, "sad": 0.3}),
+    # disgust
+    "disgusted": (-0.7, {"disgust": 1.0}),
+    "disgusting": (-0.7, {"disgust": 1.0}),
+    "gross": (-0.6, {"disgust": 0.9}),
+    "sucks": (-0.6, {"disgust": 0.6, "anger": 0.4}),
+    "ugh": (-0.5, {"disgust": 0.6, "anger": 0.4}),
+    "embarrassed": (-0.5, {"disgust": 0.5, "sad": 0.4, "fear": 0.3}),
+    "ashamed": (-0.6, {"disgust": 0.6, "sad": 0.5}),
+    "boring": (-0.3, {"disgust": 0.5, "sad": 0.2}),
+}
+
+# Words that flip the next few tokens
+NEGATIONS = {
+    "not", "no", "never", "none", "nothing", "without", "hardly", "barely",
+    "dont", "don't", "didnt", "didn't", "doesnt", "doesn't", "isnt", "isn't",
+    "wasnt", "wasn't", "arent", "aren't", "cant", "can't", "cannot", "wont", "won't",
+    "couldnt", "couldn't", "shouldnt", "shouldn't", "neither", "nor",
+}
+
+# Words that scale the next token
+INTENSIFIERS = {
+    "very": 1.5, "really": 1.4, "so": 1.3, "extremely": 1.8, "super": 1.5,
+    "too": 1.3, "totally": 1.4, "incredibly": 1.7, "quite": 1.2,
+    "slightly": 0.6, "somewhat": 0.7, "kinda": 0.7, "bit": 0.7, "little": 0.8,
+}
+
+# How many tokens after a negation it applies to
+NEGATION_SCOPE = 3
+
+# A negated emotion moves part of its weight to its Plutchik opposite
+OPPOSITES = {
+    "joy": "sad", "sad": "joy",
+    "anger": "fear", "fear": "anger",
+    "anticipation": "surprise", "surprise": "anticipation",
+    "trust": "disgust", "disgust": "trust",
+}
+NEGATED_VALENCE = -0.5
+NEGATED_OPPOSITE_WEIGHT = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def _compile(lexicon: Dict[str, Tuple[float, Dict[str, float]]]):
+    """Compile the lexicon into a word index plus valence and emotion arrays."""
+    index = {word: i for i, word in enumerate(lexicon)}
+    valence = np.zeros(len(lexicon), dtype=np.float64)
+    emotions = np.zeros((len(lexicon), len(EMOTIONS)), dtype=np.float64)
+    negated = np.zeros((len(lexicon), len(EMOTIONS)), dtype=np.float64)
+    column = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+    
+    for word, i in index.items():
+        word_valence, weights = lexicon[word]
+        valence[i] = word_valence
+        for emotion, weight in weights.items():
+            emotions[i, column[emotion]] = weight
+            negated[i, column[OPPOSITES[emotion]]] += weight * NEGATED_OPPOSITE_WEIGHT
+    return index, valence, emotions, negated
+
+
+_WORD_INDEX, _VALENCE, _EMOTIONS, _NEGATED_EMOTIONS = _compile(EMOTION_LEXICON)
+
+
+def _lexicon_hits(text: str) -> Tuple[List[int], List[float], List[bool]]:
+    """Lexicon rows matched in text, with intensity multipliers and negation flags."""
+    rows, scales, negated = [], [], []
+    negate_left = 0
+    scale = 1.0
+    
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in NEGATIONS:
+            negate_left = NEGATION_SCOPE
+            continue
+        if token in INTENSIFIERS:
+            scale *= INTENSIFIERS[token]
+            continue
+        
+        row = _WORD_INDEX.get(token)
+        if row is not None:
+            rows.append(row)
+            scales.append(scale)
+            negated.append(negate_left > 0)
+        scale = 1.0
+        if negate_left:
+            negate_left -= 1
+    
+    return rows, scales, negated
+
+
+def score_emotions(text: str) -> Tuple[float, Dict[str, float]]:
+    """Sentiment (-1..1) and normalized emotion distribution for one text."""
+    rows, scales, negated = _lexicon_hits(text or "")
+    if not rows:
+        return 0.0, {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS}
+    
+    rows = np.asarray(rows)
+    scales = np.asarray(scales)
+    negated = np.asarray(negated)
+    
+    valence = _VALENCE[rows] * scales * np.where(negated, NEGATED_VALENCE, 1.0)
+    vectors = np.where(negated[:, None], _NEGATED_EMOTIONS[rows], _EMOTIONS[rows]) * scales[:, None]
+    
+    # Squash the summed valence into -1..1 (VADER-style normalization)
+    total = float(valence.sum())
+    sentiment = total / np.sqrt(total * total + 4.0)
+    
+    emotion_totals = vectors.sum(axis=0)
+    mass = float(emotion_totals.sum())
+    if mass <= 0:
+        emotions = {emotion: 1.0 / len(EMOTIONS) for emotion in EMOTIONS}
+    else:
+        emotions = dict(zip(EMOTIONS, (emotion_totals / mass).tolist()))
+    return max(-1.0, min(1.0, sentiment)), emotions
+
+
+def score_text(text: str) -> Dict:
+    """
+    Score text with the local lexicon.
+    
+    Returns:
+        dict with the same keys as core.ai.analyze_text, model_used "lexicon", tokens 0
+    """
+    sentiment, emotions = score_emotions(text)
+    top_emotion = max(emotions, key=emotions.get)
+    flat = max(emotions.values()) - min(emotions.values()) < 1e-9
+    
+    return {
+        "sentiment": sentiment,
+        "mood_score": int((sentiment + 1) * 50),
+        "emotions": emotions,
+        "summary": (
+            "Quick keyword-based estimate: no strong emotion words found."
+            if flat
+            else f"Quick keyword-based estimate: your words lean towards {top_emotion}."
+        ),
+        "suggestions": SUGGESTIONS.get("neutral" if flat else top_emotion, SUGGESTIONS["neutral"]),
+        "model_used": "lexicon",
+        "tokens": 0,
+    }
+
+
+def score_many(texts: List[str]) -> List[Dict]:
+    """Score many texts with the local lexicon."""
+    return [score_text(text) for text in texts]
+
+
+# Gentle suggestions by dominant emotion
+SUGGESTIONS = {
+    "joy": ["Note what made today good so you can repeat it", "Share the good news with someone"],
+    "trust": ["Lean on the people who support you", "Keep the routines that are working"],
+    "anticipation": ["Break what's coming into small next steps", "Plan a short break to look forward to"],
+    "surprise": ["Take a moment to process what happened", "Write down how it changes your plans"],
+    "sad": ["Take a short walk or a break outside", "Consider talking to someone you trust"],
+    "anger": ["Step away for a few minutes before reacting", "Write down what's bothering you"],
+    "fear": ["List what you can control today", "Try a few slow, deep breaths"],
+    "disgust": ["Change your environment for a bit", "Focus on one small thing you enjoy"],
+    "neutral": ["Take a moment to reflect on your day", "Consider talking to someone you trust"],
+}
@@ -41,6 +41,13 @@ except Exception:
         "not", "only", "own", "same", "so", "than", "too", "very",
     }
 
+# Probe once: without the punkt data every word_tokenize call raises, which is slow across many texts
+try:
+    word_tokenize("probe")
+    WORD_TOKENIZE_AVAILABLE = True
+except Exception:
+    WORD_TOKENIZE_AVAILABLE = False
+
 
 def clean_text(text: str) -> str:
     """Clean text by removing special characters and normalizing whitespace."""
@@ -73,9 +80,13 @@ def scrub_pii(text: str) -> str:
 def tokenize(text: str, remove_stopwords: bool = True) -> List[str]:
     """Tokenize text and optionally remove stopwords."""
     text = clean_text(text.lower())
-    try:
-        tokens = word_tokenize(text)
-    except Exception:
+    tokens = None
+    if WORD_TOKENIZE_AVAILABLE:
+        try:
+            tokens = word_tokenize(text)
+        except Exception:
+            pass
+    if tokens is None:
         tokens = text.split()
     
     if remove_stopwords:
@@ -93,21 +104,23 @@ def extract_ngrams(tokens: List[str], n: int = 2) -> List[Tuple[str, ...]]:
 
 def get_top_ngrams(texts: List[str], n: int = 2, top_k: int = 10) -> List[Tuple[str, int]]:
     """Get top n-grams from a list of texts."""
-    all_ngrams = []
-    for text in texts:
-        tokens = tokenize(text, remove_stopwords=True)
-        ngrams = extract_ngrams(tokens, n)
-        all_ngrams.extend(ngrams)
-    
-    counter = Counter(all_ngrams)
+    return get_top_ngrams_from_tokens([tokenize(text, remove_stopwords=True) for text in texts], n, top_k)
+
+
+def get_top_ngrams_from_tokens(token_lists: List[List[str]], n: int = 2, top_k: int = 10) -> List[Tuple[str, int]]:
+    """Get top n-grams from texts already split with tokenize (one token list per text)."""
+    counter = Counter(ngram for tokens in token_lists for ngram in extract_ngrams(tokens, n))
     top = counter.most_common(top_k)
     return [(" ".join(ngram), count) for ngram, count in top]
 
 
 def get_wordcloud(text: str, width: int = 800, height: int = 400):
     """Generate word cloud image from text."""
-    # Clean and tokenize
-    tokens = tokenize(text, remove_stopwords=True)
+    return get_wordcloud_from_tokens(tokenize(text, remove_stopwords=True), width, height)
+
+
+def get_wordcloud_from_tokens(tokens: List[str], width: int = 800, height: int = 400):
+    """Generate word cloud image from tokens produced by tokenize."""
     text_clean = " ".join(tokens)
     
     if not text_clean:
@@ -135,6 +148,14 @@ def get_wordcloud(text: str, width: int = 800, height: int = 400):
 
 def get_positive_negative_words(texts: List[str], top_k: int = 10) -> Tuple[List[str], List[str]]:
     """Extract positive and negative words (simple heuristic based on common words)."""
+    return get_positive_negative_words_from_tokens([tokenize(text, remove_stopwords=True) for text in texts], top_k)
+
+
+def get_positive_negative_words_from_tokens(
+    token_lists: List[List[str]],
+    top_k: int = 10,
+) -> Tuple[List[str], List[str]]:
+    """Extract positive and negative words from texts already split with tokenize."""
     # This is a simple heuristic - in a real app, you might use a sentiment lexicon
     positive_words = {
         "good", "great", "happy", "joy", "love", "excited", "amazing", "wonderful",
@@ -147,12 +168,7 @@ def get_positive_negative_words(texts: List[str], top_k: int = 10) -> Tuple[List
         "hard", "tough", "struggle", "pain", "hurt", "tired", "exhausted", "overwhelmed",
     }
     
-    all_tokens = []
-    for text in texts:
-        tokens = tokenize(text, remove_stopwords=True)
-        all_tokens.extend(tokens)
-    
-    counter = Counter(all_tokens)
+    counter = Counter(token for tokens in token_lists for token in tokens)
     positive = [word for word, count in counter.most_common(top_k * 2) if word in positive_words][:top_k]
     negative = [word for word, count in counter.most_common(top_k * 2) if word in negative_words][:top_k]
     
@@ -0,0 +1,277 @@
+"""Process-wide rate limiting, retry backoff and circuit breaking for OpenAI calls."""
+import json
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from core.config import (
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE,
+    OPENAI_RATE_LIMITS,
+    OPENAI_BACKOFF_BASE_SECONDS,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+)
+
+# Upper bound for a single backoff sleep
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class RateLimitExceeded(Exception):
+    """No rate-limit capacity is available within the allowed wait."""
+
+
+class CircuitOpenError(Exception):
+    """The provider is marked unhealthy; calls fail fast until the breaker resets."""
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most one minute of capacity."""
+    
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float, headroom: float = 0.0) -> float:
+        """Seconds until `amount` is available with `headroom` (a share of capacity) left over."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # Outstanding reservations leave the level negative, so later callers queue behind them
+        deficit = min(amount + headroom * self.capacity, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+    
+    def take(self, amount: float):
+        """Reserve `amount` (a negative amount gives capacity back)."""
+        if self.rate > 0:
+            self.level = min(self.capacity, self.level - amount)
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one model."""
+    
+    def __init__(self, model: str, requests_per_minute: float, tokens_per_minute: float):
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "rejected": 0, "waited_seconds": 0.0, "retry_after": 0}
+    
+    def reserve(self, tokens: int, max_wait: float, headroom: float = 0.0) -> float:
+        """
+        Reserve one request and `tokens` tokens.
+        
+        Returns the seconds the caller must wait before sending; raises
+        RateLimitExceeded (reserving nothing) if that would exceed max_wait.
+        With headroom, the caller also waits until that share of each limit
+        would remain afterwards (background calls keep it for interactive ones).
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now, headroom),
+                self._tokens.wait_time(tokens, now, headroom),
+            )
+            if wait > max_wait:
+                self.stats["rejected"] += 1
+                raise RateLimitExceeded(f"No {self.model} capacity within {max_wait:.0f}s")
+            
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self.stats["requests"] += 1
+            if wait > 0:
+                self.stats["throttled"] += 1
+                self.stats["waited_seconds"] += wait
+            return wait
+    
+    def settle(self, reserved: int, used: int):
+        """Correct a reservation once the actual token usage is known."""
+        with self._lock:
+            self._tokens.take(used - reserved)
+    
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (the provider sent Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.stats["retry_after"] += 1
+    
+    def snapshot(self) -> Dict:
+        """Configured limits, remaining capacity and counters."""
+        with self._lock:
+            now = time.monotonic()
+            self._requests.wait_time(0, now)
+            self._tokens.wait_time(0, now)
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests_available": max(0.0, self._requests.level),
+                "tokens_available": max(0.0, self._tokens.level),
+                "paused_for": max(0.0, self._paused_until - now),
+                **self.stats,
+            }
+
+
+class CircuitBreaker:
+    """Opens after consecutive provider failures; lets one probe through after reset_seconds."""
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._trips = 0
+        self._rejected = 0
+    
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go to the provider now."""
+        with self._lock:
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    self._rejected += 1
+                    raise CircuitOpenError("OpenAI is marked unavailable; using fallback results")
+                self._state = "half_open"
+                self._probe_in_flight = False
+            if self._state == "half_open":
+                if self._probe_in_flight:
+                    self._rejected += 1
+                    raise CircuitOpenError("OpenAI recovery probe in progress; using fallback results")
+                self._probe_in_flight = True
+    
+    def release(self):
+        """Give back a half-open probe slot that was never used."""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_success(self):
+        """The provider answered; close the breaker."""
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        """The provider failed (429, 5xx, timeout or connection error)."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trips += 1
+                logging.warning(f"OpenAI circuit breaker opened after {self._failures} failures")
+    
+    def is_open(self) -> bool:
+        """Whether calls would currently be rejected without a probe."""
+        with self._lock:
+            return self._state == "open" and time.monotonic() - self._opened_at < self.reset_seconds
+    
+    def snapshot(self) -> Dict:
+        """Breaker state and counters."""
+        with self._lock:
+            retry_in = 0.0
+            state = self._state
+            if state == "open":
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+                if retry_in == 0:
+                    state = "half_open"
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "rejected": self._rejected,
+                "retry_in": retry_in,
+            }
+
+
+def _parse_rate_limits(raw: str) -> Dict[str, Dict]:
+    """Per-model overrides from OPENAI_RATE_LIMITS (JSON object keyed by model)."""
+    if not raw:
+        return {}
+    try:
+        limits = json.loads(raw)
+        return limits if isinstance(limits, dict) else {}
+    except json.JSONDecodeError:
+        logging.warning("OPENAI_RATE_LIMITS is not valid JSON; using default limits")
+        return {}
+
+
+_MODEL_LIMITS = _parse_rate_limits(OPENAI_RATE_LIMITS)
+
+_limiters_lock = threading.Lock()
+_limiters: Dict[str, ModelLimiter] = {}
+
+# One breaker per process: provider health is shared by every model
+breaker = CircuitBreaker(CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET_SECONDS)
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    """The process-wide limiter for a model."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = _MODEL_LIMITS.get(model, {})
+            limiter = ModelLimiter(
+                model,
+                float(limits.get("rpm", OPENAI_REQUESTS_PER_MINUTE)),
+                float(limits.get("tpm", OPENAI_TOKENS_PER_MINUTE)),
+            )
+            _limiters[model] = limiter
+        return limiter
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After (or retry-after-ms) from an API error's response headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, OPENAI_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def get_rate_limit_status() -> Dict:
+    """
+    Circuit breaker state and per-model limiter snapshots.
+    
+    Returns:
+        dict with keys: breaker (state, consecutive_failures, trips, rejected, retry_in),
+        models (model -> limits, available capacity and counters)
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {
+        "breaker": breaker.snapshot(),
+        "models": {limiter.model: limiter.snapshot() for limiter in limiters},
+    }
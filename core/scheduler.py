@@ -0,0 +1,275 @@
+"""Shared scheduler for OpenAI calls: priority classes, concurrency caps and fair draining."""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional
+from core.config import (
+    AI_MAX_CONCURRENCY,
+    AI_NEARLINE_CONCURRENCY,
+    AI_BULK_CONCURRENCY,
+    AI_INTERACTIVE_RESERVED,
+)
+from core.rate_limit import RateLimitExceeded
+
+# Priority classes, most urgent first: a user waiting on the page, user-visible
+# follow-up work (re-analysis the user asked for), and backfills/imports
+PRIORITIES = ("interactive", "nearline", "bulk")
+
+# Background classes share what interactive work leaves in this ratio (nearline:bulk = 3:1),
+# so a backfill keeps moving while near-line work is queued
+DRAIN_CYCLE = ("nearline", "nearline", "nearline", "bulk")
+
+# Recent waits kept per class for the percentile metrics
+WAIT_SAMPLES = 500
+
+_priority: ContextVar[str] = ContextVar("ai_priority", default="interactive")
+
+
+@contextmanager
+def use_priority(priority: str) -> Iterator[None]:
+    """Run the OpenAI calls made inside the block in the given priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    """Priority class of OpenAI calls made from the current context."""
+    return _priority.get()
+
+
+class _AsyncWaiter:
+    """Queue entry of a coroutine waiting in acquire_async; the scheduler grants it by resolving future."""
+    
+    __slots__ = ("loop", "future", "started", "granted", "waited")
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, started: float):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.started = started
+        self.granted = False
+        self.waited = 0.0
+
+
+def _resolve(future: asyncio.Future, waited: float):
+    """Wake an async waiter (runs on its event loop)."""
+    if not future.done():
+        future.set_result(waited)
+
+
+def percentile(samples, q: int) -> Optional[float]:
+    """Nearest-rank percentile of a list of samples, None when empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, -(-q * len(ordered) // 100) - 1)]
+
+
+class AIScheduler:
+    """
+    Grants slots for in-flight OpenAI calls.
+    
+    Interactive calls may use every slot and always go first; near-line and
+    bulk calls have their own caps and can never take the last
+    interactive_reserved slots. When slots free up, waiting background
+    classes are served in DRAIN_CYCLE order and each class is FIFO.
+    
+    Threads wait on a condition and take their slot themselves; coroutines
+    wait on a future of their event loop and are granted their slot by
+    whichever thread frees it, so both kinds share one queue per class.
+    """
+    
+    def __init__(self, max_concurrency: int, limits: Dict[str, int], interactive_reserved: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limits = {"interactive": self.max_concurrency, **limits}
+        self.interactive_reserved = min(max(0, interactive_reserved), self.max_concurrency - 1)
+        self._cond = threading.Condition()
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._waiters: Dict[str, Deque[object]] = {priority: deque() for priority in PRIORITIES}
+        self._cycle_position = 0
+        self._waits: Dict[str, Deque[float]] = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self._stats = {priority: {"granted": 0, "timed_out": 0} for priority in PRIORITIES}
+    
+    def _can_run(self, priority: str) -> bool:
+        total = sum(self._in_flight.values())
+        if total >= self.max_concurrency or self._in_flight[priority] >= self.limits[priority]:
+            return False
+        # Background work leaves the reserved slots free for interactive calls
+        return priority == "interactive" or total < self.max_concurrency - self.interactive_reserved
+    
+    def _next(self):
+        """(priority, cycle index) of the class whose head waiter runs next, or (None, None)."""
+        if self._waiters["interactive"] and self._can_run("interactive"):
+            return "interactive", None
+        for offset in range(len(DRAIN_CYCLE)):
+            index = (self._cycle_position + offset) % len(DRAIN_CYCLE)
+            priority = DRAIN_CYCLE[index]
+            if self._waiters[priority] and self._can_run(priority):
+                return priority, index
+        return None, None
+    
+    def _grant(self, priority: str, index: Optional[int], started: float) -> float:
+        """Give the head waiter of priority's class its slot (lock held); returns the seconds it waited."""
+        self._waiters[priority].popleft()
+        self._in_flight[priority] += 1
+        if index is not None:
+            self._cycle_position = index + 1
+        waited = time.monotonic() - started
+        self._waits[priority].append(waited)
+        self._stats[priority]["granted"] += 1
+        return waited
+    
+    def _dispatch(self):
+        """Grant slots to async waiters that are next in line (lock held); threads grant themselves."""
+        granted = False
+        while True:
+            chosen, index = self._next()
+            if chosen is None or not isinstance(self._waiters[chosen][0], _AsyncWaiter):
+                break
+            waiter = self._waiters[chosen][0]
+            waiter.waited = self._grant(chosen, index, waiter.started)
+            try:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future, waiter.waited)
+            except RuntimeError:
+                # Its event loop is closed, so nobody will use the slot
+                self._in_flight[chosen] -= 1
+                continue
+            waiter.granted = True
+            granted = True
+        if granted:
+            # Granting moved queue heads, so a waiting thread may be next now
+            self._cond.notify_all()
+    
+    def acquire(self, priority: str, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a slot in priority's class.
+        
+        Returns the seconds waited; raises RateLimitExceeded if no slot was
+        granted within timeout (None waits indefinitely).
+        """
+        ticket = object()
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            self._waiters[priority].append(ticket)
+            try:
+                while True:
+                    self._dispatch()
+                    chosen, index = self._next()
+                    if chosen == priority and self._waiters[priority][0] is ticket:
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats[priority]["timed_out"] += 1
+                        raise RateLimitExceeded(f"No {priority} AI slot within {timeout:.0f}s")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiters[priority].remove(ticket)
+                self._dispatch()
+                self._cond.notify_all()
+                raise
+            
+            waited = self._grant(priority, index, started)
+            # Another slot may still be free for the next waiter
+            self._dispatch()
+            self._cond.notify_all()
+            return waited
+    
+    async def acquire_async(self, priority: str, timeout: Optional[float] = None) -> float:
+        """acquire for coroutines: waits on an event-loop future, without a thread."""
+        waiter = _AsyncWaiter(asyncio.get_running_loop(), time.monotonic())
+        with self._cond:
+            self._waiters[priority].append(waiter)
+            self._dispatch()
+            if waiter.granted:
+                return waiter.waited
+        
+        try:
+            if timeout is None:
+                return await waiter.future
+            return await asyncio.wait_for(waiter.future, max(0.0, timeout))
+        except BaseException as e:
+            with self._cond:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters[priority].remove(waiter)
+                    if isinstance(e, TimeoutError):
+                        self._stats[priority]["timed_out"] += 1
+                    self._dispatch()
+                    self._cond.notify_all()
+            if granted and isinstance(e, TimeoutError):
+                # The slot came through just as the wait timed out
+                return waiter.waited
+            if granted:
+                # Cancelled after being granted: hand the slot straight back
+                self.release(priority)
+            if isinstance(e, TimeoutError):
+                raise RateLimitExceeded(f"No {priority} AI slot within {timeout:.0f}s") from None
+            raise
+    
+    def release(self, priority: str):
+        """Give back a slot taken with acquire or acquire_async."""
+        with self._cond:
+            self._in_flight[priority] -= 1
+            self._dispatch()
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        """Hold a slot for the block (priority defaults to the context's class)."""
+        priority = priority or current_priority()
+        self.acquire(priority, timeout)
+        try:
+            yield priority
+        finally:
+            self.release(priority)
+    
+    def snapshot(self) -> Dict:
+        """
+        Capacity, queue depth and wait times per class.
+        
+        Returns:
+            dict with keys: max_concurrency, interactive_reserved, in_flight,
+            classes (priority -> limit, in_flight, queued, granted, timed_out,
+            wait_p50_ms, wait_p95_ms, wait_max_ms)
+        """
+        with self._cond:
+            classes = {}
+            for priority in PRIORITIES:
+                waits = list(self._waits[priority])
+                p50, p95 = percentile(waits, 50), percentile(waits, 95)
+                classes[priority] = {
+                    "limit": self.limits[priority],
+                    "in_flight": self._in_flight[priority],
+                    "queued": len(self._waiters[priority]),
+                    **self._stats[priority],
+                    "wait_p50_ms": p50 * 1000 if p50 is not None else None,
+                    "wait_p95_ms": p95 * 1000 if p95 is not None else None,
+                    "wait_max_ms": max(waits) * 1000 if waits else None,
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "interactive_reserved": self.interactive_reserved,
+                "in_flight": sum(self._in_flight.values()),
+                "classes": classes,
+            }
+
+
+# One scheduler per process, shared by every OpenAI call
+scheduler = AIScheduler(
+    AI_MAX_CONCURRENCY,
+    {"nearline": AI_NEARLINE_CONCURRENCY, "bulk": AI_BULK_CONCURRENCY},
+    AI_INTERACTIVE_RESERVED,
+)
+
+
+def get_scheduler_status() -> Dict:
+    """Scheduler snapshot (see AIScheduler.snapshot)."""
+    return scheduler.snapshot()
@@ -0,0 +1,170 @@
+"""Local token counting and input budgets for analysis requests."""
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+from core.config import ANALYSIS_INPUT_TOKEN_BUDGET, OPENAI_MODEL
+from core.lexicon import EMOTION_LEXICON
+from core.nlp_utils import tokenize
+
+# tiktoken gives exact counts when installed; otherwise a characters-per-token heuristic is used
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Heuristic for English text when tiktoken is unavailable (errs slightly high)
+CHARS_PER_TOKEN = 3.8
+
+# Tokens chat models add per message for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Extra score per emotion-lexicon word, so feeling-laden sentences survive condensing
+EMOTION_WORD_BONUS = 1.0
+
+# Sentence boundaries: end punctuation followed by whitespace, or line breaks
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_lock = threading.Lock()
+_stats = {"condensed": 0, "original_tokens": 0, "sent_tokens": 0}
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None to use the heuristic."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use; offline installs fall back to the heuristic
+        logging.warning(f"tiktoken unavailable for {model}, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """Number of tokens text takes for model (exact with tiktoken, estimated otherwise)."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: List[Dict], model: str = "") -> int:
+    """Prompt tokens of a chat request's messages."""
+    return sum(count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences (punctuation and line breaks)."""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+
+def _score_sentences(sentences: List[str]) -> List[float]:
+    """
+    Importance of each sentence.
+    
+    Content words are weighted by how often the entry repeats them (its
+    recurring topics), averaged per sentence so long sentences aren't
+    favored, plus a bonus for every word that carries emotion.
+    """
+    tokens = [tokenize(sentence) for sentence in sentences]
+    frequencies = Counter(token for sentence_tokens in tokens for token in sentence_tokens)
+    scores = []
+    for sentence, sentence_tokens in zip(sentences, tokens):
+        topic = sum(frequencies[token] for token in sentence_tokens) / len(sentence_tokens) if sentence_tokens else 0.0
+        words = re.findall(r"[a-z']+", sentence.lower())
+        emotional = sum(1 for word in words if word in EMOTION_LEXICON)
+        scores.append(topic + EMOTION_WORD_BONUS * emotional)
+    return scores
+
+
+def _truncate_to_budget(text: str, budget: int, model: str) -> str:
+    """Cut text at a word boundary so it fits budget tokens."""
+    words = text.split()
+    low, high = 0, len(words)
+    # Binary search for the longest prefix that fits
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]), model) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low])
+
+
+def condense_text(text: str, budget: int, model: str = "") -> str:
+    """
+    Shorten text to at most budget tokens by keeping its most important sentences.
+    
+    Sentences are picked greedily by importance and put back in their original
+    order. If even the most important sentence is over budget it is cut at a
+    word boundary.
+    """
+    if budget <= 0 or count_tokens(text, model) <= budget:
+        return text
+    
+    sentences = split_sentences(text)
+    scores = _score_sentences(sentences)
+    sizes = [count_tokens(sentence, model) + 1 for sentence in sentences]
+    
+    kept, used, seen = [], 0, set()
+    for index in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        # A repeated sentence adds nothing the first copy didn't
+        key = sentences[index].lower()
+        if key in seen:
+            continue
+        if used + sizes[index] <= budget:
+            kept.append(index)
+            used += sizes[index]
+            seen.add(key)
+    
+    if not kept:
+        best = max(range(len(sentences)), key=lambda i: scores[i]) if sentences else None
+        return _truncate_to_budget(sentences[best] if best is not None else text, budget, model)
+    return " ".join(sentences[index] for index in sorted(kept))
+
+
+def budget_text(text: str, model: str = "", budget: Optional[int] = None) -> str:
+    """The text to send for an entry: condensed to the input budget and logged when shortened."""
+    budget = ANALYSIS_INPUT_TOKEN_BUDGET if budget is None else budget
+    if budget <= 0:
+        return text
+    original = count_tokens(text, model)
+    if original <= budget:
+        return text
+    
+    condensed = condense_text(text, budget, model)
+    sent = count_tokens(condensed, model)
+    logging.info(f"Condensed entry from {original} to {sent} tokens (budget {budget})")
+    with _lock:
+        _stats["condensed"] += 1
+        _stats["original_tokens"] += original
+        _stats["sent_tokens"] += sent
+    return condensed
+
+
+def get_budget_stats(model: str = OPENAI_MODEL) -> Dict:
+    """
+    Counters for entries condensed in this process.
+    
+    Returns:
+        dict with keys: budget, encoding (tiktoken encoding counting model's
+        tokens, or "heuristic"), exact (an encoding is in use), condensed,
+        original_tokens, sent_tokens, saved_tokens
+    """
+    with _lock:
+        stats = dict(_stats)
+    encoding = _encoding(model)
+    stats["budget"] = ANALYSIS_INPUT_TOKEN_BUDGET
+    stats["encoding"] = encoding.name if encoding is not None else "heuristic"
+    stats["exact"] = encoding is not None
+    stats["saved_tokens"] = stats["original_tokens"] - stats["sent_tokens"]
+    return stats
@@ -1,6 +1,12 @@
 """Token usage and cost calculation utilities."""
-from typing import Dict, List, Tuple
-from core.db import Entry
+from datetime import datetime
+from typing import Dict, List, Optional
+from core.db import (
+    get_ai_request_totals,
+    get_ai_latency_percentiles,
+    get_ai_cost_by_day,
+    get_unmetered_token_usage,
+)
 
 
 # OpenAI pricing per 1M tokens (as of 2024)
@@ -34,6 +40,9 @@ DEFAULT_PRICING = {
     "output": 1.50 / 1_000_000,
 }
 
+# Cached prompt tokens are billed at this fraction of the input price unless a model sets "cached_input"
+CACHED_INPUT_DISCOUNT = 0.5
+
 
 def get_model_pricing(model_name: str) -> Dict[str, float]:
     """Get pricing for a specific model."""
@@ -72,39 +81,108 @@ def calculate_token_cost(tokens: int, model_name: str) -> float:
     return input_cost + output_cost
 
 
-def get_token_usage_stats(entries: List[Entry]) -> Dict:
-    """Get comprehensive token usage statistics."""
-    total_tokens = 0
+def calculate_request_cost(model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Exact cost of one API call from its prompt, completion and cached token counts."""
+    pricing = get_model_pricing(model_name or "")
+    cached_price = pricing.get("cached_input", pricing["input"] * CACHED_INPUT_DISCOUNT)
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    return (
+        (prompt_tokens - cached_tokens) * pricing["input"]
+        + cached_tokens * cached_price
+        + completion_tokens * pricing["output"]
+    )
+
+
+def get_token_usage_stats(start_date: Optional[datetime] = None) -> Dict:
+    """
+    Get comprehensive, app-wide token usage statistics.
+    
+    Figures come from the ai_request telemetry table (exact prompt/completion
+    tokens and cost of every call; calls are not attributed to users). Entries
+    analyzed before telemetry existed are added from their stored totals with
+    the 70/30 estimate and reported as estimated_tokens.
+    """
     total_cost = 0.0
-    entries_with_tokens = 0
+    prompt_tokens = completion_tokens = cached_tokens = 0
+    requests = failed_requests = analyzed_entries = 0
     model_usage = {}
+    route_usage = {}
+    outcomes = {}
+    
+    def model_row(model_name: str) -> Dict:
+        return model_usage.setdefault(
+            model_name,
+            {"tokens": 0, "count": 0, "cost": 0.0, "prompt_tokens": 0, "completion_tokens": 0},
+        )
+    
+    for row in get_ai_request_totals(start_date):
+        outcomes[row["outcome"]] = outcomes.get(row["outcome"], 0) + row["requests"]
+        if row["outcome"] in ("throttled", "circuit_open"):
+            # Skipped locally - never reached the API
+            continue
+        
+        requests += row["requests"]
+        if row["outcome"] != "ok":
+            failed_requests += row["requests"]
+        elif row["kind"] != "retry":
+            # A retry re-analyzes an entry already counted by its first call
+            analyzed_entries += row["entries"]
+        prompt_tokens += row["prompt_tokens"]
+        completion_tokens += row["completion_tokens"]
+        cached_tokens += row["cached_tokens"]
+        total_cost += row["cost"]
+        
+        usage = model_row(row["model"] or "unknown")
+        usage["tokens"] += row["prompt_tokens"] + row["completion_tokens"]
+        usage["count"] += row["requests"]
+        usage["cost"] += row["cost"]
+        usage["prompt_tokens"] += row["prompt_tokens"]
+        usage["completion_tokens"] += row["completion_tokens"]
+        
+        route = route_usage.setdefault(row["route"] or "fast", {"count": 0, "tokens": 0, "cost": 0.0})
+        route["count"] += row["requests"]
+        route["tokens"] += row["prompt_tokens"] + row["completion_tokens"]
+        route["cost"] += row["cost"]
     
-    for entry in entries:
-        if entry.tokens > 0:
-            total_tokens += entry.tokens
-            entries_with_tokens += 1
-            
-            model_name = entry.model_used or "unknown"
-            cost = calculate_token_cost(entry.tokens, model_name)
+    for route_name, route in route_usage.items():
+        route_latency = get_ai_latency_percentiles((50, 95), start_date, route=route_name)
+        route["latency_p50_ms"] = route_latency[50]
+        route["latency_p95_ms"] = route_latency[95]
+    
+    estimated_tokens = 0
+    if start_date is None:
+        for model_name, tokens, count in get_unmetered_token_usage():
+            cost = calculate_token_cost(tokens, model_name)
+            estimated_tokens += tokens
+            analyzed_entries += count
             total_cost += cost
-            
-            if model_name not in model_usage:
-                model_usage[model_name] = {
-                    "tokens": 0,
-                    "count": 0,
-                    "cost": 0.0,
-                }
-            
-            model_usage[model_name]["tokens"] += entry.tokens
-            model_usage[model_name]["count"] += 1
-            model_usage[model_name]["cost"] += cost
+            usage = model_row(model_name)
+            usage["tokens"] += tokens
+            usage["count"] += count
+            usage["cost"] += cost
+    
+    total_tokens = prompt_tokens + completion_tokens + estimated_tokens
+    latency = get_ai_latency_percentiles((50, 95), start_date)
     
     return {
         "total_tokens": total_tokens,
         "total_cost": total_cost,
-        "entries_with_tokens": entries_with_tokens,
-        "average_tokens_per_entry": total_tokens / entries_with_tokens if entries_with_tokens > 0 else 0,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "estimated_tokens": estimated_tokens,
+        "requests": requests,
+        "failed_requests": failed_requests,
+        "entries_with_tokens": analyzed_entries,
+        "average_tokens_per_entry": total_tokens / analyzed_entries if analyzed_entries > 0 else 0,
+        "latency_p50_ms": latency[50],
+        "latency_p95_ms": latency[95],
+        "outcomes": outcomes,
         "model_usage": model_usage,
+        "route_usage": route_usage,
     }
 
 
+def get_cost_by_day(start_date: Optional[datetime] = None) -> List[Dict]:
+    """Exact API cost, tokens and calls per day (from ai_request)."""
+    return get_ai_cost_by_day(start_date)
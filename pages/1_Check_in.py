@@ -1,13 +1,22 @@
 """Check-in page for mood entry."""
+import time
 import streamlit as st
 from datetime import datetime
-from core.db import init_db, get_or_create_user, add_entry, get_streak, get_entries
-from core.ai import analyze_text
-from core.config import MOOD_EMOJI, MOOD_COLORS
+from core.db import init_db, get_or_create_user, add_entry, get_streak, get_entries, get_entry
+from core.ai import (
+    analyze_text_provisional,
+    analyze_locally,
+    analysis_available,
+    estimate_analysis_cost,
+    PENDING_MODEL,
+    STREAM_SECTIONS,
+)
+from core.analysis_worker import start_worker, wake_worker, get_recent_result, get_partial_result
+from core.db import enqueue_analysis_job
+from core.config import MOOD_EMOJI, MOOD_COLORS, CHECKIN_POLL_SECONDS, CHECKIN_POLL_TIMEOUT_SECONDS
 from core.auth import check_auth
 from core.nlp_utils import scrub_pii
 from core.styles import apply_beach_theme
-import json
 
 # Check authentication
 if not check_auth():
@@ -19,6 +28,9 @@ apply_beach_theme()
 # Initialize database
 init_db()
 
+# Background worker that fills in analysis for entries saved without it
+start_worker()
+
 # Get or create user
 user = get_or_create_user(username="default", role="student")
 
@@ -45,9 +57,8 @@ text = st.text_area(
     key="checkin_text",
 )
 
-# Character counter
-char_count = len(text)
-st.caption(f"{char_count} characters")
+# Character counter, filled in below once the tags are known
+counter = st.empty()
 
 # Tags input
 st.subheader("Tags (optional)")
@@ -60,94 +71,167 @@ tags_input = st.text_input(
 # Parse tags
 tags = [tag.strip() for tag in tags_input.split(",") if tag.strip()] if tags_input else []
 
-# Analyze button
+# Predicted size and cost of the analysis request
+char_count = len(text)
+if text.strip():
+    estimate = estimate_analysis_cost(text, tags)
+    caption = f"{char_count} characters · ~{estimate['input_tokens']:,} tokens · up to ${estimate['cost']:.5f} to analyze"
+    if estimate["sent_tokens"] < estimate["input_tokens"]:
+        caption += f" (long entry: its key sentences, ~{estimate['sent_tokens']:,} tokens, will be analyzed)"
+    counter.caption(caption)
+else:
+    counter.caption(f"{char_count} characters")
+
+def mood_badge(mood_score: int):
+    """Emoji, color and label for a 0-100 mood score."""
+    if mood_score < 40:
+        return MOOD_EMOJI["low"], MOOD_COLORS["low"], "Low"
+    elif mood_score < 60:
+        return MOOD_EMOJI["medium_low"], MOOD_COLORS["medium_low"], "Medium-Low"
+    elif mood_score < 80:
+        return MOOD_EMOJI["medium_high"], MOOD_COLORS["medium_high"], "Medium-High"
+    else:
+        return MOOD_EMOJI["high"], MOOD_COLORS["high"], "High"
+
+
+def render_metrics(area, sentiment: float, model_used: str = "…", tokens=None):
+    """Mood score, sentiment and model metrics."""
+    mood_score = int((sentiment + 1) * 50)
+    mood_emoji, mood_color, mood_label = mood_badge(mood_score)
+    with area.container():
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Mood Score", f"{mood_score}/100", delta=f"{mood_emoji} {mood_label}")
+        with col2:
+            st.metric("Sentiment", f"{sentiment:.2f}", delta="(-1 to +1)")
+        with col3:
+            st.metric("Model", model_used, delta=f"{tokens} tokens" if tokens is not None else "analyzing…")
+
+
+def render_emotions(area, emotions: dict):
+    """Emotion distribution as progress bars."""
+    with area.container():
+        st.markdown("### Emotions")
+        emotion_cols = st.columns(4)
+        for i, (emotion, value) in enumerate(emotions.items()):
+            with emotion_cols[i % 4]:
+                st.progress(value, text=f"{emotion}: {value:.1%}")
+
+
+def render_summary(area, summary: str):
+    """Summary call-out."""
+    with area.container():
+        st.markdown("### Summary")
+        st.info(summary)
+
+
+def render_suggestions(area, suggestions: list, final: bool = False):
+    """Suggestions; checkboxes only once the final result is in (widgets render once per run)."""
+    with area.container():
+        st.markdown("### Gentle Suggestions")
+        for i, suggestion in enumerate(suggestions, 1):
+            if final:
+                st.checkbox(f"💡 {suggestion}", key=f"suggestion_{i}")
+            else:
+                st.markdown(f"💡 {suggestion}")
+
+
+def show_checkin_analysis():
+    """The latest check-in's analysis: the quick estimate, then each AI section as it streams in."""
+    checkin = st.session_state["last_checkin"]
+    entry = get_entry(checkin["entry_id"])
+    if entry is None:
+        del st.session_state["last_checkin"]
+        return
+    
+    waiting = entry.model_used == PENDING_MODEL
+    timed_out = time.time() - checkin["saved_at"] > CHECKIN_POLL_TIMEOUT_SECONDS
+    result = get_recent_result(entry.id)
+    # Sections the worker has parsed from the streamed response replace the estimate's one by one
+    streamed = get_partial_result(entry.id) if waiting else None
+    shown = {
+        "sentiment": entry.sentiment,
+        "emotions": entry.emotions,
+        "summary": entry.summary,
+        "suggestions": result["suggestions"] if result else checkin["suggestions"],
+        **(streamed or {}),
+    }
+    
+    st.divider()
+    st.subheader("Your Mood Analysis")
+    if waiting and not timed_out and checkin["ai_available"]:
+        if streamed:
+            st.caption(f"✨ AI analysis arriving ({len(streamed)} of {len(STREAM_SECTIONS)} sections)…")
+        else:
+            st.caption("⚡ Quick estimate shown - the AI analysis will replace it in a moment…")
+    render_metrics(st.empty(), shown["sentiment"], entry.model_used, None if waiting else entry.tokens)
+    render_summary(st.empty(), shown["summary"])
+    render_emotions(st.empty(), shown["emotions"])
+    render_suggestions(st.empty(), shown["suggestions"], final=not waiting)
+    
+    if waiting and (timed_out or not checkin["ai_available"]):
+        st.info("🔄 Your entry will be analyzed automatically once AI analysis is available.")
+    
+    # Stop polling once there is nothing left to wait for
+    if checkin["polling"] and (not waiting or timed_out or not checkin["ai_available"]):
+        checkin["polling"] = False
+        st.rerun()
+
+
+# Check-in button
 if st.button("🌊 Check in", type="primary", use_container_width=True):
     if not text.strip():
         st.warning("Please enter some text before checking in.")
     else:
-        with st.spinner("Analyzing your mood..."):
-            # Scrub PII if enabled
-            text_to_analyze = scrub_pii(text) if scrub_pii_enabled else text
-            
-            # Analyze text
-            result = analyze_text(text_to_analyze, tags)
-            
-            # Show helpful message if API key is missing
-            if result.get("model_used") == "none" and not result.get("tokens", 0):
-                st.warning(
-                    "💡 **AI analysis unavailable.** Your entry is saved, but to enable AI features, "
-                    "please configure your OpenAI API key in Settings → API Configuration."
-                )
-            
-            # Save entry
-            entry = add_entry(
-                user_id=user.id,
-                text=text_to_analyze,
-                summary=result["summary"],
-                sentiment=result["sentiment"],
-                mood_score=result["mood_score"],
-                emotions=result["emotions"],
-                tags=",".join(tags) if tags else "",
-                source="manual",
-                model_used=result["model_used"],
-                tokens=result["tokens"],
+        # Scrub PII if enabled
+        text_to_analyze = scrub_pii(text) if scrub_pii_enabled else text
+        
+        # The lexicon provider or a confident distilled model gives the final analysis right away;
+        # otherwise save the offline estimate now and let the worker replace it with the AI analysis
+        local = analyze_locally(text_to_analyze)
+        quick = local or analyze_text_provisional(text_to_analyze)
+        entry = add_entry(
+            user_id=user.id,
+            text=text_to_analyze,
+            summary=quick["summary"],
+            sentiment=quick["sentiment"],
+            mood_score=quick["mood_score"],
+            emotions=quick["emotions"],
+            tags=",".join(tags) if tags else "",
+            source="manual",
+            model_used=local["model_used"] if local else PENDING_MODEL,
+            tokens=0,
+        )
+        if local is None:
+            enqueue_analysis_job(entry.id, priority="interactive")
+            wake_worker()
+        
+        ai_available = local is not None or analysis_available()
+        st.session_state["last_checkin"] = {
+            "entry_id": entry.id,
+            "saved_at": time.time(),
+            "suggestions": quick["suggestions"],
+            "ai_available": ai_available,
+            "polling": local is None and ai_available,
+        }
+        
+        # Show helpful message if API key is missing
+        if not ai_available:
+            st.warning(
+                "💡 **AI analysis unavailable.** Your entry is saved, but to enable AI features, "
+                "please configure your OpenAI API key in Settings → API Configuration."
             )
-            
-            # Show success message
-            st.success("Saved 🌊")
-            st.balloons()
-            
-            # Display results
-            st.divider()
-            st.subheader("Your Mood Analysis")
-            
-            # Mood score badge
-            mood_score = result["mood_score"]
-            if mood_score < 40:
-                mood_emoji = MOOD_EMOJI["low"]
-                mood_color = MOOD_COLORS["low"]
-                mood_label = "Low"
-            elif mood_score < 60:
-                mood_emoji = MOOD_EMOJI["medium_low"]
-                mood_color = MOOD_COLORS["medium_low"]
-                mood_label = "Medium-Low"
-            elif mood_score < 80:
-                mood_emoji = MOOD_EMOJI["medium_high"]
-                mood_color = MOOD_COLORS["medium_high"]
-                mood_label = "Medium-High"
-            else:
-                mood_emoji = MOOD_EMOJI["high"]
-                mood_color = MOOD_COLORS["high"]
-                mood_label = "High"
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Mood Score", f"{mood_score}/100", delta=f"{mood_emoji} {mood_label}")
-            with col2:
-                st.metric("Sentiment", f"{result['sentiment']:.2f}", delta="(-1 to +1)")
-            with col3:
-                st.metric("Model", result["model_used"], delta=f"{result['tokens']} tokens")
-            
-            # Summary
-            st.markdown("### Summary")
-            st.info(result["summary"])
-            
-            # Emotions
-            st.markdown("### Emotions")
-            emotions = result["emotions"]
-            emotion_cols = st.columns(4)
-            for i, (emotion, value) in enumerate(emotions.items()):
-                with emotion_cols[i % 4]:
-                    st.progress(value, text=f"{emotion}: {value:.1%}")
-            
-            # Suggestions
-            st.markdown("### Gentle Suggestions")
-            suggestions = result["suggestions"]
-            for i, suggestion in enumerate(suggestions, 1):
-                st.checkbox(f"💡 {suggestion}", key=f"suggestion_{i}")
-            
-            # Use form to clear text after submission - don't modify session state directly
-            # The text will persist until next interaction which is fine for UX
+        
+        # Show success message
+        st.success("Saved 🌊")
+        st.balloons()
+        
+        # Use form to clear text after submission - don't modify session state directly
+        # The text will persist until next interaction which is fine for UX
+
+if "last_checkin" in st.session_state:
+    polling = st.session_state["last_checkin"]["polling"]
+    st.fragment(show_checkin_analysis, run_every=CHECKIN_POLL_SECONDS if polling else None)()
 
 # Display recent entries
 st.divider()
@@ -1,11 +1,10 @@
 """Journal page for viewing and searching entries."""
 import streamlit as st
 from datetime import datetime, timedelta
-from core.db import init_db, get_or_create_user, get_entries, search_entries, get_all_tags
+from core.db import init_db, get_or_create_user, get_entries, search_entries_ranked, count_search_entries, get_all_tags
 from core.config import MOOD_EMOJI, MOOD_COLORS
 from core.auth import check_auth
 from core.styles import apply_beach_theme
-import json
 
 # Check authentication
 if not check_auth():
@@ -49,16 +48,48 @@ with col3:
         help="Search for text in entries",
     )
 
-# Sentiment filter
+# Sentiment filter: inclusive (min, max) bounds per option
+SENTIMENT_RANGES = {
+    "All": (None, None),
+    "Positive (0.0 to 1.0)": (0.0, 1.0),
+    "Neutral (-0.3 to 0.3)": (-0.3, 0.3),
+    "Negative (-1.0 to -0.3)": (-1.0, -0.3),
+}
 sentiment_filter = st.selectbox(
     "Filter by Sentiment",
-    options=["All", "Positive (0.0 to 1.0)", "Neutral (-0.3 to 0.3)", "Negative (-1.0 to -0.3)"],
+    options=list(SENTIMENT_RANGES),
     index=0,
 )
+min_sentiment, max_sentiment = SENTIMENT_RANGES[sentiment_filter]
+
+# Search results per page
+SEARCH_PAGE_SIZE = 50
 
 # Get entries
+snippets = {}
 if search_query:
-    entries = search_entries(user.id, search_query)
+    # The sentiment bounds are part of the search query, so the total and every page agree with the filter
+    total = count_search_entries(user.id, search_query, min_sentiment, max_sentiment)
+    page_count = max(1, -(-total // SEARCH_PAGE_SIZE))
+    search_page = st.number_input(
+        "Results page",
+        min_value=1,
+        max_value=page_count,
+        value=1,
+        step=1,
+        key=f"search_page_{search_query}_{sentiment_filter}",
+    )
+    hits = search_entries_ranked(
+        user.id,
+        search_query,
+        limit=SEARCH_PAGE_SIZE,
+        offset=(search_page - 1) * SEARCH_PAGE_SIZE,
+        min_sentiment=min_sentiment,
+        max_sentiment=max_sentiment,
+    )
+    entries = [hit["entry"] for hit in hits]
+    snippets = {hit["entry"].id: hit["snippet"] for hit in hits}
+    heading = f"Found {total} entries (page {search_page} of {page_count})"
 else:
     if isinstance(date_range, tuple) and len(date_range) == 2:
         start_date = date_range[0]
@@ -76,23 +107,20 @@ else:
         end_date=datetime.combine(end_date, datetime.max.time()),
         tags=selected_tags if selected_tags else None,
     )
-
-# Apply sentiment filter
-if sentiment_filter != "All":
-    if sentiment_filter == "Positive (0.0 to 1.0)":
-        entries = [e for e in entries if 0.0 <= e.sentiment <= 1.0]
-    elif sentiment_filter == "Neutral (-0.3 to 0.3)":
-        entries = [e for e in entries if -0.3 <= e.sentiment <= 0.3]
-    elif sentiment_filter == "Negative (-1.0 to -0.3)":
-        entries = [e for e in entries if -1.0 <= e.sentiment <= -0.3]
+    
+    # Apply sentiment filter
+    if sentiment_filter != "All":
+        entries = [e for e in entries if min_sentiment <= e.sentiment <= max_sentiment]
+    heading = f"Found {len(entries)} entries"
 
 # Display entries
 st.divider()
-st.subheader(f"Found {len(entries)} entries")
+st.subheader(heading)
 
 if entries:
-    # Sort by date (newest first)
-    entries = sorted(entries, key=lambda x: x.created_at, reverse=True)
+    # Sort by date (newest first); search results keep their relevance order
+    if not search_query:
+        entries = sorted(entries, key=lambda x: x.created_at, reverse=True)
     
     for entry in entries:
         date = datetime.fromtimestamp(entry.created_at).strftime("%Y-%m-%d %H:%M")
@@ -112,10 +140,9 @@ if entries:
             emoji = MOOD_EMOJI["high"]
             color = MOOD_COLORS["high"]
         
-        # Parse emotions
-        try:
-            emotions = json.loads(entry.emotions_json)
-        except Exception:
+        # Emotions (typed columns, empty if never analyzed)
+        emotions = entry.emotions
+        if not any(emotions.values()):
             emotions = {}
         
         # Parse tags
@@ -126,6 +153,8 @@ if entries:
             col1, col2 = st.columns([2, 1])
             
             with col1:
+                if entry.id in snippets:
+                    st.markdown(f"**Match:** {snippets[entry.id]}")
                 st.markdown(f"**Text:**\n{entry.text}")
                 if entry.summary:
                     st.markdown(f"**Summary:**\n{entry.summary}")
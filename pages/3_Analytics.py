@@ -1,21 +1,27 @@
 """Analytics page with comprehensive mood insights."""
 import streamlit as st
 from datetime import datetime, timedelta
-from core.db import init_db, get_or_create_user, get_entries, get_all_tags
+from core.db import init_db, get_or_create_user, get_daily_rollups, get_tag_counts
+from core.entry_frame import get_entry_frame
+from core.figure_cache import user_scope, get_figure, get_json, get_value
 from core.charts import (
-    mood_time_series,
-    emotion_radar,
-    tag_frequency,
+    mood_time_series_from_rollups,
+    emotion_radar_from_rollups,
+    average_emotions_from_rollups,
+    tag_frequency_from_counts,
     hour_of_day_heatmap,
-    calendar_heatmap,
+    calendar_heatmap_from_rollups,
     sentiment_distribution,
 )
-from core.nlp_utils import get_top_ngrams, get_wordcloud, get_positive_negative_words
-from core.config import MOOD_EMOJI, MOOD_COLORS
+from core.nlp_utils import (
+    tokenize,
+    get_top_ngrams_from_tokens,
+    get_wordcloud_from_tokens,
+    get_positive_negative_words_from_tokens,
+)
 from core.auth import check_auth
 from core.styles import apply_beach_theme
-import pandas as pd
-import json
+from functools import lru_cache
 from PIL import Image
 import io
 
@@ -51,14 +57,43 @@ with col2:
         help="Select end date for analytics",
     )
 
-# Get entries
-entries = get_entries(
+# Charts and text results are cached per user, date range and data version, so reruns from
+# unrelated widgets (e.g. the calendar year) reuse them instead of rebuilding everything
+scope = user_scope(user.id, start_date, end_date)
+
+
+@lru_cache(maxsize=None)
+def load_frame():
+    """Entries as columns (one query, no per-entry objects), loaded only if a cached result is missing."""
+    return get_entry_frame(
+        user_id=user.id,
+        start_date=datetime.combine(start_date, datetime.min.time()),
+        end_date=datetime.combine(end_date, datetime.max.time()),
+        with_text=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def load_token_lists():
+    """Every entry tokenized once for the word cloud, phrases and word lists."""
+    return [tokenize(text, remove_stopwords=True) for text in load_frame().texts]
+
+
+# Daily aggregates (one row per day) for metrics, insights and daily charts
+rollups = get_daily_rollups(
     user_id=user.id,
     start_date=datetime.combine(start_date, datetime.min.time()),
     end_date=datetime.combine(end_date, datetime.max.time()),
 )
 
-if not entries:
+# Tag counts for the range, most frequent first
+tag_counts = get_tag_counts(
+    user_id=user.id,
+    start_date=datetime.combine(start_date, datetime.min.time()),
+    end_date=datetime.combine(end_date, datetime.max.time()),
+)
+
+if not rollups:
     st.info("No entries found for this date range. Check in to create your first entry! 🌊")
     st.stop()
 
@@ -68,10 +103,10 @@ st.subheader("Summary Metrics")
 
 col1, col2, col3, col4 = st.columns(4)
 
-avg_mood = sum(e.mood_score for e in entries) / len(entries)
-avg_sentiment = sum(e.sentiment for e in entries) / len(entries)
-total_entries = len(entries)
-days_with_entries = len(set(datetime.fromtimestamp(e.created_at).date() for e in entries))
+total_entries = sum(r.count for r in rollups)
+avg_mood = sum(r.mood_sum for r in rollups) / total_entries if total_entries else 0.0
+avg_sentiment = sum(r.sentiment_sum for r in rollups) / total_entries if total_entries else 0.0
+days_with_entries = len(rollups)
 
 with col1:
     st.metric("Average Mood", f"{avg_mood:.1f}/100")
@@ -90,14 +125,7 @@ insights_col1, insights_col2 = st.columns(2)
 
 with insights_col1:
     # Most positive day
-    mood_by_date = {}
-    for entry in entries:
-        date = datetime.fromtimestamp(entry.created_at).date()
-        if date not in mood_by_date:
-            mood_by_date[date] = []
-        mood_by_date[date].append(entry.mood_score)
-    
-    avg_mood_by_date = {date: sum(scores) / len(scores) for date, scores in mood_by_date.items()}
+    avg_mood_by_date = {r.day: r.avg_mood for r in rollups}
     if avg_mood_by_date:
         best_date = max(avg_mood_by_date.items(), key=lambda x: x[1])
         worst_date = min(avg_mood_by_date.items(), key=lambda x: x[1])
@@ -107,24 +135,14 @@ with insights_col1:
 
 with insights_col2:
     # Top tags
-    all_tags = get_all_tags(user.id)
-    if all_tags:
-        tag_counts = {}
-        for entry in entries:
-            if entry.tags:
-                for tag in entry.tags.split(","):
-                    tag = tag.strip()
-                    if tag:
-                        tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        if tag_counts:
-            top_tag = max(tag_counts.items(), key=lambda x: x[1])
-            st.info(f"**Top Tag:** {top_tag[0]} ({top_tag[1]} entries)")
+    if tag_counts:
+        top_tag = tag_counts[0]
+        st.info(f"**Top Tag:** {top_tag[0]} ({top_tag[1]} entries)")
 
 # Time series chart
 st.divider()
 st.subheader("Mood Over Time")
-fig_time = mood_time_series(entries, days=30)
+fig_time = get_figure("mood_time_series", scope, lambda: mood_time_series_from_rollups(rollups))
 st.plotly_chart(fig_time, use_container_width=True)
 
 # Emotion radar
@@ -133,23 +151,14 @@ st.subheader("Emotion Distribution")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    fig_radar = emotion_radar(entries)
+    fig_radar = get_figure("emotion_radar", scope, lambda: emotion_radar_from_rollups(rollups))
     st.plotly_chart(fig_radar, use_container_width=True)
 
 with col2:
     # Average emotions
-    emotion_sums = {}
-    for entry in entries:
-        try:
-            emotions = json.loads(entry.emotions_json)
-            for emotion, value in emotions.items():
-                emotion_sums[emotion] = emotion_sums.get(emotion, 0.0) + value
-        except Exception:
-            continue
+    avg_emotions = average_emotions_from_rollups(rollups)
     
-    if emotion_sums:
-        count = len(entries)
-        avg_emotions = {emotion: emotion_sums.get(emotion, 0.0) / count for emotion in emotion_sums.keys()}
+    if any(avg_emotions.values()):
         sorted_emotions = sorted(avg_emotions.items(), key=lambda x: x[1], reverse=True)
         
         st.markdown("**Top Emotions:**")
@@ -159,35 +168,50 @@ with col2:
 # Tag frequency
 st.divider()
 st.subheader("Tag Frequency")
-fig_tags = tag_frequency(entries, top_n=10)
+fig_tags = get_figure(
+    "tag_frequency", scope, lambda: tag_frequency_from_counts(tag_counts, top_n=10), top_n=10
+)
 st.plotly_chart(fig_tags, use_container_width=True)
 
 # Hour of day heatmap
 st.divider()
 st.subheader("Mood by Hour and Day")
-fig_heatmap = hour_of_day_heatmap(entries)
+fig_heatmap = get_figure("hour_of_day_heatmap", scope, lambda: hour_of_day_heatmap(load_frame()))
 st.plotly_chart(fig_heatmap, use_container_width=True)
 
 # Calendar heatmap
 st.divider()
 st.subheader("Calendar Heatmap")
 year = st.selectbox("Select Year", options=[datetime.now().year, datetime.now().year - 1])
-fig_calendar = calendar_heatmap(entries, year=year)
+fig_calendar = get_figure(
+    "calendar_heatmap", scope, lambda: calendar_heatmap_from_rollups(rollups, year=year), year=year
+)
 st.plotly_chart(fig_calendar, use_container_width=True)
 
 # Sentiment distribution
 st.divider()
 st.subheader("Sentiment Distribution")
-fig_sentiment = sentiment_distribution(entries)
+fig_sentiment = get_figure("sentiment_distribution", scope, lambda: sentiment_distribution(load_frame()))
 st.plotly_chart(fig_sentiment, use_container_width=True)
 
 # Word cloud
 st.divider()
 st.subheader("Word Cloud")
-all_text = " ".join([e.text for e in entries])
+all_text = get_json("has_text", scope, lambda: bool(" ".join(load_frame().texts).strip()))
 if all_text:
     try:
-        wordcloud_img = get_wordcloud(all_text, width=800, height=400)
+        # Cached as PNG bytes (empty when no cloud could be drawn)
+        wordcloud_img = get_value(
+            "wordcloud",
+            scope,
+            lambda: get_wordcloud_from_tokens(
+                [token for tokens in load_token_lists() for token in tokens], width=800, height=400
+            ),
+            dumps=lambda img: img.getvalue() if img else b"",
+            loads=lambda data: io.BytesIO(data) if data else None,
+            width=800,
+            height=400,
+        )
         if wordcloud_img:
             img = Image.open(wordcloud_img)
             st.image(img, use_container_width=True)
@@ -201,8 +225,8 @@ st.divider()
 st.subheader("Common Phrases")
 if all_text:
     try:
-        bigrams = get_top_ngrams([e.text for e in entries], n=2, top_k=10)
-        trigrams = get_top_ngrams([e.text for e in entries], n=3, top_k=10)
+        bigrams = get_json("bigrams", scope, lambda: get_top_ngrams_from_tokens(load_token_lists(), n=2, top_k=10))
+        trigrams = get_json("trigrams", scope, lambda: get_top_ngrams_from_tokens(load_token_lists(), n=3, top_k=10))
         
         col1, col2 = st.columns(2)
         
@@ -223,7 +247,12 @@ st.divider()
 st.subheader("Positive and Negative Words")
 if all_text:
     try:
-        positive, negative = get_positive_negative_words([e.text for e in entries], top_k=10)
+        positive, negative = get_json(
+            "positive_negative_words",
+            scope,
+            lambda: get_positive_negative_words_from_tokens(load_token_lists(), top_k=10),
+            top_k=10,
+        )
         
         col1, col2 = st.columns(2)
         
@@ -2,14 +2,15 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from core.db import init_db, get_or_create_user, get_cohort_entries, Cohort, CohortMember
+from core.db import init_db, get_or_create_user, Cohort
 from core.charts import mood_time_series, emotion_radar, tag_frequency
-from core.config import MOOD_COLORS
+from core.entry_frame import get_cohort_entry_frame
+from core.figure_cache import cohort_scope, get_figure, get_json
 from core.auth import check_auth
 from core.styles import apply_beach_theme
 from sqlmodel import Session, select, create_engine
 from core.config import DB_URL
-import json
+from functools import lru_cache
 
 # Check authentication
 if not check_auth():
@@ -73,37 +74,41 @@ with col2:
         help="Select end date for comparison",
     )
 
-# Get entries for each cohort
+
+@lru_cache(maxsize=None)
+def load_frame(cohort_id: int):
+    """A cohort's entries in the date range as columns, loaded only if a cached result is missing."""
+    return get_cohort_entry_frame(
+        cohort_id,
+        start_date=datetime.combine(start_date, datetime.min.time()),
+        end_date=datetime.combine(end_date, datetime.max.time()),
+    )
+
+
+# Summary and charts are cached per cohort, date range and data version
 cohort_data = {}
 with Session(engine) as session:
     for cohort_name in selected_cohorts:
         cohort = session.exec(select(Cohort).where(Cohort.name == cohort_name)).first()
         if cohort:
-            entries = get_cohort_entries(cohort.id)
-            # Filter by date range
-            start_ts = int(datetime.combine(start_date, datetime.min.time()).timestamp())
-            end_ts = int(datetime.combine(end_date, datetime.max.time()).timestamp())
-            entries = [e for e in entries if start_ts <= e.created_at <= end_ts]
-            cohort_data[cohort_name] = entries
+            cohort_data[cohort_name] = (cohort.id, cohort_scope(cohort.id, start_date, end_date))
 
 # Summary metrics
 st.divider()
 st.subheader("Summary Metrics")
 
 summary_data = []
-for cohort_name, entries in cohort_data.items():
-    if entries:
-        avg_mood = sum(e.mood_score for e in entries) / len(entries)
-        avg_sentiment = sum(e.sentiment for e in entries) / len(entries)
-        total_entries = len(entries)
-        unique_users = len(set(e.user_id for e in entries))
-        
+cohort_summaries = {}
+for cohort_name, (cohort_id, scope) in cohort_data.items():
+    summary = get_json("summary", scope, lambda: load_frame(cohort_id).summary())
+    cohort_summaries[cohort_name] = summary
+    if summary["total_entries"]:
         summary_data.append({
             "Cohort": cohort_name,
-            "Average Mood": f"{avg_mood:.1f}",
-            "Average Sentiment": f"{avg_sentiment:.2f}",
-            "Total Entries": total_entries,
-            "Unique Users": unique_users,
+            "Average Mood": f"{summary['avg_mood']:.1f}",
+            "Average Sentiment": f"{summary['avg_sentiment']:.2f}",
+            "Total Entries": summary["total_entries"],
+            "Unique Users": summary["unique_users"],
         })
 
 if summary_data:
@@ -114,30 +119,30 @@ if summary_data:
 st.divider()
 st.subheader("Mood Over Time Comparison")
 
-for cohort_name, entries in cohort_data.items():
-    if entries:
+for cohort_name, (cohort_id, scope) in cohort_data.items():
+    if cohort_summaries[cohort_name]["total_entries"]:
         st.markdown(f"### {cohort_name}")
-        fig = mood_time_series(entries, days=30)
+        fig = get_figure("mood_time_series", scope, lambda: mood_time_series(load_frame(cohort_id), days=30), days=30)
         st.plotly_chart(fig, use_container_width=True)
 
 # Emotion comparison
 st.divider()
 st.subheader("Emotion Distribution Comparison")
 
-for cohort_name, entries in cohort_data.items():
-    if entries:
+for cohort_name, (cohort_id, scope) in cohort_data.items():
+    if cohort_summaries[cohort_name]["total_entries"]:
         st.markdown(f"### {cohort_name}")
-        fig = emotion_radar(entries)
+        fig = get_figure("emotion_radar", scope, lambda: emotion_radar(load_frame(cohort_id)))
         st.plotly_chart(fig, use_container_width=True)
 
 # Tag comparison
 st.divider()
 st.subheader("Tag Frequency Comparison")
 
-for cohort_name, entries in cohort_data.items():
-    if entries:
+for cohort_name, (cohort_id, scope) in cohort_data.items():
+    if cohort_summaries[cohort_name]["total_entries"]:
         st.markdown(f"### {cohort_name}")
-        fig = tag_frequency(entries, top_n=10)
+        fig = get_figure("tag_frequency", scope, lambda: tag_frequency(load_frame(cohort_id), top_n=10), top_n=10)
         st.plotly_chart(fig, use_container_width=True)
 
 # Notes
@@ -1,12 +1,19 @@
 """Settings page for configuration and export/import."""
 import streamlit as st
-from datetime import datetime
-from core.db import init_db, get_or_create_user, get_entries
-from core.export_import import export_to_csv, export_to_json, import_from_csv, import_from_json
+import pandas as pd
+from datetime import datetime, timedelta
+from core.db import init_db, get_or_create_user, count_entries, get_model_used_counts
+from core.export_import import iter_csv_export, iter_json_export, spool_export, import_from_csv, import_from_json
 from core.auth import check_auth, logout
-from core.config import OPENAI_API_KEY, OPENAI_MODEL, APP_AUTH_PIN
+from core.config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_STRONG_MODEL, APP_AUTH_PIN, get_config
 from core.styles import apply_beach_theme
-import os
+from core.token_usage import get_token_usage_stats, get_cost_by_day
+from core.token_budget import get_budget_stats
+from core.analysis_cache import get_cache_stats, clear as clear_analysis_cache
+from core.figure_cache import get_figure_cache_stats, clear as clear_figure_cache
+from core.distill import NON_API_MODELS, get_distill_status, train as train_distilled_model
+from core.rate_limit import get_rate_limit_status
+from core.analysis_worker import start_worker, get_worker_status, queue_unanalyzed_entries
 
 # Check authentication
 if not check_auth():
@@ -55,36 +62,33 @@ st.subheader("Export Data")
 st.markdown("Export your entries as CSV or JSON.")
 
 col1, col2 = st.columns(2)
+has_entries = count_entries(user.id) > 0
 
+# The export is only built when a download button is clicked: entries are streamed from the
+# database in chunks and spooled to a temp file, which Streamlit then reads to serve the download
 with col1:
-    if st.button("Export as CSV", use_container_width=True):
-        entries = get_entries(user_id=user.id)
-        if entries:
-            csv_data = export_to_csv(entries)
-            st.download_button(
-                label="Download CSV",
-                data=csv_data,
-                file_name=f"moodmeter_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True,
-            )
-        else:
-            st.info("No entries to export.")
+    if has_entries:
+        st.download_button(
+            label="Export as CSV",
+            data=lambda: spool_export(iter_csv_export(user.id)),
+            file_name=f"moodmeter_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True,
+        )
+    else:
+        st.info("No entries to export.")
 
 with col2:
-    if st.button("Export as JSON", use_container_width=True):
-        entries = get_entries(user_id=user.id)
-        if entries:
-            json_data = export_to_json(entries)
-            st.download_button(
-                label="Download JSON",
-                data=json_data,
-                file_name=f"moodmeter_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json",
-                use_container_width=True,
-            )
-        else:
-            st.info("No entries to export.")
+    if has_entries:
+        st.download_button(
+            label="Export as JSON",
+            data=lambda: spool_export(iter_json_export(user.id)),
+            file_name=f"moodmeter_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            use_container_width=True,
+        )
+    else:
+        st.info("No entries to export.")
 
 # Import data
 st.divider()
@@ -116,7 +120,10 @@ if uploaded_file:
                 st.success(f"Successfully imported {result['imported']} entries.")
             if result["errors"] > 0:
                 st.warning(f"Failed to import {result['errors']} entries.")
-            st.rerun()
+                for index, message in result.get("error_rows", [])[:10]:
+                    st.caption(f"Row {index + 1}: {message}")
+            else:
+                st.rerun()
 
 # API configuration
 st.divider()
@@ -124,8 +131,6 @@ st.subheader("API Configuration")
 st.markdown("Configure OpenAI API settings.")
 
 # Check API key status - check multiple sources
-from core.config import get_config
-
 # Method 1: Check Streamlit secrets directly
 streamlit_secret_key = None
 try:
@@ -162,6 +167,8 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.info(f"**Current Model:** {OPENAI_MODEL}")
+    if OPENAI_STRONG_MODEL:
+        st.caption(f"Long or low-confidence entries are routed to {OPENAI_STRONG_MODEL}")
     if api_key_set:
         st.success(f"**API Key Status:** ✅ Configured")
         # Show first and last 4 chars for verification (safely)
@@ -213,94 +220,355 @@ with col2:
 # Token Usage & Cost Tracking
 st.divider()
 st.subheader("📊 API Token Usage & Cost")
-st.markdown("Track your OpenAI API usage and costs.")
+st.markdown("Track OpenAI API usage and costs across the whole app (calls are not attributed to users).")
 
-# Load entries for token stats
-entries_for_stats = get_entries(user_id=user.id)
+stats = get_token_usage_stats()
 
-if entries_for_stats:
-    from core.token_usage import get_token_usage_stats
+if stats["total_tokens"] > 0 or stats["requests"] > 0:
+    # Main stats
+    col1, col2, col3 = st.columns(3)
     
-    stats = get_token_usage_stats(entries_for_stats)
+    with col1:
+        st.metric(
+            "Total Tokens Used",
+            f"{stats['total_tokens']:,}",
+            help=f"{stats['prompt_tokens']:,} prompt ({stats['cached_tokens']:,} cached) + {stats['completion_tokens']:,} completion tokens",
+        )
     
-    if stats["total_tokens"] > 0:
-        # Main stats
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric(
-                "Total Tokens Used",
-                f"{stats['total_tokens']:,}",
-                help="Total number of API tokens consumed across all entries",
-            )
-        
-        with col2:
-            st.metric(
-                "Total Cost (USD)",
-                f"${stats['total_cost']:.4f}",
-                help="Estimated total cost based on model pricing",
-            )
-        
-        with col3:
-            st.metric(
-                "Avg Tokens/Entry",
-                f"{stats['average_tokens_per_entry']:.0f}",
-                help="Average number of tokens per entry",
-            )
-        
-        # Detailed breakdown by model
-        st.markdown("#### Breakdown by Model")
-        
-        if stats["model_usage"]:
-            model_df_data = []
-            for model, data in stats["model_usage"].items():
-                model_df_data.append({
-                    "Model": model,
-                    "Tokens": f"{data['tokens']:,}",
-                    "Entries": data["count"],
-                    "Cost (USD)": f"${data['cost']:.4f}",
-                })
-            
-            import pandas as pd
-            model_df = pd.DataFrame(model_df_data)
-            st.dataframe(model_df, use_container_width=True, hide_index=True)
+    with col2:
+        st.metric(
+            "Total Cost (USD)",
+            f"${stats['total_cost']:.4f}",
+            help="Computed per request from exact prompt/completion tokens and model pricing",
+        )
+    
+    with col3:
+        st.metric(
+            "Avg Tokens/Entry",
+            f"{stats['average_tokens_per_entry']:.0f}",
+            help="Average number of tokens per analyzed entry",
+        )
+    
+    # Latency and reliability
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        p50 = stats["latency_p50_ms"]
+        st.metric("Latency p50", f"{p50:,.0f} ms" if p50 is not None else "N/A", help="Wall time per call, including retries")
+    with col2:
+        p95 = stats["latency_p95_ms"]
+        st.metric("Latency p95", f"{p95:,.0f} ms" if p95 is not None else "N/A")
+    with col3:
+        st.metric(
+            "API Calls",
+            f"{stats['requests']:,}",
+            delta=f"{stats['failed_requests']:,} failed" if stats["failed_requests"] else None,
+            delta_color="inverse",
+        )
+    
+    # Detailed breakdown by model
+    st.markdown("#### Breakdown by Model")
+    
+    if stats["model_usage"]:
+        model_df_data = []
+        for model, data in stats["model_usage"].items():
+            model_df_data.append({
+                "Model": model,
+                "Prompt Tokens": f"{data['prompt_tokens']:,}",
+                "Completion Tokens": f"{data['completion_tokens']:,}",
+                "Calls": data["count"],
+                "Cost (USD)": f"${data['cost']:.4f}",
+            })
         
-        # Cost estimate info
+        model_df = pd.DataFrame(model_df_data)
+        st.dataframe(model_df, use_container_width=True, hide_index=True)
+    
+    # Model routing: fast (cheap model), strong (long entries), escalated (low-confidence retries)
+    if stats["route_usage"] and (len(stats["route_usage"]) > 1 or OPENAI_STRONG_MODEL):
+        st.markdown("#### Breakdown by Route")
+        route_df = pd.DataFrame([
+            {
+                "Route": route,
+                "Calls": data["count"],
+                "Tokens": f"{data['tokens']:,}",
+                "Cost (USD)": f"${data['cost']:.4f}",
+                "p50 Latency": f"{data['latency_p50_ms']:,.0f} ms" if data["latency_p50_ms"] is not None else "N/A",
+                "p95 Latency": f"{data['latency_p95_ms']:,.0f} ms" if data["latency_p95_ms"] is not None else "N/A",
+            }
+            for route, data in stats["route_usage"].items()
+        ])
+        st.dataframe(route_df, use_container_width=True, hide_index=True)
+    
+    # Cost per day
+    cost_by_day = get_cost_by_day(datetime.now() - timedelta(days=30))
+    if cost_by_day:
+        st.markdown("#### Cost per Day (last 30 days)")
+        cost_df = pd.DataFrame(cost_by_day).set_index("day")
+        st.bar_chart(cost_df["cost"], y_label="USD")
+    
+    # Cost estimate info
+    if stats["estimated_tokens"]:
         st.info(
             "💰 **Cost Calculation:** "
-            "Costs are estimated based on OpenAI's pricing (as of 2024). "
-            "Input tokens (~70%) and output tokens (~30%) are estimated from total tokens. "
-            "Actual costs may vary. Prices shown are in USD."
+            "Costs are computed from the exact prompt and completion tokens of every API call. "
+            f"{stats['estimated_tokens']:,} tokens from entries analyzed before per-call tracking are "
+            "estimated as ~70% input / ~30% output. Prices shown are in USD."
         )
-        
-        # Fun stats
-        st.markdown("#### Usage Statistics")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            entries_with_api = stats["entries_with_tokens"]
-            total_entries = len(entries_for_stats)
-            api_percentage = (entries_with_api / total_entries * 100) if total_entries > 0 else 0
-            st.metric(
-                "Entries with API Analysis",
-                f"{entries_with_api} / {total_entries} ({api_percentage:.1f}%)",
-            )
-        
-        with col2:
-            if stats["total_tokens"] > 0:
-                # Estimate how many more entries they can make with typical usage
-                avg_tokens = stats["average_tokens_per_entry"]
-                if avg_tokens > 0:
-                    # Rough estimate: $10 budget = how many entries?
-                    budget_10_usd = (10.0 / stats["total_cost"]) * entries_with_api if stats["total_cost"] > 0 else 0
-                    st.metric(
-                        "Estimated Entries per $10",
-                        f"~{budget_10_usd:.0f}" if budget_10_usd > 0 else "N/A",
-                    )
     else:
-        st.info("📊 No API tokens used yet. Token usage will appear here after you check in with AI analysis enabled.")
+        st.info(
+            "💰 **Cost Calculation:** "
+            "Costs are computed from the exact prompt and completion tokens of every API call "
+            "using OpenAI's pricing (as of 2024). Prices shown are in USD."
+        )
+    
+    # Input budget for long entries
+    budget = get_budget_stats()
+    if budget["budget"] > 0:
+        st.caption(
+            f"✂️ Entries over {budget['budget']:,} tokens are condensed to their key sentences "
+            f"({'exact ' + budget['encoding'] if budget['exact'] else 'estimated'} token counts). This session: "
+            f"{budget['condensed']:,} condensed, {budget['saved_tokens']:,} input tokens saved."
+        )
+    
+    # Fun stats
+    st.markdown("#### Usage Statistics")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        entries_with_api = stats["entries_with_tokens"]
+        usage_model_counts = get_model_used_counts()
+        total_entries = sum(usage_model_counts.values())
+        api_analyzed = sum(
+            count for model, count in usage_model_counts.items()
+            if model and model not in NON_API_MODELS and not model.startswith("distilled")
+        )
+        api_percentage = api_analyzed / total_entries * 100 if total_entries > 0 else 0
+        st.metric(
+            "Entries with API Analysis",
+            f"{api_analyzed} / {total_entries} ({api_percentage:.1f}%)",
+            help="Entries in the app whose current analysis came from the API",
+        )
+    
+    with col2:
+        if stats["total_cost"] > 0 and entries_with_api > 0:
+            # Rough estimate: $10 budget = how many entries?
+            budget_10_usd = (10.0 / stats["total_cost"]) * entries_with_api
+            st.metric("Estimated Entries per $10", f"~{budget_10_usd:.0f}")
+else:
+    st.info("📊 No API tokens used yet. Token usage will appear here after you check in with AI analysis enabled.")
+
+# Analysis cache
+st.divider()
+st.subheader("🗃️ Analysis Cache")
+st.markdown(
+    "Identical check-ins reuse a stored (or in-flight) analysis instead of a new API call, "
+    "and, with sentence scoring on (ANALYSIS_SENTENCE_MEMO), sentences seen before "
+    "(a repeated opener, an edited entry) reuse their stored score."
+)
+
+cache_stats = get_cache_stats()
+col1, col2, col3, col4, col5 = st.columns(5)
+with col1:
+    st.metric("Cache Hits", f"{cache_stats['hits']:,}", help="Hits since the app process started")
+with col2:
+    st.metric("Cache Misses", f"{cache_stats['misses']:,}", help="Misses since the app process started")
+with col3:
+    st.metric("Hit Rate", f"{cache_stats['hit_rate']:.1%}")
+with col4:
+    st.metric("Cached Results", f"{cache_stats['entries']:,}")
+with col5:
+    st.metric(
+        "Coalesced Calls",
+        f"{cache_stats['coalesced']:,}",
+        help="Identical requests that joined one already in flight instead of calling the API",
+    )
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(
+        "Sentence Hits",
+        f"{cache_stats['sentence_hits']:,}",
+        help="Sentences whose score was reused instead of sent again, since the app process started",
+    )
+with col2:
+    st.metric(
+        "Sentence Hit Rate",
+        f"{cache_stats['sentence_hit_rate']:.1%}",
+        help=f"{cache_stats['sentence_entries']:,} sentence scores stored",
+    )
+with col3:
+    st.metric(
+        "Tokens Saved",
+        f"{cache_stats['sentence_tokens_saved']:,}",
+        help="Estimated prompt and completion tokens of the reused sentence scores",
+    )
+
+if st.button("Clear Analysis Cache"):
+    clear_analysis_cache()
+    st.success("Analysis cache cleared.")
+
+# Chart cache
+st.divider()
+st.subheader("📈 Chart Cache")
+st.markdown(
+    "Analytics and cohort charts are kept per user or cohort, date range and data version, "
+    "so reruns reuse them until an entry is added, imported or re-analyzed."
+)
+
+figure_stats = get_figure_cache_stats()
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Chart Hits", f"{figure_stats['hits']:,}", help="Hits since the app process started")
+with col2:
+    st.metric("Hit Rate", f"{figure_stats['hit_rate']:.1%}", help=f"{figure_stats['misses']:,} misses")
+with col3:
+    st.metric(
+        "Cached Size",
+        f"{figure_stats['bytes'] / (1024 * 1024):.1f} MB",
+        help=f"{figure_stats['entries']:,} charts, limit {figure_stats['max_bytes'] / (1024 * 1024):.0f} MB",
+    )
+with col4:
+    st.metric("Evictions", f"{figure_stats['evictions']:,}", help="Least recently used charts dropped to fit the limit")
+
+if st.button("Clear Chart Cache"):
+    clear_figure_cache()
+    st.success("Chart cache cleared.")
+
+# Distilled local model
+st.divider()
+st.subheader("🧠 Local Model")
+st.markdown(
+    "A small model trained on your stored AI analyses answers confident check-ins locally; "
+    "only uncertain ones go to OpenAI."
+)
+
+distill_status = get_distill_status()
+distilled_model = distill_status["model"]
+model_counts = get_model_used_counts()
+distilled_entries = sum(count for model, count in model_counts.items() if model.startswith("distilled"))
+api_entries = sum(
+    count for model, count in model_counts.items()
+    if model and model not in NON_API_MODELS and not model.startswith("distilled")
+)
+
+if distilled_model:
+    metrics = distilled_model["metrics"]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Version", f"v{distilled_model['version']}", help=f"Trained on {distilled_model['examples']:,} entries")
+    with col2:
+        st.metric(
+            "Agreement with AI",
+            f"{metrics['confident_agreement']:.1%}" if metrics["confident_agreement"] is not None else "N/A",
+            delta=f"{metrics['agreement']:.1%} on all entries",
+            delta_color="off",
+            help="Same sentiment band and top emotion as the API on held-out entries the model is confident about",
+        )
+    with col3:
+        st.metric(
+            "Calls Avoided",
+            f"{distilled_entries / (distilled_entries + api_entries):.1%}" if distilled_entries + api_entries else "N/A",
+            help="Share of analyzed entries answered by the local model",
+        )
+    with col4:
+        st.metric("Expected Coverage", f"{metrics['coverage']:.1%}", help="Held-out entries above the confidence threshold")
+    if metrics.get("threshold") is None:
+        st.caption(
+            f"No confidence level reached {metrics['target_agreement']:.0%} agreement on enough held-out entries, "
+            "so this model answers nothing locally. Train again once more entries are analyzed."
+        )
+    elif not distill_status["enabled"]:
+        st.caption("The local model is disabled (DISTILL_ENABLED).")
+    elif distill_status["predictions"]:
+        st.caption(
+            f"This session: {distill_status['confident']:,} of {distill_status['predictions']:,} analyses "
+            f"answered locally ({distill_status['calls_avoided_pct']:.0f}% of calls avoided)."
+        )
 else:
-    st.info("📊 No entries yet. Token usage will appear here after you start checking in.")
+    st.info("No local model trained yet.")
+
+if st.button("Train Local Model"):
+    try:
+        with st.spinner("Training on stored AI analyses..."):
+            trained = train_distilled_model()
+        st.success(f"Trained v{trained.version} on {trained.meta['examples']:,} entries.")
+    except ValueError as e:
+        st.warning(str(e))
+
+# Rate limiting and circuit breaker
+st.divider()
+st.subheader("🚦 OpenAI Rate Limits")
+st.markdown("All sessions share one rate limiter; while OpenAI is unhealthy, check-ins fail fast to a fallback result.")
+
+rate_status = get_rate_limit_status()
+breaker_status = rate_status["breaker"]
+breaker_labels = {"closed": "🟢 Healthy", "half_open": "🟡 Probing", "open": "🔴 Open"}
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(
+        "Circuit Breaker",
+        breaker_labels.get(breaker_status["state"], breaker_status["state"]),
+        delta=f"retry in {breaker_status['retry_in']:.0f}s" if breaker_status["state"] == "open" else None,
+        delta_color="off",
+    )
+with col2:
+    st.metric("Consecutive Failures", breaker_status["consecutive_failures"])
+with col3:
+    st.metric("Fail-fast Calls", f"{breaker_status['rejected']:,}", help=f"Breaker opened {breaker_status['trips']} times")
+
+for model, limiter_status in rate_status["models"].items():
+    st.caption(
+        f"**{model}**: {limiter_status['requests_available']:.0f}/{limiter_status['requests_per_minute']:.0f} requests and "
+        f"{limiter_status['tokens_available']:,.0f}/{limiter_status['tokens_per_minute']:,.0f} tokens available this minute · "
+        f"{limiter_status['requests']:,} calls, {limiter_status['throttled']:,} throttled, "
+        f"{limiter_status['rejected']:,} over the wait limit, {limiter_status['retry_after']:,} Retry-After pauses"
+    )
+
+# Background re-analysis
+st.divider()
+st.subheader("🔄 Background Re-analysis")
+st.markdown("Entries saved while AI analysis was unavailable are re-analyzed in the background.")
+
+start_worker()
+worker_status = get_worker_status()
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Pending", worker_status["jobs"]["pending"] + worker_status["jobs"]["running"])
+with col2:
+    st.metric("Completed", worker_status["jobs"]["done"])
+with col3:
+    st.metric("Failed", worker_status["jobs"]["failed"])
+with col4:
+    st.metric("Worker", "Running" if worker_status["running"] else "Stopped")
+
+if worker_status["last_error"]:
+    st.caption(f"Last error: {worker_status['last_error']}")
+
+# Priority classes: check-ins first, then re-analysis you asked for, then backfills
+scheduler_status = worker_status["scheduler"]
+st.markdown("#### AI Work Queue")
+queue_rows = []
+for priority, queue in worker_status["queue"].items():
+    slots = scheduler_status["classes"][priority]
+    queue_rows.append({
+        "Class": priority,
+        "Queued Jobs": queue["pending"],
+        "Oldest Wait": f"{queue['oldest_wait']:,} s",
+        "Queue Wait p50/p95": (
+            f"{queue['wait_p50_s']:.0f} / {queue['wait_p95_s']:.0f} s" if queue["wait_p50_s"] is not None else "N/A"
+        ),
+        "AI Calls In Flight": f"{slots['in_flight']}/{slots['limit']}",
+        "Waiting for Slot": slots["queued"],
+        "Slot Wait p95": f"{slots['wait_p95_ms']:,.0f} ms" if slots["wait_p95_ms"] is not None else "N/A",
+    })
+st.dataframe(pd.DataFrame(queue_rows), use_container_width=True, hide_index=True)
+st.caption(
+    f"{scheduler_status['in_flight']}/{scheduler_status['max_concurrency']} AI calls in flight · "
+    f"{scheduler_status['interactive_reserved']} slots reserved for check-ins"
+)
+
+if st.button("Queue Unanalyzed Entries"):
+    queued = queue_unanalyzed_entries(user.id, priority="nearline")
+    st.success(f"Queued {queued} entries for re-analysis.")
 
 
 # Authentication
@@ -323,10 +591,10 @@ st.divider()
 st.subheader("Database Information")
 st.markdown("View database statistics.")
 
-# Get entries for database stats
-db_entries = get_entries(user_id=user.id)
-if db_entries:
-    st.info(f"**Total Entries:** {len(db_entries)}")
+# Get entry count for database stats
+db_entry_count = count_entries(user.id)
+if db_entry_count:
+    st.info(f"**Total Entries:** {db_entry_count}")
     st.info(f"**Database Location:** sqlite:///moodmeter.db")
 else:
     st.info("No entries in database.")
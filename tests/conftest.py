@@ -0,0 +1,117 @@
+"""Shared fixtures: a throwaway SQLite database and the mock OpenAI server.
+
+core.config reads the environment at import time, so everything here is set
+before the first core import.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.mock_openai import MockOptions, start_server, base_url  # noqa: E402
+
+_TMP_DIR = tempfile.mkdtemp(prefix="moodmeter-tests-")
+DB_PATH = os.path.join(_TMP_DIR, "test.db")
+DISTILL_DIR = os.path.join(_TMP_DIR, "models")
+
+_server = start_server(MockOptions(latency_ms=0, latency_sigma=0, seed=0), port=0)
+
+os.environ.update({
+    "DB_URL": f"sqlite:///{DB_PATH}",
+    "OPENAI_API_KEY": "sk-mock-test-key-0000",
+    "OPENAI_BASE_URL": base_url(_server),
+    "OPENAI_STRONG_MODEL": "",
+    "ANALYSIS_PROVIDER": "openai",
+    "DISTILL_DIR": DISTILL_DIR,
+})
+
+from core import analysis_cache, analysis_worker, db, distill, figure_cache, rate_limit  # noqa: E402
+
+
+def _drop_database():
+    """Close pooled connections and delete the database file."""
+    db.engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+
+def _reset_process_state():
+    """Forget in-process caches and limiter/breaker state left by the previous test."""
+    with analysis_cache._lock:
+        analysis_cache._memory.clear()
+        analysis_cache._sentence_memory.clear()
+        for key in analysis_cache._stats:
+            analysis_cache._stats[key] = 0
+    with analysis_worker._lock:
+        analysis_worker._recent_results.clear()
+        analysis_worker._partial_results.clear()
+    figure_cache.clear()
+    for key in figure_cache._stats:
+        figure_cache._stats[key] = 0
+    with rate_limit._limiters_lock:
+        rate_limit._limiters.clear()
+    rate_limit.breaker.record_success()
+    distill._model = None
+    distill._loaded = False
+    shutil.rmtree(DISTILL_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_db(monkeypatch):
+    """Every test starts from an empty, fully migrated database."""
+    # Pages start the background worker; tests drive it explicitly so it never races them for jobs
+    monkeypatch.setattr(analysis_worker, "start_worker", lambda: False)
+    _drop_database()
+    _reset_process_state()
+    db.init_db()
+    yield db
+    db.engine.dispose()
+
+
+@pytest.fixture
+def legacy_db():
+    """Replace the database with one created by raw SQL (e.g. an older schema); call init_db() to migrate it."""
+    def create(*statements: str):
+        _drop_database()
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+    return create
+
+
+@pytest.fixture
+def mock_openai():
+    """The session's mock OpenAI server, with fresh counters and default behavior."""
+    state = _server.state
+    state.options = MockOptions(latency_ms=0, latency_sigma=0, seed=0)
+    with state.lock:
+        for key in state.stats:
+            state.stats[key] = 0
+    return _server
+
+
+@pytest.fixture
+def user():
+    """The user the pages act as."""
+    return db.get_or_create_user("default")
+
+
+@pytest.fixture
+def page():
+    """Load a page from pages/ as a logged-in AppTest (call .run() on it)."""
+    def load(name: str) -> AppTest:
+        app = AppTest.from_file(os.path.join(ROOT, "pages", name), default_timeout=60)
+        app.session_state["authenticated"] = True
+        return app
+    return load
@@ -0,0 +1,65 @@
+"""Analysis results are cached on normalized text, tags, model and prompt."""
+import time
+
+from sqlmodel import Session, select, func
+
+from core import ai, analysis_cache, db
+
+
+def _cached_rows():
+    with Session(db.engine) as session:
+        return session.exec(select(func.count()).select_from(db.AnalysisCache)).one()
+
+
+def test_key_ignores_case_whitespace_and_tag_order():
+    key = analysis_cache.cache_key("Good  day\n", ["b", "a"], "m", "p")
+    
+    assert key == analysis_cache.cache_key("good day", ["a", "b ", "A"], "m", "p")
+    assert key != analysis_cache.cache_key("good day", ["a", "b"], "other-model", "p")
+    assert key != analysis_cache.cache_key("good day", ["a", "b"], "m", "new prompt")
+
+
+def test_repeat_analysis_is_served_from_cache(mock_openai):
+    first = ai.analyze_text("Had a great time with friends today", ["friends"])
+    calls = mock_openai.state.stats["requests"]
+    
+    again = ai.analyze_text("had a great time  with friends today", ["friends"])
+    
+    assert mock_openai.state.stats["requests"] == calls
+    assert first["tokens"] > 0 and not first.get("cached")
+    assert again["cached"] is True and again["tokens"] == 0
+    assert again["sentiment"] == first["sentiment"]
+    assert "request_ids" not in again
+
+
+def test_cache_survives_a_restart_and_expires(mock_openai, monkeypatch):
+    key = ai._cache_key("Exams are stressing me out", None)
+    ai.analyze_text("Exams are stressing me out")
+    analysis_cache._memory.clear()
+    
+    assert analysis_cache.get(key)["cached"] is True
+    
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_TTL_SECONDS", 0)
+    assert analysis_cache.get(key) is None
+
+
+def test_placeholder_results_are_not_cached(monkeypatch):
+    monkeypatch.setattr(ai, "_resolve_api_key", lambda: None)
+    
+    result = ai.analyze_text("No key configured here")
+    
+    assert result["model_used"] == "none"
+    assert _cached_rows() == 0
+
+
+def test_eviction_keeps_the_most_recently_used_rows():
+    for i in range(5):
+        analysis_cache.put(f"key-{i}", {"model_used": "m", "tokens": 1})
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE analysis_cache SET last_used_at = 100 WHERE key IN ('key-0', 'key-1')")
+    
+    analysis_cache._evict(int(time.time()), max_entries=3)
+    
+    with Session(db.engine) as session:
+        keys = set(session.exec(select(db.AnalysisCache.key)).all())
+    assert keys == {"key-2", "key-3", "key-4"}
@@ -0,0 +1,96 @@
+"""The durable analysis_job queue and the worker that drains it."""
+import threading
+
+from core import ai, analysis_worker, db
+
+
+def _pending_entries(user, n):
+    return [db.add_entry(user.id, f"Entry number {i} was a calm day", model_used=ai.PENDING_MODEL) for i in range(n)]
+
+
+def test_enqueue_skips_analyzed_and_already_queued_entries(user):
+    _pending_entries(user, 3)
+    db.add_entry(user.id, "already analyzed", model_used="gpt-4o-mini")
+    
+    assert db.enqueue_analysis_jobs(ai.UNANALYZED_MODELS) == 3
+    assert db.enqueue_analysis_jobs(ai.UNANALYZED_MODELS) == 0
+    assert db.get_analysis_job_counts()["pending"] == 3
+
+
+def test_concurrent_claims_never_hand_out_a_job_twice(user):
+    _pending_entries(user, 40)
+    db.enqueue_analysis_jobs(ai.UNANALYZED_MODELS)
+    claimed = []
+    
+    def claim():
+        while True:
+            jobs = db.claim_analysis_jobs(limit=3)
+            if not jobs:
+                return
+            claimed.extend(job.id for job in jobs)
+    
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 40
+    assert db.get_analysis_job_counts()["running"] == 40
+
+
+def test_failed_jobs_back_off_then_give_up(user):
+    (entry,) = _pending_entries(user, 1)
+    job = db.enqueue_analysis_job(entry.id)
+    
+    (claimed,) = db.claim_analysis_jobs()
+    db.finish_analysis_job(claimed.id, error="boom", retry_delay=60, max_attempts=2)
+    assert db.claim_analysis_jobs() == []
+    
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"UPDATE analysis_job SET next_run_at = 0 WHERE id = {job.id}")
+    (claimed,) = db.claim_analysis_jobs()
+    assert claimed.attempts == 2
+    db.finish_analysis_job(claimed.id, error="boom again", max_attempts=2)
+    
+    assert db.get_analysis_job_counts() == {"pending": 0, "running": 0, "done": 0, "failed": 1}
+
+
+def test_running_jobs_are_reset_on_restart(user):
+    _pending_entries(user, 2)
+    db.enqueue_analysis_jobs(ai.UNANALYZED_MODELS)
+    db.claim_analysis_jobs()
+    
+    assert db.reset_running_analysis_jobs() == 2
+    assert len(db.claim_analysis_jobs()) == 2
+
+
+def test_worker_batch_stores_results(user, mock_openai):
+    entries = _pending_entries(user, 4)
+    assert analysis_worker.queue_unanalyzed_entries(user.id) == 4
+    
+    analysis_worker._process_batch(db.claim_analysis_jobs(limit=10, priority="bulk"))
+    
+    assert db.get_analysis_job_counts()["done"] == 4
+    for entry in entries:
+        stored = db.get_entry(entry.id)
+        assert stored.model_used not in ai.UNANALYZED_MODELS
+        assert analysis_worker.get_recent_result(entry.id)["summary"] == stored.summary
+
+
+def test_worker_requeues_on_placeholder_results(user, monkeypatch):
+    (entry,) = _pending_entries(user, 1)
+    db.enqueue_analysis_job(entry.id, priority="interactive")
+    (job,) = db.claim_analysis_jobs(priority="interactive")
+    
+    def placeholder(text, tags):
+        return ai._result_sections(ai._error_result(text))
+    
+    monkeypatch.setattr(analysis_worker, "analyze_text_stream", placeholder)
+    
+    analysis_worker._process_job(job)
+    
+    assert db.claim_analysis_jobs() == []
+    assert db.get_analysis_job_counts()["pending"] == 1
+    assert db.get_entry(entry.id).model_used == ai.PENDING_MODEL
+    assert analysis_worker.get_worker_status()["last_error"]
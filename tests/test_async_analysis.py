@@ -0,0 +1,46 @@
+"""analyze_text_async and analyze_many with bounded concurrency."""
+import asyncio
+
+from core import ai
+
+
+def test_async_analysis_matches_the_sync_result(mock_openai):
+    text = "Nervous about the presentation but my friends helped"
+    
+    result = asyncio.run(ai.analyze_text_async(text, ["school"]))
+    
+    assert result["model_used"] not in ai.UNANALYZED_MODELS
+    assert result["request_ids"]
+    assert ai.analyze_text(text, ["school"])["sentiment"] == result["sentiment"]
+
+
+def test_analyze_many_keeps_order_and_bounds_concurrency(monkeypatch):
+    in_flight, peak = 0, 0
+    
+    async def fake_analysis(text, tags=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if text == "boom":
+            raise RuntimeError("provider exploded")
+        return {"summary": text, "model_used": "fake"}
+    
+    monkeypatch.setattr(ai, "analyze_text_async", fake_analysis)
+    texts = [f"entry {i}" for i in range(12)] + ["boom"]
+    
+    results = ai.analyze_many(texts, concurrency=3)
+    
+    assert peak == 3
+    assert [r["summary"] for r in results[:-1]] == texts[:-1]
+    assert results[-1]["model_used"] == "error"
+
+
+def test_analyze_many_against_the_mock(mock_openai):
+    texts = [f"Day {i}: practice went well and I feel proud" for i in range(6)]
+    
+    results = ai.analyze_many(texts, concurrency=4)
+    
+    assert len(results) == 6
+    assert all(r["model_used"] not in ai.UNANALYZED_MODELS for r in results)
@@ -0,0 +1,57 @@
+"""add_entries_bulk and the CSV/JSON importers write in one transaction."""
+import json
+
+from core import db
+from core.export_import import import_from_csv, import_from_json
+
+
+def test_bulk_insert_skips_invalid_rows_and_keeps_the_rest(user):
+    rows = [
+        {"text": "fine", "mood_score": 70, "tags": "a, b", "created_at": "2026-01-05T10:00:00"},
+        {"text": "   "},
+        {"text": "bad date", "created_at": "yesterday"},
+        {"text": "also fine", "emotions": '{"joy": 1.0}', "created_at": 1767600000},
+    ]
+    
+    result = db.add_entries_bulk(user.id, rows, chunk_size=2)
+    
+    assert result["imported"] == 2
+    assert [index for index, _ in result["error_rows"]] == [1, 2]
+    assert db.count_entries(user.id) == 2
+    assert db.get_all_tags(user.id) == ["a", "b"]
+    assert sum(r.count for r in db.get_daily_rollups(user_id=user.id)) == 2
+
+
+def test_bulk_insert_of_only_bad_rows_leaves_data_version_alone(user):
+    version = db.get_data_version(user.id)
+    
+    assert db.add_entries_bulk(user.id, [{"text": ""}])["imported"] == 0
+    assert db.get_data_version(user.id) == version
+
+
+def test_csv_import(user):
+    content = (
+        "text,created_at,mood_score,sentiment,emotions_json,tags\n"
+        'Good day,2026-01-05T10:00:00,80,0.6,"{""joy"": 1.0}",sport\n'
+        ",2026-01-06T10:00:00,50,0,{},\n"
+    )
+    
+    result = import_from_csv(content, user.id)
+    
+    assert (result["imported"], result["errors"]) == (1, 1)
+    (entry,) = db.get_entries(user.id)
+    assert (entry.text, entry.mood_score, entry.source, entry.emotion_joy) == ("Good day", 80, "import", 1.0)
+
+
+def test_json_import(user):
+    content = json.dumps([
+        {"text": "one", "tags": ["exam", "sleep"], "emotions": {"sad": 1.0}},
+        "not an object",
+        {"text": "two", "source": "diary"},
+    ])
+    
+    result = import_from_json(content, user.id)
+    
+    assert (result["imported"], result["errors"]) == (2, 1)
+    assert db.get_tag_counts(user.id) == [("exam", 1), ("sleep", 1)]
+    assert {e.source for e in db.get_entries(user.id)} == {"import", "diary"}
@@ -0,0 +1,48 @@
+"""The Check-in page saves entries first and analyzes them locally or in the background."""
+import pytest
+
+from core import ai, analysis_worker, db
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Lexicon provider and no API key."""
+    monkeypatch.setattr(ai, "ANALYSIS_PROVIDER", "lexicon")
+    monkeypatch.setattr(ai, "_resolve_api_key", lambda: None)
+
+
+def _check_in(page, text, tags=""):
+    checkin = page("1_Check_in.py").run()
+    checkin.text_area(key="checkin_text").input(text)
+    checkin.text_input[0].input(tags)
+    checkin.button[0].click().run()
+    return checkin
+
+
+def test_lexicon_check_ins_are_saved_analyzed(page, user, offline):
+    checkin = _check_in(page, "Such a happy and fun day with friends", tags="friends")
+    
+    (entry,) = db.get_entries(user.id)
+    assert entry.model_used == "lexicon"
+    assert entry.tags == "friends"
+    assert db.get_analysis_job_counts()["pending"] == 0
+    assert not checkin.warning
+    assert checkin.session_state["last_checkin"]["polling"] is False
+
+
+def test_api_check_ins_are_queued_for_the_worker(page, user, mock_openai):
+    _check_in(page, "Such a happy and fun day with friends")
+    
+    (entry,) = db.get_entries(user.id)
+    assert entry.model_used == ai.PENDING_MODEL
+    assert [job.priority for job in db.claim_analysis_jobs()] == ["interactive"]
+
+
+def test_worker_drains_pending_entries_under_the_lexicon(user, offline):
+    entry = db.add_entry(user.id, "A calm and happy evening", model_used=ai.PENDING_MODEL)
+    db.enqueue_analysis_job(entry.id, priority="interactive")
+    
+    (job,) = analysis_worker._claim("interactive", 10)
+    analysis_worker._process_job(job)
+    
+    assert db.get_entry(entry.id).model_used == "lexicon"
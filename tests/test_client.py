@@ -0,0 +1,29 @@
+"""One pooled OpenAI client per process (and per event loop for the async client)."""
+import asyncio
+
+from core import ai, config
+
+
+def test_client_is_shared_until_the_key_changes(monkeypatch):
+    first = ai.get_client()
+    
+    assert first is not None and ai.get_client() is first
+    assert first.max_retries == 0
+    assert str(first.base_url).rstrip("/") == config.OPENAI_BASE_URL
+    
+    monkeypatch.setattr(ai, "_resolve_api_key", lambda: "sk-another-key-1234")
+    assert ai.get_client() is not first
+    
+    monkeypatch.setattr(ai, "_resolve_api_key", lambda: None)
+    assert ai.get_client() is None
+
+
+def test_async_client_is_per_event_loop():
+    async def twice():
+        return ai.get_async_client(), ai.get_async_client()
+    
+    a, b = asyncio.run(twice())
+    c, _ = asyncio.run(twice())
+    
+    assert a is b
+    assert c is not a
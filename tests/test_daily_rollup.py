@@ -0,0 +1,54 @@
+"""daily_rollup is maintained incrementally and agrees with a rebuild from entries."""
+from datetime import datetime
+
+from core import db
+
+
+def _rollup_rows(user_id):
+    return [
+        (r.day, r.count, r.mood_min, r.mood_max, r.mood_sum, round(r.sentiment_sum, 6), round(r.joy_sum, 6))
+        for r in db.get_daily_rollups(user_id=user_id)
+    ]
+
+
+def test_add_entry_upserts_one_row_per_day(user):
+    day = int(datetime(2026, 3, 2, 9, 0).timestamp())
+    rows = [
+        {"text": "morning", "mood_score": 40, "sentiment": -0.2, "emotions": {"joy": 0.5}, "created_at": day},
+        {"text": "noon", "mood_score": 80, "sentiment": 0.6, "emotions": {"joy": 1.0}, "created_at": day + 3600},
+        {"text": "next day", "mood_score": 55, "created_at": day + 86400},
+    ]
+    db.add_entries_bulk(user.id, rows[:1])
+    db.add_entries_bulk(user.id, rows[1:])
+    
+    rollups = db.get_daily_rollups(user_id=user.id)
+    assert [r.day for r in rollups] == ["2026-03-02", "2026-03-03"]
+    first = rollups[0]
+    assert (first.count, first.mood_min, first.mood_max, first.mood_sum) == (2, 40, 80, 120)
+    assert abs(first.sentiment_sum - 0.4) < 1e-9
+    assert abs(first.joy_sum - 1.5) < 1e-9
+
+
+def test_incremental_rollups_match_rebuild(user):
+    other = db.get_or_create_user("other")
+    start = int(datetime(2026, 1, 1, 12, 0).timestamp())
+    for i in range(30):
+        db.add_entry(other.id if i % 3 == 0 else user.id, f"entry {i}", mood_score=(i * 37) % 101,
+                     sentiment=((i % 7) - 3) / 3, emotions={"joy": i % 2, "sad": 1 - i % 2})
+    db.add_entries_bulk(
+        user.id, [{"text": f"old {i}", "mood_score": i, "created_at": start + i * 7200} for i in range(40)]
+    )
+    
+    incremental = {uid: _rollup_rows(uid) for uid in (user.id, other.id)}
+    db.rebuild_daily_rollup()
+    assert {uid: _rollup_rows(uid) for uid in (user.id, other.id)} == incremental
+
+
+def test_update_entry_analysis_recomputes_min_max(user):
+    low = db.add_entry(user.id, "low", mood_score=10)
+    db.add_entry(user.id, "high", mood_score=90)
+    
+    db.update_entry_analysis(low.id, {"sentiment": 0.0, "mood_score": 50, "emotions": {}, "model_used": "x"})
+    
+    (rollup,) = db.get_daily_rollups(user_id=user.id)
+    assert (rollup.count, rollup.mood_min, rollup.mood_max, rollup.mood_sum) == (2, 50, 90, 140)
@@ -0,0 +1,86 @@
+"""The distilled model only answers locally above a threshold measured on enough held-out entries."""
+import numpy as np
+import pytest
+
+from core import ai, db, distill
+from core.config import EMOTIONS
+
+
+class _FixedModel:
+    """Stands in for DistilledModel: each "feature" is already its (sentiment, emotions, confidence)."""
+    
+    def predict_features(self, item):
+        return item
+
+
+def _holdout(agreeing: int, disagreeing: int):
+    """Predictions in falling confidence; the first `agreeing` match their labels, the rest do not."""
+    joy = np.eye(len(EMOTIONS))[EMOTIONS.index("joy")]
+    sad = np.eye(len(EMOTIONS))[EMOTIONS.index("sad")]
+    total = agreeing + disagreeing
+    predictions = [(0.8, joy, 1.0 - i / total) for i in range(total)]
+    labels = np.array([joy] * agreeing + [sad] * disagreeing)
+    sentiments = np.array([0.8] * agreeing + [-0.8] * disagreeing)
+    return predictions, sentiments, labels
+
+
+def _labeled_entries(user, count):
+    happy = {emotion: 0.0 for emotion in EMOTIONS} | {"joy": 1.0}
+    sad = {emotion: 0.0 for emotion in EMOTIONS} | {"sad": 1.0}
+    db.add_entries_bulk(user.id, [
+        {"text": f"sunny happy great day number {i}", "sentiment": 0.8, "emotions": happy, "model_used": "gpt-4o-mini"}
+        if i % 2 else
+        {"text": f"gloomy sad awful day number {i}", "sentiment": -0.8, "emotions": sad, "model_used": "gpt-4o-mini"}
+        for i in range(count)
+    ])
+
+
+def test_threshold_is_the_lowest_cut_that_keeps_the_target(monkeypatch):
+    monkeypatch.setattr(distill, "DISTILL_TARGET_AGREEMENT", 0.9)
+    
+    metrics = distill._evaluate(_FixedModel(), *_holdout(agreeing=40, disagreeing=10))
+    
+    # 40 of the top 44 agree (90.9%); a 45th would drop below 90%
+    assert metrics["support"] == 44
+    assert metrics["coverage"] == pytest.approx(44 / 50)
+    assert metrics["confident_agreement"] == pytest.approx(40 / 44)
+
+
+def test_too_little_support_sets_no_threshold(monkeypatch):
+    monkeypatch.setattr(distill, "DISTILL_TARGET_AGREEMENT", 0.9)
+    
+    # Every prediction agrees, but there are too few of them to trust
+    metrics = distill._evaluate(_FixedModel(), *_holdout(agreeing=distill.MIN_CONFIDENT_SUPPORT - 1, disagreeing=0))
+    
+    assert metrics["threshold"] is None
+    assert (metrics["support"], metrics["coverage"]) == (0, 0.0)
+
+
+def test_model_without_threshold_never_answers(monkeypatch):
+    meta = {"version": 1, "metrics": {"threshold": None}}
+    size = distill.HASH_DIM
+    model = distill.DistilledModel(np.zeros(size), 0.0, np.zeros((size, len(EMOTIONS))), np.zeros(len(EMOTIONS)), meta)
+    monkeypatch.setattr(distill, "_model", model)
+    monkeypatch.setattr(distill, "_loaded", True)
+    
+    assert distill.predict_confident("sunny happy great day") is None
+
+
+def test_trained_model_skips_the_api_when_confident(user, mock_openai, monkeypatch):
+    monkeypatch.setattr(distill, "DISTILL_ENABLED", True)
+    _labeled_entries(user, 300)
+    
+    model = distill.train()
+    result = ai.analyze_text("sunny happy great day")
+    
+    assert model.meta["metrics"]["support"] >= distill.MIN_CONFIDENT_SUPPORT
+    assert result["model_used"] == f"distilled-v{model.version}"
+    assert max(result["emotions"], key=result["emotions"].get) == "joy"
+    assert mock_openai.state.stats["requests"] == 0
+
+
+def test_training_needs_enough_labeled_entries(user):
+    _labeled_entries(user, distill.MIN_TRAINING_EXAMPLES - 1)
+    
+    with pytest.raises(ValueError):
+        distill.train()
@@ -0,0 +1,34 @@
+"""Emotions are stored in typed columns alongside emotions_json."""
+import json
+
+from core import db
+from core.config import EMOTIONS
+
+
+def test_emotion_columns_fill_missing_and_bad_values():
+    columns = db.emotion_columns({"joy": 0.75, "sad": "0.25", "anger": "lots"})
+    
+    assert list(columns) == db.EMOTION_COLUMNS
+    assert columns["emotion_joy"] == 0.75
+    assert columns["emotion_sad"] == 0.25
+    assert columns["emotion_anger"] == 0.0
+    assert db.emotion_columns(None) == {column: 0.0 for column in db.EMOTION_COLUMNS}
+
+
+def test_entry_emotions_round_trip(user):
+    entry = db.add_entry(user.id, "text", emotions={"joy": 0.6, "trust": 0.4})
+    stored = db.get_entry(entry.id)
+    
+    assert stored.emotions == {emotion: {"joy": 0.6, "trust": 0.4}.get(emotion, 0.0) for emotion in EMOTIONS}
+    assert json.loads(stored.emotions_json) == {"joy": 0.6, "trust": 0.4}
+
+
+def test_emotion_averages_use_sql_over_the_range(user):
+    db.add_entry(user.id, "a", emotions={"joy": 1.0})
+    db.add_entry(user.id, "b", emotions={"sad": 1.0})
+    db.add_entry(db.get_or_create_user("other").id, "c", emotions={"fear": 1.0})
+    
+    averages = db.get_emotion_averages(user.id)
+    
+    assert averages["joy"] == averages["sad"] == 0.5
+    assert averages["fear"] == 0.0
@@ -0,0 +1,105 @@
+"""EntryFrame loads entries straight into arrays and agrees with the Entry-based queries."""
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlmodel import Session
+
+from core import db
+from core.entry_frame import EntryFrame, get_cohort_entry_frame, get_entry_frame
+
+MONDAY_9AM = int(datetime(2026, 3, 2, 9, 0).timestamp())
+
+
+def test_loaded_frame_matches_entries(user):
+    db.add_entries_bulk(user.id, [
+        {"text": "late", "mood_score": 80, "tags": "sport", "created_at": MONDAY_9AM + 7200},
+        {"text": "early", "mood_score": 40, "tags": "exam, sleep", "emotions": {"joy": 1.0}, "created_at": MONDAY_9AM},
+    ])
+    
+    frame = get_entry_frame(user.id, with_text=True)
+    built = EntryFrame.from_entries(db.get_entries(user.id), with_text=True)
+    
+    for loaded in (frame, built):
+        assert loaded.texts == ["early", "late"]
+        assert loaded.mood.tolist() == [40.0, 80.0]
+        assert loaded.hour.tolist() == [9, 11]
+        assert loaded.weekday.tolist() == [0, 0]
+        assert loaded.emotions[0].tolist()[0] == 1.0
+        assert loaded.tag_counts() == [("exam", 1), ("sleep", 1), ("sport", 1)]
+    assert frame.ids.tolist() == built.ids.tolist()
+
+
+def test_take_and_between_keep_tags_on_their_rows(user):
+    db.add_entries_bulk(user.id, [
+        {"text": f"day {i}", "mood_score": 50 + i, "tags": "exam" if i % 2 else "sport", "created_at": day}
+        for i, day in enumerate(range(MONDAY_9AM, MONDAY_9AM + 6 * 86400, 86400))
+    ])
+    frame = get_entry_frame(user.id)
+    
+    later = frame.between(start_ts=MONDAY_9AM + 3 * 86400)
+    
+    assert later.mood.tolist() == [53.0, 54.0, 55.0]
+    assert later.tag_counts() == [("exam", 2), ("sport", 1)]
+    assert [later.tag_names[code] for code in later.tag_codes[np.argsort(later.tag_rows)]] == ["exam", "sport", "exam"]
+
+
+def test_aggregates_match_the_sql_queries(user):
+    db.add_entries_bulk(user.id, [
+        {"text": "a", "mood_score": 40, "tags": "exam", "created_at": MONDAY_9AM},
+        {"text": "b", "mood_score": 60, "tags": "exam, sleep", "created_at": MONDAY_9AM + 3600},
+        {"text": "c", "mood_score": 90, "created_at": MONDAY_9AM + 86400},
+    ])
+    frame = get_entry_frame(user.id)
+    
+    days, mood = frame.daily_mood()
+    grid = frame.hour_weekday_mood()
+    
+    assert [str(day) for day in days] == [r.day for r in db.get_daily_rollups(user_id=user.id)]
+    assert mood.tolist() == [50.0, 90.0]
+    assert (grid[0, 9], grid[0, 10], grid[1, 9]) == (40.0, 60.0, 90.0)
+    assert np.isnan(grid).sum() == 7 * 24 - 3
+    assert frame.tag_counts() == db.get_tag_counts(user.id)
+    assert frame.summary()["days_with_entries"] == 2
+
+
+def test_date_range_and_year_filters(user):
+    db.add_entries_bulk(user.id, [
+        {"text": "last year", "created_at": int(datetime(2025, 12, 31, 12).timestamp())},
+        {"text": "this year", "created_at": int(datetime(2026, 1, 1, 12).timestamp())},
+    ])
+    
+    frame = get_entry_frame(user.id, start_date=datetime(2025, 12, 31), with_text=True)
+    
+    assert frame.in_year(2026).texts == ["this year"]
+    assert get_entry_frame(user.id, end_date=datetime(2025, 12, 31, 23)).summary()["total_entries"] == 1
+    assert len(get_entry_frame(user.id, start_date=datetime.now() + timedelta(days=1))) == 0
+
+
+def test_cohort_frame_spans_its_members(user):
+    other = db.get_or_create_user("other")
+    outsider = db.get_or_create_user("outsider")
+    for member in (user, other, outsider):
+        db.add_entry(member.id, f"{member.username} checked in")
+    with Session(db.engine) as session:
+        cohort = db.Cohort(name="class")
+        session.add(cohort)
+        session.flush()
+        session.add_all([db.CohortMember(user_id=member.id, cohort_id=cohort.id) for member in (user, other)])
+        session.commit()
+        cohort_id = cohort.id
+    
+    frame = get_cohort_entry_frame(cohort_id)
+    
+    assert sorted(frame.user_ids.tolist()) == sorted([user.id, other.id])
+    assert frame.summary()["unique_users"] == 2
+
+
+def test_empty_frame():
+    frame = EntryFrame.empty()
+    
+    assert len(frame) == 0
+    assert frame.tag_counts() == []
+    assert frame.summary() == {
+        "total_entries": 0, "avg_mood": 0.0, "avg_sentiment": 0.0, "days_with_entries": 0, "unique_users": 0,
+    }
+    assert set(frame.average_emotions().values()) == {0.0}
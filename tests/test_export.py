@@ -0,0 +1,61 @@
+"""Streamed CSV/JSON exports."""
+import csv
+import io
+import json
+
+import pytest
+
+from core import db, export_import
+from core.export_import import export_to_csv, export_to_json, iter_csv_export, iter_json_export, spool_export
+
+
+@pytest.fixture
+def entries(user):
+    db.add_entries_bulk(user.id, [
+        {"text": f"entry {i}, with \"quotes\"\nand a newline", "tags": "a,b" if i % 2 else "", "mood_score": i}
+        for i in range(50)
+    ])
+    return db.get_entries(user.id)
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(export_import, "EXPORT_BLOCK_SIZE", 512)
+
+
+def test_streamed_exports_match_the_in_memory_ones(user, entries, small_blocks):
+    oldest_first = sorted(entries, key=lambda e: (e.created_at, e.id))
+    csv_chunks = list(iter_csv_export(user.id, chunk_size=7))
+    json_chunks = list(iter_json_export(user.id, chunk_size=7))
+    
+    assert len(csv_chunks) > 1 and len(json_chunks) > 1
+    assert b"".join(csv_chunks).decode("utf-8") == export_to_csv(oldest_first)
+    assert b"".join(json_chunks).decode("utf-8") == export_to_json(oldest_first)
+
+
+def test_export_of_no_entries(user):
+    assert json.loads(b"".join(iter_json_export(user.id))) == []
+    assert list(csv.reader(io.StringIO(b"".join(iter_csv_export(user.id)).decode()))) == [export_import.CSV_HEADER]
+
+
+def test_spooled_export_round_trips_through_import(user, entries, small_blocks):
+    spooled = spool_export(iter_csv_export(user.id), max_memory=1024)
+    other = db.get_or_create_user("other")
+    
+    result = export_import.import_from_csv(spooled.read().decode("utf-8"), other.id)
+    
+    assert result["imported"] == len(entries)
+    assert db.get_tag_counts(other.id) == [("a", 25), ("b", 25)]
+
+
+def test_settings_page_builds_exports_only_on_click(entries, page, monkeypatch):
+    def not_now(*args, **kwargs):
+        raise AssertionError("export built while rendering the page")
+    
+    monkeypatch.setattr(export_import, "iter_csv_export", not_now)
+    monkeypatch.setattr(export_import, "iter_json_export", not_now)
+    settings = page("5_Settings.py").run()
+    
+    assert not settings.exception
+    labels = [button.proto.label for button in settings.get("download_button")]
+    assert labels == ["Export as CSV", "Export as JSON"]
@@ -0,0 +1,108 @@
+"""Chart results are cached per scope and parameters, and go stale when the underlying entries change."""
+import plotly.graph_objects as go
+from sqlmodel import Session
+
+from core import db, figure_cache
+
+
+class _Builder:
+    """Counts how often the cache had to build its value."""
+    
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        return self.value() if callable(self.value) else self.value
+
+
+def _bar():
+    return go.Figure(go.Bar(x=["a", "b"], y=[1, 2]))
+
+
+def test_hit_returns_a_fresh_copy_of_the_figure(user):
+    build = _Builder(_bar)
+    scope = figure_cache.user_scope(user.id)
+    
+    first = figure_cache.get_figure("bars", scope, build)
+    first.update_layout(title="changed by the page")
+    again = figure_cache.get_figure("bars", scope, build)
+    
+    assert build.calls == 1
+    assert again is not first
+    assert again.layout.title.text is None
+    assert list(again.data[0].y) == [1, 2]
+    stats = figure_cache.get_figure_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_parameters_are_part_of_the_key(user):
+    build = _Builder([1, 2, 3])
+    scope = figure_cache.user_scope(user.id)
+    
+    figure_cache.get_json("series", scope, build, days=7)
+    figure_cache.get_json("series", scope, build, days=30)
+    figure_cache.get_json("series", scope, build, days=7)
+    
+    assert build.calls == 2
+
+
+def test_a_users_new_entry_invalidates_only_their_scope(user):
+    other = db.get_or_create_user("other")
+    mine, theirs = _Builder({"n": 1}), _Builder({"n": 2})
+    figure_cache.get_json("summary", figure_cache.user_scope(user.id), mine)
+    figure_cache.get_json("summary", figure_cache.user_scope(other.id), theirs)
+    
+    db.add_entry(user.id, "a new check-in")
+    figure_cache.get_json("summary", figure_cache.user_scope(user.id), mine)
+    figure_cache.get_json("summary", figure_cache.user_scope(other.id), theirs)
+    
+    assert (mine.calls, theirs.calls) == (2, 1)
+
+
+def test_cohort_scope_follows_membership_and_entries(user):
+    with Session(db.engine) as session:
+        cohort = db.Cohort(name="class")
+        session.add(cohort)
+        session.commit()
+        cohort_id = cohort.id
+    empty = figure_cache.cohort_scope(cohort_id)
+    
+    with Session(db.engine) as session:
+        session.add(db.CohortMember(user_id=user.id, cohort_id=cohort_id))
+        session.commit()
+    joined = figure_cache.cohort_scope(cohort_id)
+    db.add_entry(user.id, "a new check-in")
+    
+    assert joined != empty
+    assert figure_cache.cohort_scope(cohort_id) != joined
+
+
+def test_least_recently_used_values_are_evicted_beyond_the_budget(user, monkeypatch):
+    monkeypatch.setattr(figure_cache, "FIGURE_CACHE_MAX_BYTES", 250)
+    scope = figure_cache.user_scope(user.id)
+    values = {name: _Builder("x" * 100) for name in ("a", "b", "c")}
+    
+    figure_cache.get_json("a", scope, values["a"])
+    figure_cache.get_json("b", scope, values["b"])
+    figure_cache.get_json("a", scope, values["a"])
+    figure_cache.get_json("c", scope, values["c"])
+    figure_cache.get_json("a", scope, values["a"])
+    figure_cache.get_json("b", scope, values["b"])
+    
+    assert {name: builder.calls for name, builder in values.items()} == {"a": 1, "b": 2, "c": 1}
+    stats = figure_cache.get_figure_cache_stats()
+    assert stats["bytes"] <= 250
+    assert stats["evictions"] == 2
+
+
+def test_values_larger_than_the_budget_are_not_stored(user, monkeypatch):
+    monkeypatch.setattr(figure_cache, "FIGURE_CACHE_MAX_BYTES", 50)
+    build = _Builder("x" * 100)
+    
+    figure_cache.get_json("big", figure_cache.user_scope(user.id), build)
+    figure_cache.get_json("big", figure_cache.user_scope(user.id), build)
+    
+    assert build.calls == 2
+    assert figure_cache.get_figure_cache_stats()["entries"] == 0
@@ -0,0 +1,35 @@
+"""Offline lexicon scoring and the lexicon analysis provider."""
+from core import ai, lexicon
+
+
+def test_polarity_negation_and_intensity():
+    happy, happy_emotions = lexicon.score_emotions("I am happy")
+    very_happy, _ = lexicon.score_emotions("I am very happy")
+    not_happy, not_happy_emotions = lexicon.score_emotions("I am not happy")
+    
+    assert 0 < happy < very_happy <= 1
+    assert not_happy < 0
+    assert max(happy_emotions, key=happy_emotions.get) == "joy"
+    assert max(not_happy_emotions, key=not_happy_emotions.get) == "sad"
+    assert abs(sum(happy_emotions.values()) - 1) < 1e-9
+
+
+def test_text_without_emotion_words_is_neutral():
+    result = lexicon.score_text("The bus leaves at nine")
+    
+    assert result["sentiment"] == 0.0
+    assert len(set(result["emotions"].values())) == 1
+    assert result["suggestions"] == lexicon.SUGGESTIONS["neutral"]
+    assert (result["model_used"], result["tokens"]) == ("lexicon", 0)
+
+
+def test_lexicon_provider_never_calls_the_api(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_PROVIDER", "lexicon")
+    
+    single = ai.analyze_text("Worried and stressed about exams")
+    packed = ai.analyze_packed(["Great game today", "Tired and sad"])
+    
+    assert mock_openai.state.stats["requests"] == 0
+    assert single["model_used"] == "lexicon" and single["sentiment"] < 0
+    assert [result["model_used"] for result in packed] == ["lexicon", "lexicon"]
+    assert ai.estimate_analysis_cost("anything")["cost"] == 0.0
@@ -0,0 +1,146 @@
+"""init_db() brings databases created by older versions up to SCHEMA_VERSION."""
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from core import db
+
+# Tables as created before the first migration
+LEGACY_SCHEMA = (
+    "CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL UNIQUE, "
+    "role VARCHAR NOT NULL, created_at INTEGER NOT NULL)",
+    "CREATE TABLE entry (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, created_at INTEGER NOT NULL, "
+    "text VARCHAR NOT NULL, summary VARCHAR NOT NULL, sentiment FLOAT NOT NULL, mood_score INTEGER NOT NULL, "
+    "emotions_json VARCHAR NOT NULL, tags VARCHAR NOT NULL, source VARCHAR NOT NULL, timezone VARCHAR NOT NULL, "
+    "model_used VARCHAR NOT NULL, tokens INTEGER NOT NULL)",
+    "CREATE TABLE cohort (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, created_at INTEGER NOT NULL)",
+    "CREATE TABLE cohortmember (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, cohort_id INTEGER NOT NULL)",
+)
+
+DAY = int(datetime(2026, 2, 10, 10, 0).timestamp())
+
+
+def _legacy_entry(entry_id, mood, created_at=DAY, text="a legacy entry", tags="", emotions=None):
+    return (
+        "INSERT INTO entry (id, user_id, created_at, text, summary, sentiment, mood_score, emotions_json, tags, "
+        f"source, timezone, model_used, tokens) VALUES ({entry_id}, 1, {created_at}, '{text}', '', 0.5, {mood}, "
+        f"'{json.dumps(emotions or {})}', '{tags}', 'manual', '', 'gpt-4o-mini', 10)"
+    )
+
+
+def _user_version():
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def test_fresh_database_is_at_current_version():
+    assert _user_version() == db.SCHEMA_VERSION
+
+
+def test_migration_1_builds_daily_rollup_from_existing_entries(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30),
+        _legacy_entry(2, 70),
+        _legacy_entry(3, 50, created_at=DAY + 86400),
+    )
+    db.init_db()
+    
+    assert _user_version() == db.SCHEMA_VERSION
+    rollups = db.get_daily_rollups(user_id=1)
+    assert [(r.count, r.mood_min, r.mood_max, r.mood_sum) for r in rollups] == [(2, 30, 70, 100), (1, 50, 50, 50)]
+
+
+def test_migrations_are_not_rerun(legacy_db):
+    legacy_db(*LEGACY_SCHEMA, "INSERT INTO user VALUES (1, 'old', 'student', 0)", _legacy_entry(1, 30))
+    db.init_db()
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM daily_rollup"))
+    
+    db.init_db()
+    assert db.get_daily_rollups(user_id=1) == []
+
+
+def test_migration_2_indexes_existing_entries(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30, text="written before the search index"),
+    )
+    db.init_db()
+    
+    assert [e.id for e in db.search_entries(1, "index")] == [1]
+
+
+def test_migration_3_backfills_entry_tags(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30, tags="exam, sleep"),
+        _legacy_entry(2, 60, tags="exam,exam"),
+    )
+    db.init_db()
+    
+    assert db.get_tag_counts(1) == [("exam", 2), ("sleep", 1)]
+    assert [e.id for e in db.get_entries(1, tags=["sleep"])] == [1]
+
+
+def test_migration_4_adds_and_backfills_emotion_columns(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30, emotions={"joy": 0.25, "fear": 0.75}),
+        _legacy_entry(2, 60),
+        "UPDATE entry SET emotions_json = 'not json' WHERE id = 2",
+        "PRAGMA user_version = 3",
+    )
+    db.init_db()
+    
+    assert db.get_entry(1).emotions["fear"] == 0.75
+    assert sum(db.get_entry(2).emotions.values()) == 0.0
+    assert db.get_emotion_averages(1)["joy"] == 0.125
+
+
+def test_migrations_5_and_7_add_routes_and_link_telemetry_to_entries(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "CREATE TABLE ai_request (id INTEGER PRIMARY KEY, created_at INTEGER NOT NULL, model VARCHAR NOT NULL, "
+        "kind VARCHAR NOT NULL, entries INTEGER NOT NULL, entry_id INTEGER, prompt_tokens INTEGER NOT NULL, "
+        "completion_tokens INTEGER NOT NULL, cached_tokens INTEGER NOT NULL, cost_usd FLOAT NOT NULL, "
+        "latency_ms FLOAT NOT NULL, retries INTEGER NOT NULL, outcome VARCHAR NOT NULL)",
+        "CREATE INDEX ix_ai_request_outcome_latency ON ai_request (outcome, latency_ms)",
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30),
+        _legacy_entry(2, 60),
+        f"INSERT INTO ai_request VALUES (1, {DAY}, 'gpt-4o-mini', 'analysis', 1, 1, 70, 30, 0, 0.001, 900, 0, 'ok')",
+        f"INSERT INTO ai_request VALUES (2, {DAY}, 'gpt-4o-mini', 'packed', 2, NULL, 70, 30, 0, 0.001, 900, 0, 'ok')",
+    )
+    db.init_db()
+    
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT DISTINCT route FROM ai_request").scalars().all() == ["fast"]
+        assert conn.exec_driver_sql("SELECT request_id, entry_id FROM ai_request_entry").all() == [(1, 1)]
+        index_columns = [row[2] for row in conn.exec_driver_sql("PRAGMA index_info(ix_ai_request_outcome_latency)")]
+    assert index_columns == ["outcome", "latency_ms", "created_at"]
+    # Entry 2 has tokens but no linked call, so it is still estimated
+    assert db.get_unmetered_token_usage() == [("gpt-4o-mini", 10, 1)]
+
+
+def test_migration_6_adds_job_priorities(legacy_db):
+    legacy_db(
+        *LEGACY_SCHEMA,
+        "CREATE TABLE analysis_job (id INTEGER PRIMARY KEY, entry_id INTEGER NOT NULL, status VARCHAR NOT NULL, "
+        "attempts INTEGER NOT NULL, last_error VARCHAR NOT NULL, next_run_at INTEGER NOT NULL, "
+        "created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL)",
+        "INSERT INTO user VALUES (1, 'old', 'student', 0)",
+        _legacy_entry(1, 30),
+        "INSERT INTO analysis_job VALUES (1, 1, 'pending', 0, '', 0, 0, 0)",
+    )
+    db.init_db()
+    
+    assert [job.priority for job in db.claim_analysis_jobs(priority="bulk")] == ["bulk"]
+    with db.engine.connect() as conn:
+        index_columns = [row[2] for row in conn.exec_driver_sql("PRAGMA index_info(ix_analysis_job_claim)")]
+    assert index_columns == ["status", "priority", "next_run_at"]
@@ -0,0 +1,65 @@
+"""The mock chat-completions server and the benchmark built on it."""
+import json
+
+import httpx
+
+from tools import benchmark
+from tools.mock_openai import Cassette, MockOptions, base_url, start_server
+
+
+def _post(server, content, **body):
+    return httpx.post(
+        base_url(server) + "/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}], **body},
+    )
+
+
+def test_answers_single_packed_and_sentence_prompts(mock_openai):
+    single = _post(mock_openai, 'Text: """I feel happy"""\n\nTags: none').json()
+    packed = _post(mock_openai, 'Entries (JSON array): [{"id": "7", "text": "sad day"}]\n\nAnalyze').json()
+    sentences = _post(mock_openai, 'Sentences (JSON array): [{"id": "0", "text": "ok"}]\n\nScore').json()
+    
+    assert json.loads(single["choices"][0]["message"]["content"])["sentiment"] > 0
+    assert [item["id"] for item in json.loads(packed["choices"][0]["message"]["content"])] == ["7"]
+    assert set(json.loads(sentences["choices"][0]["message"]["content"])[0]) == {"id", "sentiment", "emotions"}
+    assert single["usage"]["total_tokens"] > 0
+    assert httpx.get(base_url(mock_openai) + "/stats").json()["ok"] == 3
+
+
+def test_fault_injection(mock_openai):
+    options = mock_openai.state.options
+    options.malformed_rate = 1.0
+    malformed = _post(mock_openai, 'Text: """fine"""').json()["choices"][0]["message"]["content"]
+    options.malformed_rate, options.error_rate = 0.0, 1.0
+    failed = _post(mock_openai, 'Text: """fine"""')
+    options.error_rate, options.burst_every, options.burst_seconds, options.retry_after = 0.0, 60.0, 60.0, 2.0
+    limited = _post(mock_openai, 'Text: """fine"""')
+    
+    assert malformed.endswith("(truncated")
+    assert failed.status_code == 500
+    assert limited.status_code == 429 and limited.headers["retry-after"] == "2"
+
+
+def test_replay_serves_recorded_exchanges(tmp_path):
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+    recorded = {"id": "x", "choices": [{"message": {"content": "{}"}}]}
+    cassette_path = tmp_path / "cassette.jsonl"
+    cassette_path.write_text(json.dumps({"key": Cassette.key(body), "request": body, "response": recorded}) + "\n")
+    server = start_server(MockOptions(replay=str(cassette_path)), port=0)
+    try:
+        hit = httpx.post(base_url(server) + "/chat/completions", json={**body, "stream": False})
+        miss = httpx.post(base_url(server) + "/chat/completions", json={**body, "model": "other"})
+    finally:
+        server.shutdown()
+    
+    assert hit.json() == recorded
+    assert miss.status_code == 404
+
+
+def test_benchmark_paths_report_per_entry_tokens(mock_openai):
+    texts = benchmark._texts(6, repeat=False)
+    
+    rows = [benchmark.bench_sync(texts[:2]), benchmark.bench_async(texts[2:4], 2), benchmark.bench_packed(texts[4:], 2)]
+    
+    assert [row["entries"] for row in rows] == [2, 2, 2]
+    assert all(row["fallbacks"] == 0 and row["tokens_per_entry"] > 0 for row in rows)
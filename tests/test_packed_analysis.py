@@ -0,0 +1,54 @@
+"""Bulk analysis packs several entries into one request."""
+from core import ai
+
+
+def _texts(n):
+    return [f"Entry {i}: the team practice was fun and I learned a lot" for i in range(n)]
+
+
+def test_split_tokens_adds_up_and_follows_length():
+    shares = ai._split_tokens(101, ["short", "a much longer entry text"])
+    
+    assert sum(shares) == 101
+    assert shares[1] > shares[0]
+
+
+def test_entries_are_packed_per_request(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    texts = _texts(10)
+    
+    results = ai.analyze_packed(texts, pack_size=4)
+    
+    stats = mock_openai.state.stats
+    assert stats["requests"] == 3
+    assert all(result["model_used"] not in ai.UNANALYZED_MODELS for result in results)
+    assert [result["summary"] for result in results] == [ai.lexicon.score_text(text)["summary"] for text in texts]
+
+
+def test_unanswered_items_fall_back_to_single_requests(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    real_pack = ai._analyze_pack
+    
+    def drop_first(client, items):
+        answered = real_pack(client, items)
+        answered.pop(items[0][0], None)
+        return answered
+    
+    monkeypatch.setattr(ai, "_analyze_pack", drop_first)
+    
+    results = ai.analyze_packed(_texts(3), pack_size=3)
+    
+    assert mock_openai.state.stats["requests"] == 2
+    assert all(result["model_used"] not in ai.UNANALYZED_MODELS for result in results)
+
+
+def test_cached_entries_are_not_sent_again(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    texts = _texts(4)
+    ai.analyze_packed(texts)
+    sent = mock_openai.state.stats["requests"]
+    
+    results = ai.analyze_packed(texts)
+    
+    assert mock_openai.state.stats["requests"] == sent
+    assert all(result["cached"] for result in results)
@@ -0,0 +1,92 @@
+"""Shared rate limiter, Retry-After handling and circuit breaker."""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core import ai, rate_limit
+from core.rate_limit import CircuitBreaker, CircuitOpenError, ModelLimiter, RateLimitExceeded
+
+
+def test_limiter_waits_for_refill_and_rejects_long_waits():
+    limiter = ModelLimiter("m", requests_per_minute=60, tokens_per_minute=6000)
+    
+    assert limiter.reserve(100, max_wait=0) == 0.0
+    assert limiter.reserve(5900, max_wait=0) == 0.0
+    assert limiter.reserve(60, max_wait=5) == pytest.approx(0.6, abs=0.05)
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve(6000, max_wait=1)
+    assert limiter.stats["requests"] == 3 and limiter.stats["rejected"] == 1
+
+
+def test_settle_returns_unused_tokens():
+    limiter = ModelLimiter("m", requests_per_minute=600, tokens_per_minute=1000)
+    limiter.reserve(1000, max_wait=0)
+    
+    limiter.settle(reserved=1000, used=200)
+    
+    assert limiter.reserve(700, max_wait=0) == 0.0
+
+
+def test_headroom_keeps_capacity_for_interactive_calls():
+    limiter = ModelLimiter("m", requests_per_minute=600, tokens_per_minute=1000)
+    limiter.reserve(700, max_wait=0)
+    
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve(200, max_wait=0, headroom=0.2)
+    assert limiter.reserve(200, max_wait=0) == 0.0
+
+
+def test_pause_holds_every_caller():
+    limiter = ModelLimiter("m", requests_per_minute=600, tokens_per_minute=10000)
+    limiter.pause(2)
+    
+    assert limiter.reserve(1, max_wait=5) == pytest.approx(2, abs=0.05)
+
+
+def test_retry_after_headers():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+    
+    assert rate_limit.retry_after_seconds(error({"retry-after": "3"})) == 3.0
+    assert rate_limit.retry_after_seconds(error({"retry-after-ms": "250"})) == 0.25
+    assert rate_limit.retry_after_seconds(error({})) is None
+    assert rate_limit.retry_after_seconds(ValueError()) is None
+
+
+def test_breaker_opens_then_lets_a_single_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    
+    time.sleep(0.06)
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open() and breaker.snapshot()["trips"] == 2
+    
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot()["state"] == "closed"
+
+
+def test_provider_errors_trip_the_shared_breaker(mock_openai, monkeypatch):
+    mock_openai.state.options.error_rate = 1.0
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt: 0.0)
+    
+    first = ai.analyze_text("The server is down today")
+    second = ai.analyze_text("Still down, sadly")
+    sent = mock_openai.state.stats["requests"]
+    third = ai.analyze_text("Down for the third time")
+    
+    assert [r["model_used"] for r in (first, second, third)] == ["error"] * 3
+    assert rate_limit.breaker.is_open()
+    assert mock_openai.state.stats["requests"] == sent
+    assert "temporarily unavailable" in third["summary"]
@@ -0,0 +1,86 @@
+"""Model routing: long entries go to the strong model, low-confidence fast results escalate."""
+import pytest
+from sqlalchemy import text
+
+from core import ai, db
+
+STRONG = "gpt-4o"
+
+
+@pytest.fixture
+def strong_model(monkeypatch):
+    monkeypatch.setattr(ai, "OPENAI_STRONG_MODEL", STRONG)
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    return STRONG
+
+
+def _routes():
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT route, model FROM ai_request ORDER BY id")).all()
+
+
+def _result(sentiment, emotions):
+    return {"sentiment": sentiment, "emotions": {**dict.fromkeys(ai.EMOTIONS, 0.0), **emotions}}
+
+
+def test_everything_stays_fast_without_a_strong_model(monkeypatch):
+    monkeypatch.setattr(ai, "OPENAI_STRONG_MODEL", "")
+    
+    assert ai._route_model("x" * 5000) == (ai.OPENAI_MODEL, "fast")
+    assert ai._escalation_reason("fine", "fast", _result(0.0, {})) is None
+
+
+def test_long_entries_route_to_the_strong_model(strong_model):
+    assert ai._route_model("x" * ai.ROUTER_SHORT_MAX_CHARS) == (ai.OPENAI_MODEL, "fast")
+    assert ai._route_model("x" * (ai.ROUTER_SHORT_MAX_CHARS + 1)) == (STRONG, "strong")
+
+
+def test_escalation_reasons(strong_model):
+    flat = _result(0.5, dict.fromkeys(ai.EMOTIONS, 1 / len(ai.EMOTIONS)))
+    neutral = _result(0.0, {"joy": 0.9})
+    strong_wording = "I am so happy and excited, a wonderful great day"
+    
+    assert ai._escalation_reason("fine", "fast", flat) == "flat_emotions"
+    assert ai._escalation_reason(strong_wording, "fast", neutral) == "neutral_sentiment"
+    assert ai._escalation_reason("The bus came at noon", "fast", neutral) is None
+    assert ai._escalation_reason("fine", "strong", flat) is None
+
+
+def test_confident_fast_results_are_kept(strong_model, mock_openai):
+    result = ai.analyze_text("I am so happy and excited, what a wonderful great day")
+    
+    assert _routes() == [("fast", ai.OPENAI_MODEL)]
+    assert result["model_used"] == ai.OPENAI_MODEL
+
+
+def test_long_entries_make_one_strong_call(strong_model, mock_openai):
+    result = ai.analyze_text("I am happy and excited today. " * 30)
+    
+    assert _routes() == [("strong", STRONG)]
+    assert result["model_used"] == STRONG
+
+
+def test_low_confidence_results_escalate_and_keep_both_calls_tokens(strong_model, mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "_escalation_reason", lambda text, route, result: "flat_emotions")
+    
+    result = ai.analyze_text("The bus came at noon")
+    
+    assert _routes() == [("fast", ai.OPENAI_MODEL), ("escalated", STRONG)]
+    assert result["model_used"] == STRONG
+    with db.engine.connect() as conn:
+        billed = conn.execute(text("SELECT SUM(prompt_tokens + completion_tokens) FROM ai_request")).scalar_one()
+    assert result["tokens"] == billed
+
+
+def test_failed_escalation_keeps_the_fast_result(strong_model, mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "_escalation_reason", lambda text, route, result: "flat_emotions")
+    real = ai._analyze_with_model
+    
+    def strong_fails(client, text, tags, model, route):
+        if route == "escalated":
+            raise RuntimeError("strong model unavailable")
+        return real(client, text, tags, model, route)
+    
+    monkeypatch.setattr(ai, "_analyze_with_model", strong_fails)
+    
+    assert ai.analyze_text("The bus came at noon")["model_used"] == ai.OPENAI_MODEL
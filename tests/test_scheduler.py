@@ -0,0 +1,142 @@
+"""The AI scheduler: priority classes, reserved interactive slots and fair draining."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core import ai
+from core.rate_limit import RateLimitExceeded
+from core.scheduler import AIScheduler, scheduler
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def _queued(sched, priority):
+    return sched.snapshot()["classes"][priority]["queued"]
+
+
+def test_background_classes_leave_reserved_slots_to_interactive():
+    sched = AIScheduler(3, {"nearline": 2, "bulk": 2}, interactive_reserved=1)
+    sched.acquire("bulk")
+    sched.acquire("nearline")
+    
+    with pytest.raises(RateLimitExceeded):
+        sched.acquire("bulk", timeout=0.05)
+    assert sched.acquire("interactive", timeout=0.05) < 0.05
+    assert sched.snapshot()["classes"]["bulk"]["timed_out"] == 1
+
+
+def test_background_classes_drain_in_cycle_order():
+    sched = AIScheduler(1, {"nearline": 1, "bulk": 1}, interactive_reserved=0)
+    sched.acquire("interactive")
+    order = []
+    
+    def run(priority):
+        sched.acquire(priority)
+        order.append(priority)
+        sched.release(priority)
+    
+    threads = []
+    for priority in ["bulk"] * 2 + ["nearline"] * 4:
+        threads.append(threading.Thread(target=run, args=(priority,)))
+        threads[-1].start()
+    _wait_until(lambda: _queued(sched, "bulk") == 2 and _queued(sched, "nearline") == 4)
+    
+    sched.release("interactive")
+    for thread in threads:
+        thread.join()
+    
+    assert order == ["nearline"] * 3 + ["bulk", "nearline", "bulk"]
+
+
+def test_async_waiters_are_granted_without_threads():
+    sched = AIScheduler(1, {"nearline": 1, "bulk": 1}, interactive_reserved=0)
+    sched.acquire("interactive")
+    
+    async def main():
+        waiting = asyncio.ensure_future(sched.acquire_async("bulk"))
+        await asyncio.sleep(0.01)
+        assert _queued(sched, "bulk") == 1 and not waiting.done()
+        threads = threading.active_count()
+        
+        # A slot freed by another thread hands itself to the coroutine
+        releaser = threading.Thread(target=sched.release, args=("interactive",))
+        releaser.start()
+        waited = await waiting
+        releaser.join()
+        return waited, threads
+    
+    before = threading.active_count()
+    waited, during = asyncio.run(main())
+    
+    assert waited > 0 and during == before
+    assert sched.snapshot()["classes"]["bulk"]["in_flight"] == 1
+
+
+def test_async_timeouts_and_cancellations_leave_the_queue():
+    sched = AIScheduler(1, {"nearline": 1, "bulk": 1}, interactive_reserved=0)
+    sched.acquire("bulk")
+    
+    async def main():
+        with pytest.raises(RateLimitExceeded):
+            await sched.acquire_async("interactive", timeout=0.02)
+        cancelled = asyncio.ensure_future(sched.acquire_async("nearline"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+    
+    asyncio.run(main())
+    
+    snapshot = sched.snapshot()["classes"]
+    assert snapshot["interactive"]["timed_out"] == 1
+    assert snapshot["interactive"]["queued"] == snapshot["nearline"]["queued"] == 0
+    sched.release("bulk")
+    assert sched.acquire("nearline", timeout=0.05) < 0.05
+
+
+def test_sync_and_async_waiters_share_one_fifo_queue():
+    sched = AIScheduler(1, {"nearline": 1, "bulk": 1}, interactive_reserved=0)
+    sched.acquire("interactive")
+    order = []
+    
+    def thread_waiter():
+        sched.acquire("bulk")
+        order.append("thread")
+        sched.release("bulk")
+    
+    async def main():
+        thread = threading.Thread(target=thread_waiter)
+        thread.start()
+        await asyncio.to_thread(_wait_until, lambda: _queued(sched, "bulk") == 1)
+        waiting = asyncio.ensure_future(sched.acquire_async("bulk"))
+        await asyncio.sleep(0.01)
+        
+        sched.release("interactive")
+        await waiting
+        order.append("coroutine")
+        sched.release("bulk")
+        thread.join()
+    
+    asyncio.run(main())
+    
+    assert order == ["thread", "coroutine"]
+
+
+def test_analyze_many_runs_in_the_bulk_class(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    granted = {priority: data["granted"] for priority, data in scheduler.snapshot()["classes"].items()}
+    
+    ai.analyze_many([f"Entry {i} about a calm afternoon" for i in range(3)])
+    ai.analyze_many(["A nearline entry about exams"], priority="nearline")
+    
+    classes = scheduler.snapshot()["classes"]
+    assert classes["bulk"]["granted"] - granted["bulk"] == 3
+    assert classes["nearline"]["granted"] - granted["nearline"] == 1
+    assert classes["interactive"]["granted"] == granted["interactive"]
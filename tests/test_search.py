@@ -0,0 +1,90 @@
+"""Entry search through the FTS5 index."""
+from sqlalchemy import text
+
+from core import db
+
+
+def test_text_matches_outrank_tag_matches(user):
+    tagged = db.add_entry(user.id, "Quiet day at home", tags="exam")
+    in_text = db.add_entry(user.id, "Worried about the exam tomorrow")
+    
+    hits = db.search_entries_ranked(user.id, "exam")
+    
+    assert [hit["entry"].id for hit in hits] == [in_text.id, tagged.id]
+    assert "**exam**" in hits[0]["snippet"]
+
+
+def test_last_word_is_a_prefix_and_stemming_applies(user):
+    entry = db.add_entry(user.id, "I was studying chemistry all evening")
+    
+    assert [e.id for e in db.search_entries(user.id, "chem")] == [entry.id]
+    assert [e.id for e in db.search_entries(user.id, "study chemistry")] == [entry.id]
+
+
+def test_punctuation_never_reaches_fts_syntax(user):
+    db.add_entry(user.id, "Friends said hello")
+    
+    assert len(db.search_entries(user.id, 'hello" (')) == 1
+    assert db.search_entries(user.id, '"*()') == []
+
+
+def test_results_are_limited_to_the_user(user):
+    other = db.get_or_create_user("other")
+    db.add_entry(other.id, "shared word")
+    mine = db.add_entry(user.id, "shared word")
+    
+    assert [e.id for e in db.search_entries(user.id, "shared")] == [mine.id]
+
+
+def test_index_follows_updates_and_deletes(user):
+    entry = db.add_entry(user.id, "Tired after practice")
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE entry SET text = 'Rested and calm' WHERE id = :id"), {"id": entry.id})
+    assert db.search_entries(user.id, "practice") == []
+    assert [e.id for e in db.search_entries(user.id, "calm")] == [entry.id]
+    
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM entry WHERE id = :id"), {"id": entry.id})
+    assert db.search_entries(user.id, "calm") == []
+
+
+def test_limit_and_offset_page_through_ranked_hits(user):
+    for i in range(5):
+        db.add_entry(user.id, "music " * (i + 1))
+    
+    everything = [hit["entry"].id for hit in db.search_entries_ranked(user.id, "music", limit=None)]
+    page = [hit["entry"].id for hit in db.search_entries_ranked(user.id, "music", limit=2, offset=2)]
+    
+    assert len(everything) == 5
+    assert page == everything[2:4]
+
+
+def test_sentiment_bounds_apply_before_paging(user):
+    for i in range(6):
+        db.add_entry(user.id, "music " * (i + 1), sentiment=0.5 if i % 2 else -0.5)
+    
+    positive = db.search_entries_ranked(user.id, "music", limit=2, min_sentiment=0.0, max_sentiment=1.0)
+    second_page = db.search_entries_ranked(user.id, "music", limit=2, offset=2, min_sentiment=0.0)
+    
+    assert [hit["entry"].sentiment for hit in positive] == [0.5, 0.5]
+    assert len(second_page) == 1
+    assert db.count_search_entries(user.id, "music") == 6
+    assert db.count_search_entries(user.id, "music", min_sentiment=0.0, max_sentiment=1.0) == 3
+    assert db.count_search_entries(user.id, '"*()') == 0
+
+
+def test_journal_reports_the_total_and_bounds_the_page(page, user):
+    db.add_entries_bulk(user.id, [
+        {"text": f"music day {i}", "sentiment": 0.5 if i < 60 else -0.5} for i in range(70)
+    ])
+    journal = page("2_Journal.py").run()
+    journal.text_input[0].input("music").run()
+    journal.selectbox[0].select("Positive (0.0 to 1.0)").run()
+    
+    assert journal.subheader[0].value == "Found 60 entries (page 1 of 2)"
+    assert journal.number_input[0].max == 2
+    
+    journal.number_input[0].set_value(2).run()
+    
+    assert journal.subheader[0].value == "Found 60 entries (page 2 of 2)"
+    assert len(journal.expander) == 10
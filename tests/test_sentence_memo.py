@@ -0,0 +1,48 @@
+"""Opt-in sentence scoring: only unscored sentences are sent, plus one summary request on the routed model."""
+import pytest
+from sqlalchemy import text
+
+from core import ai, config, db
+
+
+@pytest.fixture
+def sent_sentences(monkeypatch):
+    """Sentence memo on; collects the sentences of every sentence-scoring request."""
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", True)
+    sent = []
+    original = ai._sentence_kwargs
+    
+    def spy(sentences, model):
+        sent.extend(sentences)
+        return original(sentences, model)
+    
+    monkeypatch.setattr(ai, "_sentence_kwargs", spy)
+    return sent
+
+
+def _ai_requests():
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT kind, model, route FROM ai_request ORDER BY id")).all()
+
+
+def test_memo_is_off_by_default():
+    assert config.ANALYSIS_SENTENCE_MEMO is False
+
+
+def test_edited_entry_only_rescores_changed_sentences(mock_openai, sent_sentences):
+    ai.analyze_text("I slept well. Class was boring. Dinner with friends was lovely.")
+    sent_sentences.clear()
+    
+    result = ai.analyze_text("I slept well. Class was fun today. Dinner with friends was lovely.")
+    
+    assert sent_sentences == ["Class was fun today."]
+    assert result["summary"]
+
+
+def test_summary_request_uses_the_routed_model(mock_openai, sent_sentences, monkeypatch):
+    monkeypatch.setattr(ai, "OPENAI_STRONG_MODEL", "gpt-4o")
+    monkeypatch.setattr(ai, "ROUTER_SHORT_MAX_CHARS", 10)
+    
+    ai.analyze_text("A long and thoughtful entry. It goes on for a while.")
+    
+    assert _ai_requests() == [("sentences", "gpt-4o", "strong"), ("summary", "gpt-4o", "strong")]
@@ -0,0 +1,80 @@
+"""Identical analyses in flight at the same time share one request."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import ai, analysis_cache
+
+
+def _wait_for_followers(count: int):
+    """Block until count callers have joined an in-flight analysis."""
+    deadline = time.monotonic() + 5
+    while analysis_cache._stats["coalesced"] < count:
+        assert time.monotonic() < deadline, "followers never joined the flight"
+        time.sleep(0.005)
+
+def test_followers_wait_for_the_leader():
+    release = threading.Event()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"summary": "done", "tokens": 42, "request_ids": [1]}
+    
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(analysis_cache.single_flight, "key", compute) for _ in range(4)]
+        _wait_for_followers(3)
+        release.set()
+        results = [future.result() for future in futures]
+    
+    assert len(calls) == 1
+    leader = [r for r in results if not r.get("coalesced")]
+    followers = [r for r in results if r.get("coalesced")]
+    assert len(leader) == 1 and leader[0]["tokens"] == 42
+    assert len(followers) == 3
+    assert all(r["tokens"] == 0 and "request_ids" not in r for r in followers)
+
+
+def test_leader_errors_reach_followers():
+    started = threading.Event()
+    release = threading.Event()
+    
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("provider down")
+    
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(analysis_cache.single_flight, "key", failing)
+        started.wait(5)
+        follower = pool.submit(analysis_cache.single_flight, "key", lambda: {"summary": "unused"})
+        _wait_for_followers(1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+    
+    assert analysis_cache.single_flight("key", lambda: {"summary": "fresh"}) == {"summary": "fresh"}
+
+
+def test_concurrent_identical_check_ins_make_one_request(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    mock_openai.state.options.latency_ms = 300
+    text = "So relieved the exam is over"
+    
+    async def both():
+        return await asyncio.gather(
+            asyncio.to_thread(ai.analyze_text, text),
+            ai.analyze_text_async(text),
+            asyncio.to_thread(ai.analyze_text, text),
+        )
+    
+    results = asyncio.run(both())
+    
+    assert sum(1 for r in results if r.get("coalesced")) == 2
+    assert len({r["sentiment"] for r in results}) == 1
+    assert mock_openai.state.stats["requests"] == 1
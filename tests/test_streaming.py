@@ -0,0 +1,96 @@
+"""Check-in analyses stream section by section; only the final validated result is saved."""
+from sqlalchemy import text
+
+from core import ai, analysis_worker, db
+
+
+def _request_kinds():
+    with db.engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT kind FROM ai_request ORDER BY id")).all()]
+
+
+def _pending_job(user, entry_text="Such a happy and fun day with friends"):
+    entry = db.add_entry(user.id, entry_text, model_used=ai.PENDING_MODEL)
+    db.enqueue_analysis_job(entry.id, priority="interactive")
+    (job,) = db.claim_analysis_jobs(priority="interactive")
+    return entry, job
+
+
+def test_sections_arrive_before_the_response_ends(mock_openai, monkeypatch):
+    events = []
+    record_request = ai._record_request
+    
+    def recording(*args, **kwargs):
+        events.append("recorded")
+        return record_request(*args, **kwargs)
+    
+    monkeypatch.setattr(ai, "_record_request", recording)
+    
+    for section, value in ai.analyze_text_stream("A calm walk by the sea after class"):
+        events.append(section)
+        if section == "result":
+            result = value
+    
+    # The call is recorded once its last chunk (with the usage) is read, after every section
+    assert events == [*ai.STREAM_SECTIONS, "recorded", "result"]
+    assert _request_kinds() == ["stream"]
+    assert result["tokens"] > 0 and len(result["request_ids"]) == 1
+
+
+def test_malformed_stream_falls_back_to_the_non_streamed_retry(mock_openai, monkeypatch):
+    malformed = iter([True])
+    mock_openai.state.options.malformed_rate = 1.0
+    monkeypatch.setattr(mock_openai.state, "roll", lambda rate: rate > 0 and next(malformed, False))
+    
+    events = list(ai.analyze_text_stream("A calm walk by the sea after class"))
+    
+    result = events[-1][1]
+    assert _request_kinds() == ["stream", "retry"]
+    assert result["model_used"] not in ai.UNANALYZED_MODELS
+    assert [section for section, _ in events][-1] == "result"
+    assert dict(events)["suggestions"] == result["suggestions"]
+
+
+def test_worker_publishes_sections_and_saves_the_final_result(user, mock_openai, monkeypatch):
+    entry, job = _pending_job(user)
+    published = []
+    publish = analysis_worker._publish_partial
+    
+    def spy(entry_id, section, value):
+        published.append(section)
+        assert db.get_entry(entry_id).model_used == ai.PENDING_MODEL
+        publish(entry_id, section, value)
+    
+    monkeypatch.setattr(analysis_worker, "_publish_partial", spy)
+    
+    analysis_worker._process_job(job)
+    
+    stored = db.get_entry(entry.id)
+    assert published == list(ai.STREAM_SECTIONS)
+    assert stored.model_used not in ai.UNANALYZED_MODELS
+    assert stored.summary == analysis_worker.get_partial_result(entry.id)["summary"]
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM ai_request_entry")).scalar_one() == 1
+
+
+def test_sentence_memo_analyses_arrive_whole(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", True)
+    
+    events = list(ai.analyze_text_stream("I slept well. Class was fun today."))
+    
+    assert [section for section, _ in events] == [*ai.STREAM_SECTIONS, "result"]
+    assert "stream" not in _request_kinds()
+
+
+def test_check_in_page_shows_streamed_sections(page, user, mock_openai):
+    checkin = page("1_Check_in.py").run()
+    checkin.text_area(key="checkin_text").input("Such a happy and fun day with friends")
+    checkin.button[0].click().run()
+    (entry,) = db.get_entries(user.id)
+    analysis_worker._publish_partial(entry.id, "sentiment", 0.9)
+    analysis_worker._publish_partial(entry.id, "emotions", {"joy": 1.0})
+    
+    checkin.run()
+    
+    assert any("2 of 4 sections" in caption.value for caption in checkin.caption)
+    assert checkin.metric[0].value == "95/100"
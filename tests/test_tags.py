@@ -0,0 +1,39 @@
+"""Tags are normalized into entry_tag and queried by exact match."""
+from datetime import datetime, timedelta
+
+from core import db
+
+
+def test_parse_tags_strips_and_deduplicates():
+    assert db.parse_tags(" exam, sleep ,exam,, ") == ["exam", "sleep"]
+    assert db.parse_tags("") == []
+
+
+def test_tag_filter_is_exact_and_requires_every_tag(user):
+    both = db.add_entry(user.id, "one", tags="exam, sleep")
+    db.add_entry(user.id, "two", tags="exam")
+    db.add_entry(user.id, "three", tags="exams")
+    
+    assert {e.text for e in db.get_entries(user.id, tags=["exam"])} == {"one", "two"}
+    assert [e.id for e in db.get_entries(user.id, tags=["exam", "sleep"])] == [both.id]
+
+
+def test_tag_listing_and_counts(user):
+    other = db.get_or_create_user("other")
+    db.add_entry(other.id, "theirs", tags="private")
+    db.add_entries_bulk(user.id, [
+        {"text": "a", "tags": "sport, friends"},
+        {"text": "b", "tags": ["sport"]},
+        {"text": "c", "tags": "exam"},
+    ])
+    
+    assert db.get_all_tags(user.id) == ["exam", "friends", "sport"]
+    assert db.get_tag_counts(user.id) == [("sport", 2), ("exam", 1), ("friends", 1)]
+    assert db.get_tag_counts(user.id, limit=1) == [("sport", 2)]
+
+
+def test_tag_counts_respect_the_date_range(user):
+    old = int((datetime.now() - timedelta(days=40)).timestamp())
+    db.add_entries_bulk(user.id, [{"text": "old", "tags": "exam", "created_at": old}, {"text": "new", "tags": "exam"}])
+    
+    assert db.get_tag_counts(user.id, start_date=datetime.now() - timedelta(days=7)) == [("exam", 1)]
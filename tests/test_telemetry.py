@@ -0,0 +1,90 @@
+"""Every OpenAI call is recorded in ai_request and feeds the app-wide usage stats."""
+from sqlalchemy import text
+
+from core import ai, analysis_worker, db
+from core.token_usage import get_token_usage_stats
+
+
+def _ai_requests():
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT kind, route, entries, prompt_tokens, cost_usd, outcome FROM ai_request")).all()
+
+
+def _query_plan(sql, **params):
+    with db.engine.connect() as conn:
+        return " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all())
+
+
+def test_each_call_is_recorded_with_exact_usage(mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    
+    result = ai.analyze_text("A calm walk by the sea after class")
+    
+    (row,) = _ai_requests()
+    assert (row.kind, row.route, row.entries, row.outcome) == ("analysis", "fast", 1, "ok")
+    assert row.prompt_tokens > 0 and row.cost_usd > 0
+    assert len(result["request_ids"]) == 1
+
+
+def test_packed_calls_are_linked_to_every_entry_and_counted_once(user, mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    for i in range(4):
+        db.add_entry(user.id, f"Entry number {i} was a calm day", model_used=ai.PENDING_MODEL)
+    analysis_worker.queue_unanalyzed_entries(user.id)
+    
+    analysis_worker._process_batch(db.claim_analysis_jobs(limit=10, priority="bulk"))
+    
+    (row,) = _ai_requests()
+    assert (row.kind, row.entries) == ("packed", 4)
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM ai_request_entry")).scalar_one() == 4
+    stats = get_token_usage_stats()
+    assert stats["requests"] == 1
+    assert stats["entries_with_tokens"] == 4
+    assert stats["estimated_tokens"] == 0
+    assert stats["total_cost"] == row.cost_usd
+
+
+def test_entries_from_before_telemetry_are_estimated(user):
+    db.add_entry(user.id, "analyzed long ago", model_used="gpt-4o-mini", tokens=1000)
+    db.add_entry(user.id, "never analyzed", model_used="none")
+    
+    stats = get_token_usage_stats()
+    
+    assert stats["estimated_tokens"] == 1000
+    assert stats["entries_with_tokens"] == 1
+    assert stats["model_usage"]["gpt-4o-mini"]["count"] == 1
+
+
+def test_usage_is_app_wide(user):
+    other = db.get_or_create_user("other")
+    db.add_entry(user.id, "mine", model_used="gpt-4o-mini", tokens=100)
+    db.add_entry(other.id, "theirs", model_used="gpt-4o-mini", tokens=300)
+    
+    assert get_token_usage_stats()["estimated_tokens"] == 400
+
+
+def test_latency_percentiles_overall_and_per_route():
+    for latency in range(1, 101):
+        db.record_ai_request(model="gpt-4o-mini", latency_ms=float(latency), route="fast")
+    db.record_ai_request(model="gpt-4o", latency_ms=5000.0, route="strong")
+    db.record_ai_request(model="gpt-4o-mini", latency_ms=9000.0, outcome="timeout")
+    
+    assert db.get_ai_latency_percentiles((50, 95), route="fast") == {50: 50.0, 95: 95.0}
+    assert db.get_ai_latency_percentiles((50,), route="strong") == {50: 5000.0}
+    assert db.get_ai_latency_percentiles((100,)) == {100: 5000.0}
+
+
+def test_latency_lookups_use_covering_indexes():
+    where = "outcome = 'ok' AND created_at >= :since"
+    
+    overall = _query_plan(f"SELECT latency_ms FROM ai_request WHERE {where} ORDER BY latency_ms", since=0)
+    by_route = _query_plan(
+        f"SELECT latency_ms FROM ai_request WHERE {where} AND route = :route ORDER BY latency_ms",
+        since=0,
+        route="fast",
+    )
+    
+    assert "COVERING INDEX ix_ai_request_outcome_latency" in overall
+    assert "COVERING INDEX ix_ai_request_route_latency" in by_route
+    assert "TEMP B-TREE" not in overall + by_route
@@ -0,0 +1,138 @@
+"""Input token budgets: long entries are condensed once per analysis to their key sentences."""
+import pytest
+
+from core import ai, token_budget
+
+LONG_ENTRY = " ".join(
+    [f"Then we went to room {i} for the next lesson." for i in range(10)]
+    + ["I felt so anxious and afraid before the exam."]
+    + [f"Lunch number {i} was in the cafeteria." for i in range(10)]
+)
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    monkeypatch.setattr(token_budget, "ANALYSIS_INPUT_TOKEN_BUDGET", 30)
+    monkeypatch.setattr(ai, "ANALYSIS_INPUT_TOKEN_BUDGET", 30)
+    ai._estimate_analysis_cost.cache_clear()
+    yield 30
+    ai._estimate_analysis_cost.cache_clear()
+
+
+@pytest.fixture
+def condense_calls(monkeypatch):
+    calls = []
+    real = token_budget.condense_text
+    
+    def counting(text, budget, model=""):
+        calls.append(text)
+        return real(text, budget, model)
+    
+    monkeypatch.setattr(token_budget, "condense_text", counting)
+    return calls
+
+
+def test_condensing_fits_the_budget_and_keeps_sentence_order():
+    condensed = token_budget.condense_text(LONG_ENTRY, 30)
+    kept = token_budget.split_sentences(condensed)
+    
+    assert token_budget.count_tokens(condensed) <= 30
+    assert kept == sorted(kept, key=LONG_ENTRY.index)
+    assert token_budget.condense_text("Short entry.", 30) == "Short entry."
+
+
+def test_emotional_sentences_survive_condensing():
+    text = "The sky looked grey today. I was so scared and sad before class. The desk is brown and old."
+    
+    assert token_budget.condense_text(text, 12) == "I was so scared and sad before class."
+
+
+def test_an_over_budget_sentence_is_cut_at_a_word_boundary():
+    condensed = token_budget.condense_text("word " * 200, 10)
+    
+    assert 0 < token_budget.count_tokens(condensed) <= 10
+    assert condensed.split() == ["word"] * len(condensed.split())
+
+
+def test_budget_text_records_savings(small_budget):
+    token_budget.budget_text("Short entry.")
+    before = token_budget.get_budget_stats()
+    
+    token_budget.budget_text(LONG_ENTRY)
+    after = token_budget.get_budget_stats()
+    
+    assert after["condensed"] == before["condensed"] + 1
+    assert after["saved_tokens"] > before["saved_tokens"]
+    assert after["budget"] == 30
+
+
+def test_stats_report_the_encoding_in_use(monkeypatch):
+    class Encoding:
+        name = "o200k_base"
+    
+    monkeypatch.setattr(token_budget, "_encoding", lambda model: None)
+    assert token_budget.get_budget_stats()["encoding"] == "heuristic"
+    assert token_budget.get_budget_stats()["exact"] is False
+    
+    monkeypatch.setattr(token_budget, "_encoding", lambda model: Encoding())
+    assert token_budget.get_budget_stats()["encoding"] == "o200k_base"
+    assert token_budget.get_budget_stats()["exact"] is True
+
+
+@pytest.mark.parametrize("sentence_memo", [True, False])
+def test_each_analysis_condenses_once(small_budget, condense_calls, mock_openai, monkeypatch, sentence_memo):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", sentence_memo)
+    monkeypatch.setattr(ai, "ANALYSIS_SUMMARY_ENABLED", True)
+    
+    ai.analyze_text(LONG_ENTRY)
+    
+    assert condense_calls == [LONG_ENTRY]
+    assert mock_openai.state.stats["requests"] == (2 if sentence_memo else 1)
+
+
+def test_the_retry_reuses_the_condensed_text(small_budget, condense_calls, mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    real = ai._parse_response
+    calls = []
+    
+    def first_fails(response):
+        calls.append(response)
+        if len(calls) == 1:
+            raise ai.json.JSONDecodeError("truncated", "", 0)
+        return real(response)
+    
+    monkeypatch.setattr(ai, "_parse_response", first_fails)
+    
+    ai.analyze_text(LONG_ENTRY)
+    
+    assert len(calls) == 2
+    assert condense_calls == [LONG_ENTRY]
+
+
+def test_packed_entries_are_condensed_once_each(small_budget, condense_calls, mock_openai, monkeypatch):
+    monkeypatch.setattr(ai, "ANALYSIS_SENTENCE_MEMO", False)
+    texts = [f"{LONG_ENTRY} Entry {i}." for i in range(3)]
+    
+    ai.analyze_packed(texts, pack_size=3)
+    
+    assert sorted(condense_calls) == sorted(texts)
+
+
+def test_cost_estimate_reflects_the_budget(small_budget):
+    estimate = ai.estimate_analysis_cost(LONG_ENTRY)
+    
+    assert estimate["sent_tokens"] <= 30 < estimate["input_tokens"]
+    assert estimate["cost"] > 0
+
+
+
+def test_cost_estimate_is_memoized_on_text_and_tags():
+    ai._estimate_analysis_cost.cache_clear()
+    
+    first = ai.estimate_analysis_cost("A long day of classes", ["exams", "sleep", "friends"])
+    again = ai.estimate_analysis_cost("A long day of classes", ["exams", "sleep", "friends"])
+    untagged = ai.estimate_analysis_cost("A long day of classes")
+    
+    assert first == again and first is not again
+    assert untagged["prompt_tokens"] < first["prompt_tokens"]
+    assert ai._estimate_analysis_cost.cache_info().hits == 1
@@ -0,0 +1,201 @@
+"""Benchmark the analysis pipeline (sync, async and packed paths) against the local mock server.
+
+Usage:
+    python tools/benchmark.py --entries 200 --latency-ms 300 --malformed-rate 0.05
+    python tools/benchmark.py --base-url http://127.0.0.1:8765/v1 --paths async,packed
+
+Without --base-url an in-process mock server is started with the given fault settings.
+Each run uses a throwaway SQLite database and unique texts, so the analysis cache never
+hides API calls (pass --repeat-texts to measure cache and coalescing behavior instead).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_TEXTS = [
+    "Today's class stressed me out, but I'm looking forward to the weekend.",
+    "Had a great study session with friends and finally understood the exam material.",
+    "I feel tired and a bit lonely, the deadlines keep piling up.",
+    "Not sure how the presentation went, I was really nervous.",
+    "Proud of myself for going to the gym before lectures.",
+    "My roommate was annoying again and I couldn't sleep.",
+    "Got my test back and passed! Relieved and happy.",
+    "Bored in class, counting the minutes until lunch.",
+]
+
+
+def _configure_environment(args) -> Dict:
+    """Point core.config at the mock server and a scratch database before it is imported."""
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        from tools.mock_openai import MockOptions, start_server, base_url as server_url
+        server = start_server(
+            MockOptions(
+                latency_ms=args.latency_ms,
+                latency_sigma=args.latency_sigma,
+                error_rate=args.error_rate,
+                malformed_rate=args.malformed_rate,
+                burst_every=args.burst_every,
+                burst_seconds=args.burst_seconds,
+                retry_after=args.retry_after,
+                replay=args.replay,
+                seed=args.seed,
+            ),
+            port=0,
+        )
+        base_url = server_url(server)
+    
+    scratch = tempfile.mkdtemp(prefix="moodmeter-bench-")
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-mock-benchmark-key"
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ["ANALYSIS_PROVIDER"] = "openai"
+    os.environ["ANALYSIS_PACK_SIZE"] = str(args.pack_size)
+    if not args.respect_limits:
+        # Measure the pipeline, not the configured production rate limits
+        os.environ["OPENAI_REQUESTS_PER_MINUTE"] = "0"
+        os.environ["OPENAI_TOKENS_PER_MINUTE"] = "0"
+    return {"server": server, "base_url": base_url, "db": os.environ["DB_URL"]}
+
+
+def _texts(count: int, repeat: bool) -> List[str]:
+    """Entries to analyze; unique per run unless repeat is set."""
+    run = uuid.uuid4().hex[:8]
+    texts = []
+    for i in range(count):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        texts.append(text if repeat else f"{text} (bench {run} #{i})")
+    return texts
+
+
+def _percentile(values: List[float], q: float) -> float:
+    import numpy as np
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _summarize(path: str, latencies: List[float], wall: float, results: List[Dict], unit: str) -> Dict:
+    from core.ai import UNANALYZED_MODELS
+    tokens = sum(result["tokens"] for result in results)
+    return {
+        "path": path,
+        "entries": len(results),
+        "unit": unit,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "throughput": len(results) / wall if wall else 0.0,
+        "tokens_per_entry": tokens / len(results) if results else 0.0,
+        "fallbacks": sum(1 for result in results if result["model_used"] in UNANALYZED_MODELS),
+        "wall_s": wall,
+    }
+
+
+def bench_sync(texts: List[str]) -> Dict:
+    """One analyze_text call after another."""
+    from core.ai import analyze_text
+    latencies, results = [], []
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        results.append(analyze_text(text))
+        latencies.append(time.perf_counter() - t0)
+    return _summarize("sync", latencies, time.perf_counter() - start, results, "call")
+
+
+def bench_async(texts: List[str], concurrency: int) -> Dict:
+    """analyze_text_async with bounded concurrency, timing every item."""
+    import asyncio
+    from core.ai import analyze_text_async
+    
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+        
+        async def one(text: str) -> Dict:
+            async with semaphore:
+                t0 = time.perf_counter()
+                result = await analyze_text_async(text)
+                latencies.append(time.perf_counter() - t0)
+                return result
+        
+        results = await asyncio.gather(*(one(text) for text in texts))
+        return latencies, list(results)
+    
+    start = time.perf_counter()
+    latencies, results = asyncio.run(run())
+    return _summarize(f"async x{concurrency}", latencies, time.perf_counter() - start, results, "call")
+
+
+def bench_packed(texts: List[str], pack_size: int) -> Dict:
+    """analyze_packed one pack at a time (latency is per pack)."""
+    from core.ai import analyze_packed
+    latencies, results = [], []
+    start = time.perf_counter()
+    for offset in range(0, len(texts), pack_size):
+        t0 = time.perf_counter()
+        results.extend(analyze_packed(texts[offset:offset + pack_size], pack_size=pack_size))
+        latencies.append(time.perf_counter() - t0)
+    return _summarize(f"packed x{pack_size}", latencies, time.perf_counter() - start, results, "pack")
+
+
+def _print_report(rows: List[Dict]):
+    header = f"{'path':<12}{'entries':>8}{'p50 ms':>10}{'p95 ms':>10}{'per':>6}{'entries/s':>11}{'tok/entry':>11}{'fallback':>10}{'wall s':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['path']:<12}{row['entries']:>8}{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}{row['unit']:>6}"
+            f"{row['throughput']:>11.1f}{row['tokens_per_entry']:>11.1f}{row['fallbacks']:>10}{row['wall_s']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Moodmeter analysis pipeline")
+    parser.add_argument("--base-url", default="", help="Use an already running server instead of an in-process mock")
+    parser.add_argument("--entries", type=int, default=100)
+    parser.add_argument("--paths", default="sync,async,packed", help="Comma-separated: sync, async, packed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pack-size", type=int, default=8)
+    parser.add_argument("--repeat-texts", action="store_true", help="Reuse the same few texts (cache/coalescing)")
+    parser.add_argument("--respect-limits", action="store_true", help="Keep the configured OpenAI rate limits")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--burst-every", type=float, default=0.0)
+    parser.add_argument("--burst-seconds", type=float, default=5.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--replay", default="", help="Replay a recorded cassette instead of synthetic answers")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
+    env = _configure_environment(args)
+    from core.db import init_db
+    init_db()
+    
+    print(f"Benchmarking against {env['base_url']} ({env['db']})")
+    benches: Dict[str, Callable[[List[str]], Dict]] = {
+        "sync": bench_sync,
+        "async": lambda texts: bench_async(texts, args.concurrency),
+        "packed": lambda texts: bench_packed(texts, args.pack_size),
+    }
+    rows = []
+    for path in [p.strip() for p in args.paths.split(",") if p.strip()]:
+        if path not in benches:
+            parser.error(f"Unknown path: {path}")
+        rows.append(benches[path](_texts(args.entries, args.repeat_texts)))
+    _print_report(rows)
+    
+    if env["server"] is not None:
+        print(f"Mock server: {env['server'].state.stats}")
+        env["server"].shutdown()
+
+
+if __name__ == "__main__":
+    main()
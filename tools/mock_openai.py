@@ -0,0 +1,379 @@
+"""Local stand-in for the OpenAI chat-completions endpoint, for benchmarking without spending tokens.
+
+Synthetic mode answers with lexicon-scored analyses and can inject latency, 5xx errors,
+429 bursts and malformed JSON. Record mode proxies to a real upstream and saves every
+exchange to a JSONL cassette; replay mode serves those exchanges back.
+
+Usage:
+    python tools/mock_openai.py --latency-ms 400 --error-rate 0.02 --malformed-rate 0.05
+    python tools/mock_openai.py --record cassette.jsonl --upstream https://api.openai.com/v1
+    python tools/mock_openai.py --replay cassette.jsonl
+
+Then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (any OPENAI_API_KEY).
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Allow running as a script from the repo root or from tools/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_PORT = 8765
+
+# Characters per token for the synthetic usage figures
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class MockOptions:
+    """Fault-injection and cassette settings for the mock server."""
+    latency_ms: float = 300.0          # median response latency
+    latency_sigma: float = 0.5         # lognormal spread (0 = fixed latency)
+    error_rate: float = 0.0            # fraction of requests answered with a 500
+    malformed_rate: float = 0.0        # fraction of answers whose content is not valid JSON
+    burst_every: float = 0.0           # seconds between 429 bursts (0 = no bursts)
+    burst_seconds: float = 5.0         # length of each 429 burst
+    retry_after: float = 1.0           # Retry-After header sent with 429s
+    record: str = ""                   # cassette path to record upstream exchanges to
+    replay: str = ""                   # cassette path to replay exchanges from
+    upstream: str = "https://api.openai.com/v1"
+    seed: Optional[int] = None
+
+
+class Cassette:
+    """Request/response pairs keyed by a hash of the canonical request body."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exchanges: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self._exchanges[exchange["key"]] = exchange["response"]
+    
+    @staticmethod
+    def key(body: Dict) -> str:
+        """Hash of the request, ignoring transport-only fields."""
+        canonical = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def get(self, body: Dict) -> Optional[Dict]:
+        with self._lock:
+            return self._exchanges.get(self.key(body))
+    
+    def add(self, body: Dict, response: Dict):
+        key = self.key(body)
+        with self._lock:
+            self._exchanges[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": body, "response": response}) + "\n")
+
+
+class MockState:
+    """Shared server state: options, cassette, RNG and counters."""
+    
+    def __init__(self, options: MockOptions):
+        self.options = options
+        self.started = time.monotonic()
+        self.random = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.cassette = Cassette(options.record or options.replay) if (options.record or options.replay) else None
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "malformed": 0, "replayed": 0, "recorded": 0}
+    
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+    
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+    
+    def latency(self) -> float:
+        """Seconds to wait before answering (lognormal around the median)."""
+        options = self.options
+        if options.latency_ms <= 0:
+            return 0.0
+        with self.lock:
+            factor = math.exp(self.random.gauss(0, options.latency_sigma)) if options.latency_sigma > 0 else 1.0
+        return options.latency_ms / 1000.0 * factor
+    
+    def in_burst(self) -> bool:
+        """Whether the server is currently inside a 429 burst window."""
+        options = self.options
+        if options.burst_every <= 0:
+            return False
+        elapsed = (time.monotonic() - self.started) % options.burst_every
+        return elapsed >= options.burst_every - options.burst_seconds
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _analysis(text: str) -> Dict:
+    """Analysis payload in the shape the app's prompt asks for."""
+    # Imported lazily so core.config is only read once the caller has set its environment
+    from core.lexicon import score_text
+    result = score_text(text)
+    return {
+        "sentiment": round(result["sentiment"], 3),
+        "emotions": {emotion: round(value, 4) for emotion, value in result["emotions"].items()},
+        "summary": result["summary"],
+        "suggestions": result["suggestions"],
+    }
+
+
+def _synthetic_content(messages: List[Dict]) -> str:
+    """Answer the app's single, packed, sentence-scoring or retry prompt from the last user message."""
+    prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    
+    packed = re.search(r"Entries \(JSON array\): (\[.*?\])\n", prompt, re.DOTALL)
+    if packed:
+        entries = json.loads(packed.group(1))
+        return json.dumps([{"id": entry["id"], **_analysis(entry["text"])} for entry in entries])
+    
+    sentences = re.search(r"Sentences \(JSON array\): (\[.*?\])\n", prompt, re.DOTALL)
+    if sentences:
+        scores = []
+        for sentence in json.loads(sentences.group(1)):
+            analysis = _analysis(sentence["text"])
+            scores.append({"id": sentence["id"], "sentiment": analysis["sentiment"], "emotions": analysis["emotions"]})
+        return json.dumps(scores)
+    
+    text = re.search(r'Text: """(.*?)"""', prompt, re.DOTALL)
+    return json.dumps(_analysis(text.group(1) if text else prompt))
+
+
+def _completion(body: Dict, content: str) -> Dict:
+    """A chat.completion response object."""
+    prompt_tokens = sum(_tokens(m.get("content", "")) for m in body.get("messages", []))
+    completion_tokens = _tokens(content)
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _stream_chunks(response: Dict, include_usage: bool, piece: int = 12):
+    """Split a completion into chat.completion.chunk events."""
+    content = response["choices"][0]["message"]["content"] or ""
+    base = {"id": response["id"], "object": "chat.completion.chunk", "created": response["created"], "model": response["model"]}
+    for start in range(0, len(content), piece):
+        yield {**base, "choices": [{"index": 0, "delta": {"content": content[start:start + piece]}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if include_usage:
+        yield {**base, "choices": [], "usage": response.get("usage")}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1/chat/completions and GET /stats."""
+    
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+    
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+    
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+    
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_error(self, status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "code": None}}, headers)
+    
+    def _send_stream(self, response: Dict, include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in _stream_chunks(response, include_usage):
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+    
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.state.lock:
+                self._send_json(200, dict(self.state.stats))
+        else:
+            self._send_error(404, "Not found", "invalid_request_error")
+    
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_error(404, "Not found", "invalid_request_error")
+            return
+        
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        state = self.state
+        state.count("requests")
+        
+        response, status = self._answer(body)
+        if status == 429:
+            state.count("rate_limited")
+            self._send_error(429, "Rate limit reached (mock burst)", "requests",
+                             {"Retry-After": f"{state.options.retry_after:g}"})
+            return
+        if status >= 500 or response is None:
+            state.count("errors")
+            self._send_error(status or 500, "The server had an error (mock)", "server_error")
+            return
+        
+        state.count("ok")
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self._send_stream(response, include_usage)
+        else:
+            self._send_json(200, response)
+    
+    def _answer(self, body: Dict) -> Tuple[Optional[Dict], int]:
+        """Response object and HTTP status for a request, per the configured mode."""
+        state = self.state
+        options = state.options
+        
+        if options.replay:
+            recorded = state.cassette.get(body)
+            if recorded is None:
+                return None, 404
+            state.count("replayed")
+            return recorded, 200
+        
+        if options.record:
+            response = self._forward(body)
+            if response is not None:
+                state.cassette.add(body, response)
+                state.count("recorded")
+            return response, 200 if response is not None else 502
+        
+        time.sleep(state.latency())
+        if state.in_burst():
+            return None, 429
+        if state.roll(options.error_rate):
+            return None, 500
+        
+        content = _synthetic_content(body.get("messages", []))
+        if state.roll(options.malformed_rate):
+            state.count("malformed")
+            content = content[: len(content) // 2] + " (truncated"
+        return _completion(body, content), 200
+    
+    def _forward(self, body: Dict) -> Optional[Dict]:
+        """Send the request (non-streamed) to the real upstream API."""
+        import httpx
+        
+        upstream_body = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+        try:
+            reply = httpx.post(
+                self.state.options.upstream.rstrip("/") + "/chat/completions",
+                json=upstream_body,
+                headers={"Authorization": self.headers.get("Authorization", "")},
+                timeout=60,
+            )
+            reply.raise_for_status()
+            return reply.json()
+        except Exception as e:
+            print(f"Upstream request failed: {e}", file=sys.stderr)
+            return None
+
+
+def start_server(options: MockOptions, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(options)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    """OPENAI_BASE_URL for a running mock server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal spread of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of invalid-JSON answers")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Seconds between 429 bursts (0 = off)")
+    parser.add_argument("--burst-seconds", type=float, default=5.0, help="Length of each 429 burst")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument("--record", default="", help="Proxy to --upstream and record exchanges to this cassette")
+    parser.add_argument("--replay", default="", help="Serve exchanges from this cassette")
+    parser.add_argument("--upstream", default="https://api.openai.com/v1")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    
+    options = MockOptions(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        burst_every=args.burst_every,
+        burst_seconds=args.burst_seconds,
+        retry_after=args.retry_after,
+        record=args.record,
+        replay=args.replay,
+        upstream=args.upstream,
+        seed=args.seed,
+    )
+    server = start_server(options, args.host, args.port)
+    print(f"Mock OpenAI listening on {base_url(server)} (stats at /v1/stats)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
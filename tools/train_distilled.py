@@ -0,0 +1,48 @@
+"""Train a new version of the distilled local model from the AI analyses stored in the database.
+
+Usage:
+    python tools/train_distilled.py
+    DB_URL=sqlite:///other.db DISTILL_DIR=/tmp/models python tools/train_distilled.py
+
+The new version is saved next to the previous ones (DISTILL_DIR) and becomes the
+active model the next time the app loads it.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from core.db import init_db
+    from core.distill import train
+    init_db()
+    
+    try:
+        model = train()
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    
+    metrics = model.meta["metrics"]
+    print(f"Trained distilled-v{model.version} on {model.meta['examples']:,} entries in {model.meta['training_seconds']}s")
+    print(f"Held-out entries:          {metrics['holdout']:,}")
+    print(f"Sentiment MAE:             {metrics['sentiment_mae']:.3f}")
+    print(f"Sentiment band agreement:  {metrics['sentiment_agreement']:.1%}")
+    print(f"Top emotion agreement:     {metrics['emotion_agreement']:.1%}")
+    print(f"Overall agreement:         {metrics['agreement']:.1%}")
+    if metrics["threshold"] is None:
+        print(
+            f"No confidence level reaches {metrics['target_agreement']:.0%} agreement on at least "
+            f"{metrics['min_support']} held-out entries; the model will not replace API calls"
+        )
+    else:
+        print(
+            f"Above confidence {metrics['threshold']:.3f}: {metrics['coverage']:.1%} of entries "
+            f"({metrics['support']} held out), "
+            f"{metrics['confident_agreement']:.1%} agreement (expected share of API calls avoided)"
+        )
+
+
+if __name__ == "__main__":
+    main()